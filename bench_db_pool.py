@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+数据库连接池基准测试
+对比每次查询新建 aiosqlite 连接（旧实现）与全局连接池在单条 FAN 更新上的数据库耗时
+
+用法: python bench_db_pool.py [更新条数]
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import db_pool
+import ws_handler
+
+
+def make_update(i: int) -> dict:
+    """构造一条模拟的地震更新数据"""
+    return {
+        "id": f"bench_{i // 4}",  # 每个事件4个版本，覆盖新消息和重复消息两种路径
+        "shockTime": "2026-02-16 10:30:00",
+        "latitude": 30.0 + (i % 50) * 0.01,
+        "longitude": 103.0,
+        "magnitude": 4.0 + (i % 4) * 0.1,
+        "depth": 10,
+        "placeName": "四川汶川县",
+        "infoTypeName": "[自动测定]",
+    }
+
+
+async def legacy_update(db_path: str, event_data: dict, source: str) -> None:
+    """旧实现：COUNT探测、读取旧数据、保存各自打开一次连接"""
+    eq_id = event_data['id']
+    async with aiosqlite.connect(db_path) as db:
+        async with db.execute("SELECT COUNT(*) FROM earthquakes WHERE source = ? AND id = ?", (source, eq_id)) as cursor:
+            await cursor.fetchone()
+    async with aiosqlite.connect(db_path) as db:
+        async with db.execute("SELECT data_json FROM earthquakes WHERE source = ? AND id = ?", (source, eq_id)) as cursor:
+            await cursor.fetchone()
+    async with aiosqlite.connect(db_path) as db:
+        async with db.execute("SELECT COUNT(*) FROM earthquakes WHERE id = ?", (eq_id,)) as cursor:
+            count = (await cursor.fetchone())[0]
+        if not count:
+            await db.execute("""
+                INSERT INTO earthquakes
+                (id, source, shock_time, latitude, longitude, magnitude, depth, place_name, info_type_name, data_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (eq_id, source, event_data['shockTime'], event_data['latitude'], event_data['longitude'],
+                  event_data['magnitude'], event_data['depth'], event_data['placeName'],
+                  event_data['infoTypeName'], json.dumps(event_data)))
+            await db.commit()
+
+
+async def pooled_update(event_data: dict, source: str) -> None:
+    """连接池实现：同样的三步查询，复用长连接"""
+    eq_id = event_data['id']
+    await db_pool.fetchone("SELECT COUNT(*) FROM earthquakes WHERE source = ? AND id = ?", (source, eq_id))
+    await ws_handler.get_stored_earthquake_data(eq_id, source)
+    await ws_handler.save_earthquake_to_db(event_data, source)
+
+
+def report(name: str, samples: list) -> None:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(f"{name:<12} 平均 {statistics.mean(samples_ms):7.3f} ms  "
+          f"p50 {statistics.median(samples_ms):7.3f} ms  p95 {p95:7.3f} ms")
+
+
+async def main(count: int) -> None:
+    import logging
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = os.path.join(tmp_dir, 'legacy.db')
+        pooled_path = os.path.join(tmp_dir, 'pooled.db')
+
+        # 两个库使用相同的表结构
+        await ws_handler.init_db(legacy_path)
+        await db_pool.close_db_pool()
+        await ws_handler.init_db(pooled_path)
+
+        legacy_samples = []
+        for i in range(count):
+            start = time.perf_counter()
+            await legacy_update(legacy_path, make_update(i), 'cea')
+            legacy_samples.append(time.perf_counter() - start)
+
+        pooled_samples = []
+        for i in range(count):
+            start = time.perf_counter()
+            await pooled_update(make_update(i), 'cea')
+            pooled_samples.append(time.perf_counter() - start)
+
+        await db_pool.close_db_pool()
+
+    print(f"=== 单条FAN更新的数据库耗时（{count} 条） ===")
+    report("每次新建连接", legacy_samples)
+    report("连接池", pooled_samples)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 400))
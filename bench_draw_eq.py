@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+地震地图绘制基准测试
+对比实时绘制地图要素（冷启动）与使用底图瓦片缓存（热启动）的单张地图耗时
+瓦片写入临时目录，不影响 data/basemap_tiles
+
+用法: python bench_draw_eq.py [每种方式的绘制次数]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import draw_eq
+
+EVENTS = [
+    {"latitude": 30.5 + i * 0.2, "longitude": 103.2 + i * 0.3, "magnitude": 5.1, "shockTime": "2026-02-16 10:30:00",
+     "placeName": "四川汶川县", "infoTypeName": "[正式测定]"}
+    for i in range(5)
+]
+
+
+def render(count: int) -> list:
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        path = draw_eq.draw_earthquake(EVENTS[i % len(EVENTS)], 'cea')
+        samples.append(time.perf_counter() - start)
+        if path and os.path.exists(path):
+            os.remove(path)
+    return samples
+
+
+def report(name: str, samples: list) -> None:
+    samples_ms = [s * 1000 for s in samples]
+    print(f"{name:<12} 平均 {statistics.mean(samples_ms):8.1f} ms  p50 {statistics.median(samples_ms):8.1f} ms  "
+          f"最大 {max(samples_ms):8.1f} ms")
+
+
+def main(count: int) -> None:
+    import logging
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tile_dir:
+        draw_eq.BASEMAP_TILE_DIR = tile_dir
+        # 预热地图要素和字体，避免首次加载计入冷启动耗时
+        render(1)
+        cold = render(count)
+
+        for event in EVENTS:
+            draw_eq.render_basemap_tiles(*draw_eq.calculate_map_extent(event['longitude'], event['latitude']))
+        warm = render(count)
+
+    print(f"=== 单张地震地图绘制耗时（{count} 次） ===")
+    report("实时绘制", cold)
+    report("底图瓦片", warm)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
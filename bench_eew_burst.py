@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+EEW 突发更新回放基准测试
+模拟 CEA / CWA 预警在数秒内对同一事件连续发布多报的场景，
+测量从收到 FAN 消息到交给推送环节（process_text_message_only）的端到端耗时，
+以及合并同一事件连续修订后的实际推送次数
+
+用法: python bench_eew_burst.py [事件数] [每个事件的报数]
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import db_pool
+import ws_handler
+
+BENCH_CONFIG = {
+    'sources': {'cea': True, 'cwa-eew': True},
+    'source_rules': {},
+    'groups': {},
+    'draw_sources': [],
+    'earthquake.coalesce.enabled': False,
+}
+
+# 合并推送：回放没有真实的报间隔，用较短的合并窗口
+COALESCE_CONFIG = dict(BENCH_CONFIG, **{
+    'earthquake.coalesce.enabled': True,
+    'earthquake.coalesce.window': 0.2,
+})
+
+
+def build_burst(events: int, reports: int) -> list:
+    """生成回放消息：每个事件若干报，每报震级/位置略有修正，并夹杂完全重复的报文"""
+    shock_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    messages = []
+    for e in range(events):
+        source = 'cea' if e % 2 == 0 else 'cwa-eew'
+        for r in range(reports):
+            data = {
+                "id": f"{source}_burst_{e}",
+                "shockTime": shock_time,
+                "latitude": 20.0 + e * 1.0 + r * 0.01,
+                "longitude": 121.0,
+                "magnitude": round(5.0 + r * 0.1, 1),
+                "depth": 10,
+                "placeName": "台湾花莲县海域",
+                "updates": r + 1,
+            }
+            message = json.dumps({"type": "update", "source": source, "Data": data})
+            messages.append(message)
+            if r % 3 == 2:
+                messages.append(message)  # 重复报文，应被去重
+    return messages
+
+
+async def legacy_process(message: str, config: dict) -> None:
+    """旧流程：COUNT探测 + 读取旧数据比较 + 推送 + 保存，各自一次查询"""
+    data = json.loads(message)
+    source = data['source']
+    event_data = data['Data']
+    eq_id = event_data['id']
+    row = await db_pool.fetchone("SELECT COUNT(*) FROM earthquakes WHERE source = ? AND id = ?", (source, eq_id))
+    if row[0] > 0:
+        stored = await ws_handler.get_stored_earthquake_data(eq_id, source)
+        if not ws_handler.has_significant_update(stored, event_data):
+            return
+    if not await ws_handler.check_source_enabled(source, event_data, config):
+        return
+    if not await ws_handler.is_within_time_window(event_data, source):
+        return
+    await ws_handler.process_text_message_only(event_data, source, config)
+    await ws_handler.save_earthquake_to_db(event_data, source)
+
+
+async def replay(messages: list, handler, config: dict = BENCH_CONFIG) -> list:
+    """依次回放消息，返回每次推送的入队耗时（秒）"""
+    enqueue_times = []
+    current = {}
+
+    async def record_push(event_data, source, config, target_group=None):
+        enqueue_times.append(time.perf_counter() - current['received'])
+
+    original = ws_handler.process_text_message_only
+    ws_handler.process_text_message_only = record_push
+    try:
+        for message in messages:
+            current['received'] = time.perf_counter()
+            await handler(message, config)
+        # 等待合并推送全部完成
+        while ws_handler._event_pushes:
+            await asyncio.sleep(0.01)
+    finally:
+        ws_handler.process_text_message_only = original
+    return enqueue_times
+
+
+def report(name: str, samples: list, total: float, count: int) -> None:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[max(0, int(len(samples_ms) * 0.95) - 1)]
+    print(f"{name:<8} 推送 {len(samples_ms):4d} 次  入队耗时 平均 {statistics.mean(samples_ms):6.3f} ms  "
+          f"p50 {statistics.median(samples_ms):6.3f} ms  p95 {p95:6.3f} ms  "
+          f"| 回放 {count} 条共 {total * 1000:7.1f} ms")
+
+
+async def main(events: int, reports: int) -> None:
+    import logging
+    logging.disable(logging.INFO)
+
+    messages = build_burst(events, reports)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = []
+        for name, handler in (("旧流程", legacy_process), ("UPSERT", ws_handler.process_message)):
+            await ws_handler.init_db(os.path.join(tmp_dir, f'{len(results)}.db'))
+            ws_handler.processed_ids.clear()
+            ws_handler.event_index.clear()
+            start = time.perf_counter()
+            samples = await replay(messages, handler)
+            results.append((name, samples, time.perf_counter() - start))
+            await db_pool.close_db_pool()
+
+        # 合并推送：只统计推送次数（推送在后台任务中进行，入队耗时不可比）
+        await ws_handler.init_db(os.path.join(tmp_dir, 'coalesce.db'))
+        ws_handler.processed_ids.clear()
+        ws_handler.event_index.clear()
+        coalesced = await replay(messages, ws_handler.process_message, COALESCE_CONFIG)
+        await db_pool.close_db_pool()
+
+    print(f"=== EEW 突发回放（{events} 个事件 × {reports} 报，含重复报文） ===")
+    for name, samples, total in results:
+        report(name, samples, total, len(messages))
+    stats = ws_handler.coalesce_stats
+    print(f"合并推送 推送 {len(coalesced):4d} 次（合并 {stats['merged']} 版，提前推送 {stats['urgent']} 版）")
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    asyncio.run(main(int(argv[0]) if argv else 20, int(argv[1]) if len(argv) > 1 else 15))
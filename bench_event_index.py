@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+时空索引基准测试
+对比旧的 SQL 扫描（ABS(latitude - ?) 条件无法使用索引）与内存时空索引的近期重复检测耗时
+
+用法: python bench_event_index.py [地震表行数]
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import db_pool
+import ws_handler
+
+SQL_SCAN = """
+    SELECT id, shock_time, latitude, longitude, magnitude
+    FROM earthquakes
+    WHERE source = ?
+    AND created_at >= ?
+    AND ABS(latitude - ?) <= 0.5
+    AND ABS(longitude - ?) <= 0.5
+    AND ABS(magnitude - ?) <= 0.3
+"""
+
+
+async def legacy_lookup(event_data: dict, source: str) -> bool:
+    """旧实现：SQL扫描 + Python逐行解析时间"""
+    shock_time = datetime.strptime(event_data['shockTime'], '%Y-%m-%d %H:%M:%S')
+    threshold = datetime.utcnow() - timedelta(minutes=5)
+    rows = await db_pool.fetchall(SQL_SCAN, (source, threshold.strftime('%Y-%m-%d %H:%M:%S'),
+                                             event_data['latitude'], event_data['longitude'],
+                                             event_data['magnitude']))
+    for row in rows:
+        existing = datetime.strptime(row[1], '%Y-%m-%d %H:%M:%S')
+        if abs((shock_time - existing).total_seconds()) < 60:
+            return True
+    return False
+
+
+def random_event(i: int, now: datetime) -> dict:
+    shock_time = now - timedelta(seconds=random.randint(0, 12 * 3600))
+    return {
+        "id": f"bench_{i}",
+        "shockTime": shock_time.strftime('%Y-%m-%d %H:%M:%S'),
+        "latitude": round(random.uniform(20, 45), 2),
+        "longitude": round(random.uniform(75, 135), 2),
+        "magnitude": round(random.uniform(2, 6), 1),
+        "depth": 10,
+        "placeName": "基准测试",
+    }
+
+
+def report(name: str, samples: list) -> None:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(f"{name:<10} 平均 {statistics.mean(samples_ms):8.4f} ms  "
+          f"p50 {statistics.median(samples_ms):8.4f} ms  p95 {p95:8.4f} ms")
+
+
+async def main(rows: int, lookups: int = 500) -> None:
+    import logging
+    logging.disable(logging.INFO)
+    random.seed(42)
+    now = datetime.now()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        await ws_handler.init_db(os.path.join(tmp_dir, 'eqdata.db'))
+        events = [random_event(i, now) for i in range(rows)]
+        await db_pool.executemany("""
+            INSERT INTO earthquakes (id, source, shock_time, latitude, longitude, magnitude, data_json)
+            VALUES (?, 'cenc', ?, ?, ?, ?, '{}')
+        """, [(e['id'], e['shockTime'], e['latitude'], e['longitude'], e['magnitude']) for e in events])
+        ws_handler.event_index.clear()
+        await ws_handler.warm_event_index()
+
+        probes = [random_event(rows + i, now) for i in range(lookups)]
+
+        legacy_samples = []
+        for probe in probes:
+            start = time.perf_counter()
+            await legacy_lookup(probe, 'cenc')
+            legacy_samples.append(time.perf_counter() - start)
+
+        index_samples = []
+        for probe in probes:
+            start = time.perf_counter()
+            await ws_handler.is_recent_duplicate_by_time(probe, 'cenc')
+            index_samples.append(time.perf_counter() - start)
+
+        await db_pool.close_db_pool()
+
+    print(f"=== 近期重复检测耗时（地震表 {rows} 行，{lookups} 次查询） ===")
+    report("SQL扫描", legacy_samples)
+    report("时空索引", index_samples)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
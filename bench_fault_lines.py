@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+断层数据基准测试
+用随机生成的 GMT 断层文件（规模与 CN-faults.gmt 相当），对比每张地图逐行解析整个文件
+与加载一次后按外包框查询的断层叠加层耗时
+
+用法: python bench_fault_lines.py [断层段数] [每段点数]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+from fault_lines import FaultLines
+
+
+def write_gmt(path: str, segments: int, points: int) -> None:
+    random.seed(42)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('# 基准测试断层数据\n')
+        for i in range(segments):
+            f.write(f'> -Z{i}\n')
+            lon, lat = random.uniform(75, 135), random.uniform(18, 53)
+            for _ in range(points):
+                lon += random.uniform(-0.05, 0.05)
+                lat += random.uniform(-0.05, 0.05)
+                f.write(f'{lon:.4f} {lat:.4f}\n')
+
+
+def legacy_query(gmt_path: str, lon_min, lon_max, lat_min, lat_max) -> list:
+    """旧实现：每次逐行解析整个文件，丢弃视野外的点（断层在视野边缘被错误连接）"""
+    faults = []
+    with open(gmt_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    current_fault = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith('>'):
+            if current_fault:
+                faults.append(current_fault)
+            current_fault = []
+        elif line and not line.startswith('#'):
+            parts = line.split()
+            if len(parts) >= 2:
+                try:
+                    lon_val = float(parts[0])
+                    lat_val = float(parts[1])
+                    if lon_min <= lon_val <= lon_max and lat_min <= lat_val <= lat_max:
+                        current_fault.append((lon_val, lat_val))
+                except ValueError:
+                    continue
+    if current_fault:
+        faults.append(current_fault)
+    return faults
+
+
+def report(name: str, samples: list) -> None:
+    samples_ms = [s * 1000 for s in samples]
+    print(f"{name:<10} 平均 {statistics.mean(samples_ms):8.3f} ms  p50 {statistics.median(samples_ms):8.3f} ms  "
+          f"最大 {max(samples_ms):8.3f} ms")
+
+
+def main(segments: int, points: int, maps: int = 20) -> None:
+    random.seed(7)
+    views = []
+    for _ in range(maps):
+        lon, lat = random.uniform(80, 130), random.uniform(22, 48)
+        views.append((lon - 2.7, lon + 2.7, lat - 2.0, lat + 2.0))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        gmt_path = os.path.join(tmp_dir, 'faults.gmt')
+        write_gmt(gmt_path, segments, points)
+
+        legacy = []
+        for view in views:
+            start = time.perf_counter()
+            legacy_query(gmt_path, *view)
+            legacy.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        FaultLines.load(gmt_path)
+        first_load = time.perf_counter() - start
+        start = time.perf_counter()
+        fault_lines = FaultLines.load(gmt_path)
+        cached_load = time.perf_counter() - start
+
+        indexed = []
+        for view in views:
+            start = time.perf_counter()
+            fault_lines.query(*view)
+            indexed.append(time.perf_counter() - start)
+
+    print(f"=== 断层叠加层（{segments} 段 × {points} 点，{maps} 张地图） ===")
+    print(f"首次解析并写入缓存 {first_load * 1000:.1f} ms，读取 .npz 缓存 {cached_load * 1000:.1f} ms")
+    report("逐行解析", legacy)
+    report("外包框查询", indexed)
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    main(int(argv[0]) if argv else 6000, int(argv[1]) if len(argv) > 1 else 40)
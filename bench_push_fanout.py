@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+群推送扇出基准测试
+用模拟的 NapCat HTTP 延迟和绘图耗时，对比逐群串行推送与并发扇出时，
+首个群和最后一个群收到地震消息（以及地图）的延迟
+
+用法: python bench_push_fanout.py [群数量] [单次发送延迟ms] [绘图耗时ms]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import ws_handler
+
+
+def make_config(group_count: int) -> dict:
+    return {
+        'groups': {str(100000 + i): {} for i in range(group_count)},
+        'message_templates': {'default': '{source_upper} {placeName} M{magnitude}'},
+        'draw_sources': ['cea'],
+        'earthquake.push.concurrency': 8,
+    }
+
+
+EVENT = {
+    "id": "bench_fanout",
+    "shockTime": "2026-02-16 10:30:00",
+    "latitude": 30.0,
+    "longitude": 103.0,
+    "magnitude": 5.2,
+    "depth": 10,
+    "placeName": "四川汶川县",
+}
+
+
+async def serial_push(event_data: dict, source: str, config: dict, delivered: list, started_at: float) -> None:
+    """旧实现：逐群 await 文本，再绘图（首个群绘制，之后复用缓存）并发送图片"""
+    image_path = None
+    for group_id in config['groups']:
+        await ws_handler.send_earthquake_message(group_id, event_data, source, config)
+        delivered.append((time.perf_counter() - started_at) * 1000)
+        if image_path is None:
+            image_path = await ws_handler.draw_earthquake_async(event_data, source)
+        await ws_handler.send_group_img(group_id, image_path)
+
+
+async def main(group_count: int, rtt_ms: float, draw_ms: float) -> None:
+    import logging
+    logging.disable(logging.INFO)
+    config = make_config(group_count)
+
+    async def fake_send_group_msg(group_id, text, no_merge_forward=False):
+        await asyncio.sleep(rtt_ms / 1000)
+
+    async def fake_send_group_img(group_id, file_path):
+        await asyncio.sleep(rtt_ms / 1000)
+
+    async def fake_draw(event_data, source=None):
+        await asyncio.sleep(draw_ms / 1000)
+        return os.path.abspath(__file__)
+
+    ws_handler.send_group_msg = fake_send_group_msg
+    ws_handler.send_group_img = fake_send_group_img
+    ws_handler.draw_earthquake_async = fake_draw
+
+    delivered = []
+    started_at = time.perf_counter()
+    await serial_push(EVENT, 'cea', config, delivered, started_at)
+    serial_total = (time.perf_counter() - started_at) * 1000
+
+    ws_handler.push_latency_stats.clear()
+    started_at = time.perf_counter()
+    await ws_handler.process_text_message_only(EVENT, 'cea', config)
+    fanout_total = (time.perf_counter() - started_at) * 1000
+    fanout = sorted(stats['last'] for stats in ws_handler.get_push_latency_stats().values())
+
+    print(f"=== 推送扇出（{group_count} 个群，单次发送 {rtt_ms:.0f} ms，绘图 {draw_ms:.0f} ms，并发上限 "
+          f"{config['earthquake.push.concurrency']}） ===")
+    print(f"逐群串行  文本: 首个群 {delivered[0]:8.1f} ms  最后一个群 {delivered[-1]:8.1f} ms  | 全部图片送达 {serial_total:8.1f} ms")
+    print(f"并发扇出  文本: 首个群 {fanout[0]:8.1f} ms  最后一个群 {fanout[-1]:8.1f} ms  | 全部图片送达 {fanout_total:8.1f} ms")
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    asyncio.run(main(int(argv[0]) if argv else 30,
+                     float(argv[1]) if len(argv) > 1 else 80,
+                     float(argv[2]) if len(argv) > 2 else 3000))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+气象预警订阅匹配基准测试
+随机生成大量订阅的省市区名称，对比逐个地区做 `in` 子串判断的旧实现
+与 Aho–Corasick 匹配器扫描一遍标题的耗时
+
+用法: python bench_region_matcher.py [订阅地区数] [标题数]
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+from region_matcher import RegionMatcher
+
+PROVINCES = ["北京", "天津", "河北", "山西", "内蒙古", "辽宁", "吉林", "黑龙江", "上海", "江苏", "浙江", "安徽",
+             "福建", "江西", "山东", "河南", "湖北", "湖南", "广东", "广西", "海南", "重庆", "四川", "贵州",
+             "云南", "西藏", "陕西", "甘肃", "青海", "宁夏", "新疆", "台湾", "香港", "澳门"]
+CHARS = "东南西北中安平宁阳山江河海湖林城州德昌兴华康泰永丰新定宝龙明清"
+SIGNALS = ["暴雨蓝色", "大风黄色", "高温橙色", "寒潮蓝色", "雷电黄色", "道路结冰橙色"]
+
+
+def random_name(suffix: str) -> str:
+    return ''.join(random.choice(CHARS) for _ in range(random.randint(1, 3))) + suffix
+
+
+def make_locations(count: int) -> list:
+    locations = set()
+    while len(locations) < count:
+        locations.add(f"{random.choice(PROVINCES)}{random_name('市')}{random_name(random.choice('区县'))}")
+    return sorted(locations)
+
+
+def make_titles(locations: list, count: int) -> list:
+    titles = []
+    for i in range(count):
+        # 一半标题命中已订阅的地区，其余为随机地区
+        location = random.choice(locations) if i % 2 == 0 else f"{random.choice(PROVINCES)}省{random_name('市')}"
+        titles.append(f"{location}气象台发布{random.choice(SIGNALS)}预警信号")
+    return titles
+
+
+def report(name: str, samples: list) -> None:
+    samples_us = [s * 1e6 for s in samples]
+    print(f"{name:<10} 平均 {statistics.mean(samples_us):9.1f} µs  p50 {statistics.median(samples_us):9.1f} µs  "
+          f"最大 {max(samples_us):9.1f} µs")
+
+
+def main(location_count: int, title_count: int = 200) -> None:
+    random.seed(42)
+    locations = make_locations(location_count)
+    titles = make_titles(locations, title_count)
+
+    start = time.perf_counter()
+    matcher = RegionMatcher(locations + PROVINCES)
+    matcher.find_all("")  # 触发构建失败指针
+    build = time.perf_counter() - start
+
+    naive, automaton = [], []
+    for title in titles:
+        start = time.perf_counter()
+        expected = {p for p in PROVINCES if p in title} | {loc for loc in locations if loc in title}
+        naive.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        found = matcher.find_all(title)
+        automaton.append(time.perf_counter() - start)
+        assert found == expected, title
+
+    # 增量订阅/退订后的首次匹配（重建失败指针）
+    start = time.perf_counter()
+    matcher.add(f"{PROVINCES[0]}{random_name('市')}新区")
+    matcher.find_all(titles[0])
+    rebuild = time.perf_counter() - start
+
+    print(f"=== 订阅地区匹配（{location_count} 个地区，{title_count} 条标题） ===")
+    print(f"构建自动机 {build * 1000:.1f} ms，新增一个地区后重建 {rebuild * 1000:.1f} ms")
+    report("逐个子串", naive)
+    report("自动机", automaton)
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    main(int(argv[0]) if argv else 10000, int(argv[1]) if len(argv) > 1 else 200)
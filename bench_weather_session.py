@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+和风天气会话复用基准测试
+用本地 aiohttp 服务模拟和风天气 API，对比每次请求新建会话（旧实现）与共享连接池时，
+重复调用 /实时天气 的 p50/p95 延迟以及服务端收到的新连接数
+
+用法: python bench_weather_session.py [请求次数] [并发数] [服务端处理延迟ms]
+注意: 本地服务为明文 HTTP，真实环境中每次新建会话还要额外付出 DNS 解析和 TLS 握手的开销
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import weather_api
+from weather_api import QWeatherAPI
+
+NOW_RESPONSE = {
+    "code": "200",
+    "now": {"obsTime": "2026-02-16T10:30+08:00", "temp": "3", "text": "晴", "windDir": "北风", "windScale": "3"},
+}
+
+
+def percentile(samples: list, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, int(len(ordered) * p) - 1)]
+
+
+async def start_stub(delay_ms: float, peers: set):
+    async def handle(request):
+        peers.add(request.transport.get_extra_info('peername'))
+        await asyncio.sleep(delay_ms / 1000)
+        return web.json_response(NOW_RESPONSE)
+
+    app = web.Application()
+    app.router.add_get('/v7/weather/now', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+async def run_case(api: QWeatherAPI, shared: bool, requests: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            params = {"location": str(101010100 + i % 50), "lang": "zh", "unit": "m"}
+            if shared:
+                result = await api.weather_now(params["location"])
+            else:
+                # 旧实现：每次调用新建并关闭会话
+                async with aiohttp.ClientSession() as session:
+                    result = await api._make_request(session, "/v7/weather/now", params)
+            assert result and result["code"] == "200"
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+async def main(requests: int, concurrency: int, delay_ms: float) -> None:
+    import logging
+    logging.disable(logging.INFO)
+
+    print(f"请求次数: {requests}，并发: {concurrency}，服务端延迟: {delay_ms:.0f} ms\n")
+    print(f"{'模式':<12}{'p50(ms)':>10}{'p95(ms)':>10}{'总耗时(ms)':>12}{'新连接数':>10}")
+    for label, shared in (("每次新建会话", False), ("共享连接池", True)):
+        peers = set()
+        runner, port = await start_stub(delay_ms, peers)
+        # 关闭缓存，保证每次调用都真正发起请求
+        api = QWeatherAPI({'qweather': {'api_host': f'http://127.0.0.1:{port}', 'api_key': 'bench',
+                                        'cache_enabled': False}})
+        try:
+            started = time.perf_counter()
+            latencies = await run_case(api, shared, requests, concurrency)
+            total = (time.perf_counter() - started) * 1000
+        finally:
+            await weather_api.close_weather_session()
+            await runner.cleanup()
+        print(f"{label:<12}{percentile(latencies, 0.5):>10.2f}{percentile(latencies, 0.95):>10.2f}"
+              f"{total:>12.1f}{len(peers):>10}")
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    delay_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 2
+    asyncio.run(main(requests, concurrency, delay_ms))
@@ -9,7 +9,7 @@ import logging
 import os
 import signal
 import sys
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 import websockets
 
@@ -27,12 +27,18 @@ except ImportError:
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-# 全局变量用于跟踪广播模式
-broadcast_mode = {}  # {user_id: True} 表示该用户处于广播模式
-
 # UAPI可用性标志
 UAPI_AVAILABLE = True
 
+# 命令并发处理默认值（可通过 basic.command_concurrency / command_timeout / command_timeouts 配置）
+DEFAULT_COMMAND_CONCURRENCY = 16
+DEFAULT_COMMAND_TIMEOUT = 60
+_command_semaphore = None
+_command_tasks = set()
+# 用户ID -> [锁, 该用户排队或处理中的命令数]，同一用户的命令按到达顺序处理
+_user_command_locks = {}
+command_stats = {'in_flight': 0, 'queued': 0, 'handled': 0, 'timeout': 0, 'failed': 0}
+
 # 别名系统可用性标志
 try:
     from alias_handler import init_alias_system
@@ -40,11 +46,6 @@ try:
 except ImportError:
     ALIAS_AVAILABLE = False
 
-# 用于在模块间共享状态
-def get_broadcast_mode():
-    return broadcast_mode
-
-
 def setup_logging(log_file: str) -> None:
     """设置日志"""
     # 确保data目录存在
@@ -83,22 +84,82 @@ async def close_sender():
     await close_msg_sender()
 
 
-async def init_sender(napcat_url: str, token: str):
+async def init_sender(napcat_url: str, token: str, image_mode: str = 'base64', image_url_prefix: str = '',
+                      payload_cache_mb: int = 32, send_queue: dict = None):
     """初始化消息发送器"""
     from message_sender import init_sender as init_msg_sender
-    await init_msg_sender(napcat_url, token)
+    await init_msg_sender(napcat_url, token, image_mode, image_url_prefix, payload_cache_mb * 1024 * 1024,
+                          send_queue)
 
 
-async def napcat_ws_handler(websocket, config):
-    """处理NapCat WebSocket连接"""
+def get_command_timeout(event: Dict[str, Any], config) -> Optional[float]:
+    """
+    命令超时时间：basic.command_timeouts 中按命令名（去掉前缀/）单独配置，否则使用默认值
+    广播模式下的消息要逐群发送（受发送队列限速），耗时随群数增长，不设超时（返回None），避免广播中途被取消
+    """
+    from command_handler import is_broadcast_mode
+
+    if is_broadcast_mode(str(event.get("user_id", ""))):
+        return None
+    command = event.get("raw_message", "").strip().split(maxsplit=1)
+    name = command[0].lstrip('/') if command else ''
+    timeouts = config.get('basic.command_timeouts', {}) or {}
+    return timeouts.get(name, config.get('basic.command_timeout', DEFAULT_COMMAND_TIMEOUT))
+
+
+async def run_command(event: Dict[str, Any], config) -> None:
+    """在并发上限内处理一条群消息：同一用户按顺序处理，每条命令有超时"""
     from command_handler import handle_command
 
+    user_id = str(event.get("user_id", ""))
+    entry = _user_command_locks.get(user_id)
+    if entry is None:
+        entry = _user_command_locks[user_id] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    command_stats['queued'] += 1
+    try:
+        # 先按用户排队，再占用并发名额，避免同一用户的排队命令占满名额
+        async with entry[0]:
+            async with _command_semaphore:
+                command_stats['queued'] -= 1
+                command_stats['in_flight'] += 1
+                timeout = get_command_timeout(event, config)
+                try:
+                    await asyncio.wait_for(handle_command(event, config), timeout=timeout)
+                    command_stats['handled'] += 1
+                except asyncio.TimeoutError:
+                    command_stats['timeout'] += 1
+                    logging.warning(f"命令处理超时（{timeout}秒）: {event.get('raw_message', '')[:50]} "
+                                    f"来自群 {event.get('group_id')} 用户 {user_id}")
+                except Exception as e:
+                    command_stats['failed'] += 1
+                    logging.error(f"NapCat WebSocket 处理错误: {e}")
+                finally:
+                    command_stats['in_flight'] -= 1
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            _user_command_locks.pop(user_id, None)
+
+
+async def napcat_ws_handler(websocket, config):
+    """处理NapCat WebSocket连接（每条群消息作为独立任务处理，慢速命令不阻塞其他命令）"""
+    global _command_semaphore
+    if _command_semaphore is None:
+        _command_semaphore = asyncio.Semaphore(config.get('basic.command_concurrency', DEFAULT_COMMAND_CONCURRENCY))
+
     async for message in websocket:
         try:
             event = json.loads(message)
-            await handle_command(event, config)
         except Exception as e:
             logging.error(f"NapCat WebSocket 处理错误: {e}")
+            continue
+        # 心跳、生命周期等元事件无需处理
+        if event.get("post_type") != "message":
+            continue
+        task = asyncio.create_task(run_command(event, config))
+        _command_tasks.add(task)
+        task.add_done_callback(_command_tasks.discard)
 
 
 async def connect_to_fan_ws(config):
@@ -110,11 +171,13 @@ async def connect_to_fan_ws(config):
 async def periodic_cleanup():
     """定期清理任务"""
     from ws_handler import cleanup_processed_ids
+    from weather_api import compact_weather_cache
     while True:
         try:
             # 每小时执行一次清理
             await asyncio.sleep(3600)
             await cleanup_processed_ids()
+            await compact_weather_cache()
         except Exception as e:
             logging.error(f"定期清理任务出错: {e}")
 
@@ -140,7 +203,20 @@ def validate_config(config: Dict[str, Any]) -> bool:
 async def shutdown_handler():
     """关闭处理程序"""
     logging.info("正在关闭Bydbot...")
+    from ws_handler import close_fan_dispatcher
+    await close_fan_dispatcher()
+    if CMA_WEATHER_SUBSCRIBER_AVAILABLE:
+        from cma_weather_subscriber import close_cma_weather_subscriber
+        await close_cma_weather_subscriber()
     await close_sender()
+    from weather_api import close_weather_session
+    await close_weather_session()
+    from uapi_client import close_uapi_session
+    await close_uapi_session()
+    from db_pool import close_db_pool
+    await close_db_pool()
+    from draw_eq import close_render_pool
+    close_render_pool()
     logging.info("Bydbot已关闭")
 
 
@@ -255,7 +331,27 @@ async def main():
     # 加载最近2周的地震消息ID到内存
     from ws_handler import processed_ids
     recent_ids = await load_recent_ids_from_db()
-    processed_ids.update(recent_ids)
+    processed_ids.load(recent_ids)
+
+    # 加载最近24小时的地震事件到时空索引
+    from ws_handler import warm_event_index
+    await warm_event_index()
+
+    # 加载未过期的天气缓存，重启后热门城市无需重新请求
+    from weather_api import warm_weather_cache
+    await warm_weather_cache(config)
+
+    # UAPI 响应缓存的上限
+    from uapi_client import configure_uapi_cache
+    configure_uapi_cache(config)
+
+    # 启动绘图进程池
+    from draw_eq import init_render_pool
+    init_render_pool(
+        workers=config.get('earthquake.drawing.workers', 2),
+        queue_size=config.get('earthquake.drawing.queue_size', 8),
+        timeout=config.get('draw_timeout', 20)
+    )
 
     # 初始化消息发送器
     # 支持新旧配置格式
@@ -265,7 +361,11 @@ async def main():
     else:
         napcat_url = config.get('napcat_http_url', 'http://127.0.0.1:3000')
         token = config.get('napcat_token', '')
-    await init_sender(napcat_url, token)
+    await init_sender(napcat_url, token,
+                      image_mode=config.get('napcat.image_mode', 'base64'),
+                      image_url_prefix=config.get('napcat.image_url_prefix', ''),
+                      payload_cache_mb=config.get('napcat.payload_cache_mb', 32),
+                      send_queue=config.get('napcat.send_queue', {}))
 
     # 初始化CMA气象预警订阅器
     if CMA_WEATHER_SUBSCRIBER_AVAILABLE:
@@ -10,33 +10,53 @@ import re
 import time
 from datetime import datetime
 from typing import Dict, List, Set, Tuple, Optional
-import aiosqlite
 import os
 import requests
 import aiohttp
 from bs4 import BeautifulSoup
 
-from message_sender import send_group_msg
+import db_pool
+from dedup_store import DedupStore
+from region_matcher import RegionMatcher
+from message_sender import send_group_msg, send_priority, PRIORITY_ALERT
 from weather_alarm_client import CMWeatherAlarmClient
 
+# 内存中保留已处理预警ID的时长和数量上限
+PROCESSED_ALARM_TTL = 3 * 24 * 3600
+PROCESSED_ALARM_MAX_ENTRIES = 20000
+# 获取详情或推送失败的预警在之后的轮询中重试，最多尝试的次数
+MAX_ALARM_ATTEMPTS = 3
+
 
 class CMAWeatherSubscriber:
     def __init__(self, config: Dict):
         self.config = config
-        self.client = CMWeatherAlarmClient()
+        self.client = CMWeatherAlarmClient(
+            timeout=config.get('cma_weather.timeout', 15),
+            detail_concurrency=config.get('cma_weather.detail_concurrency', 4),
+            detail_cache_ttl=config.get('cma_weather.detail_cache_ttl', 24 * 3600),
+        )
         self.subscribers = {}  # {location: [(group_id, user_id), ...]}  # 支持省市级别订阅
         self.location_subscribers = {}  # {full_location: [(group_id, user_id), ...]}  # 新增：支持省市区三级格式订阅
+        # 全部订阅的省份/地区名称（不含"全国"），扫描一遍标题即可找出所有匹配的订阅
+        self.region_matcher = RegionMatcher()
         self.last_checked_time = 0
-        self.check_interval = 7 * 60  # 7分钟检查一次
-        self.last_processed_alarms = set()  # 已处理的预警ID集合
-        self.db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
+        # 增量轮询：没有新预警时只需一次小请求、不查数据库，可以每分钟检查一次
+        self.check_interval = config.get('cma_weather.check_interval', 60)
+        self.page_size = config.get('cma_weather.page_size', 10)
+        # 已处理（包括没有匹配订阅者）的预警ID，以及其中最新的发布时间（水位线）
+        self.processed_alarms = DedupStore(ttl_seconds=PROCESSED_ALARM_TTL, max_entries=PROCESSED_ALARM_MAX_ENTRIES)
+        self.watermark = ""
+        # 尚未推送完成的预警ID -> (已尝试次数, 已成功推送的群)
+        self.pending_deliveries: Dict[str, Tuple[int, Set[str]]] = {}
+        self.check_task: Optional[asyncio.Task] = None
         # 图标缓存目录
         self.icon_cache_dir = os.path.join(os.path.dirname(__file__), 'pictures', 'weather_icons')
         os.makedirs(self.icon_cache_dir, exist_ok=True)
         
     async def init_db(self):
         """初始化订阅相关的数据库表"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with db_pool.transaction() as db:
             # 创建订阅表 - 添加新的列以支持省市区格式
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS weather_subscriptions (
@@ -61,66 +81,76 @@ class CMAWeatherSubscriber:
                 )
             ''')
 
-            await db.commit()
-
         logging.info("CMA气象预警订阅数据库初始化完成")
         
     async def load_subscriptions(self):
         """从数据库加载订阅信息"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                # 检查表是否存在
-                cursor = await db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='weather_subscriptions'")
-                table_exists = await cursor.fetchone()
-                if not table_exists:
-                    logging.info("气象预警订阅表不存在，创建新表")
-                    await self.init_db()
-                else:
-                    # 检查表结构，如果缺少新列则添加
-                    cursor = await db.execute("PRAGMA table_info(weather_subscriptions)")
-                    columns = await cursor.fetchall()
-                    column_names = [col[1] for col in columns]
-                    
+            # 检查表是否存在
+            table_exists = await db_pool.fetchone("SELECT name FROM sqlite_master WHERE type='table' AND name='weather_subscriptions'")
+            if not table_exists:
+                logging.info("气象预警订阅表不存在，创建新表")
+                await self.init_db()
+            else:
+                # 检查表结构，如果缺少新列则添加
+                columns = await db_pool.fetchall("PRAGMA table_info(weather_subscriptions)")
+                column_names = [col[1] for col in columns]
+
+                async with db_pool.transaction() as db:
                     # 检查是否缺少location_type列
                     if 'location_type' not in column_names:
                         logging.info("检测到旧版本数据库，正在更新表结构...")
                         await db.execute("ALTER TABLE weather_subscriptions ADD COLUMN location_type TEXT DEFAULT 'province'")
-                    
+
                     # 检查是否缺少full_location列
                     if 'full_location' not in column_names:
                         await db.execute("ALTER TABLE weather_subscriptions ADD COLUMN full_location TEXT DEFAULT ''")
-                    
-                    await db.commit()
-                
-                # 加载订阅数据
-                async with db.execute("SELECT province, group_id, user_id, location_type, full_location FROM weather_subscriptions") as cursor:
-                    rows = await cursor.fetchall()
-                    for row in rows:
-                        province, group_id, user_id, location_type, full_location = row
-                        # 使用完整的省市区路径作为键
-                        location_key = full_location if location_type == 'location' and full_location else province
-                        if location_key not in self.subscribers:
-                            self.subscribers[location_key] = []
-                        self.subscribers[location_key].append((group_id, user_id))
-                    logging.info(f"加载了 {len(rows)} 条气象预警订阅记录")
+
+            # 加载订阅数据
+            rows = await db_pool.fetchall("SELECT province, group_id, user_id, location_type, full_location FROM weather_subscriptions")
+            for row in rows:
+                province, group_id, user_id, location_type, full_location = row
+                # 地区订阅使用完整的省市区路径作为键，与 subscribe_location 保持一致
+                if location_type == 'location' and full_location:
+                    subscribers = self.location_subscribers.setdefault(full_location, [])
+                    location_key = full_location
+                else:
+                    subscribers = self.subscribers.setdefault(province, [])
+                    location_key = province
+                if (group_id, user_id) not in subscribers:
+                    subscribers.append((group_id, user_id))
+                self._index_location(location_key)
+            logging.info(f"加载了 {len(rows)} 条气象预警订阅记录")
         except Exception as e:
             logging.error(f"加载气象预警订阅记录失败: {e}")
         
+    async def load_processed_alarms(self):
+        """从数据库加载近期已推送的预警ID，并以其中最新的发布时间作为水位线"""
+        try:
+            rows = await db_pool.fetchall(
+                "SELECT alertid, issuetime, CAST(strftime('%s', created_at) AS REAL) FROM processed_weather_alarms WHERE created_at >= datetime('now', ?)",
+                (f"-{PROCESSED_ALARM_TTL} seconds",)
+            )
+            self.processed_alarms.load((alertid, created_at) for alertid, _, created_at in rows)
+            self.watermark = max((issuetime for _, issuetime, _ in rows), default="")
+            logging.info(f"加载了 {len(rows)} 条已处理的气象预警，水位线: {self.watermark or '无'}")
+        except Exception as e:
+            logging.error(f"加载已处理的气象预警失败: {e}")
+
     async def subscribe_province(self, province: str, group_id: str, user_id: str) -> bool:
         """订阅特定省份的气象预警"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    "INSERT OR IGNORE INTO weather_subscriptions (province, group_id, user_id) VALUES (?, ?, ?)",
-                    (province, group_id, user_id)
-                )
-                await db.commit()
+            await db_pool.execute(
+                "INSERT OR IGNORE INTO weather_subscriptions (province, group_id, user_id) VALUES (?, ?, ?)",
+                (province, group_id, user_id)
+            )
                 
             # 更新内存中的订阅信息
             if province not in self.subscribers:
                 self.subscribers[province] = []
             if (group_id, user_id) not in self.subscribers[province]:
                 self.subscribers[province].append((group_id, user_id))
+            self._index_location(province)
                 
             logging.info(f"用户 {user_id} 在群 {group_id} 订阅了 {province} 的气象预警")
             return True
@@ -140,18 +170,17 @@ class CMAWeatherSubscriber:
                 return False
             
             # 使用省份作为主要匹配字段，但存储完整路径
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    "INSERT OR IGNORE INTO weather_subscriptions (province, group_id, user_id, location_type, full_location) VALUES (?, ?, ?, 'location', ?)",
-                    (province, group_id, user_id, full_location)
-                )
-                await db.commit()
+            await db_pool.execute(
+                "INSERT OR IGNORE INTO weather_subscriptions (province, group_id, user_id, location_type, full_location) VALUES (?, ?, ?, 'location', ?)",
+                (province, group_id, user_id, full_location)
+            )
                 
             # 更新内存中的订阅信息
             if full_location not in self.location_subscribers:
                 self.location_subscribers[full_location] = []
             if (group_id, user_id) not in self.location_subscribers[full_location]:
                 self.location_subscribers[full_location].append((group_id, user_id))
+            self._index_location(full_location)
                 
             logging.info(f"用户 {user_id} 在群 {group_id} 订阅了 {full_location} 的气象预警")
             return True
@@ -163,12 +192,10 @@ class CMAWeatherSubscriber:
     async def unsubscribe_location(self, full_location: str, group_id: str, user_id: str) -> bool:
         """取消订阅特定地区的气象预警（支持省市区格式）"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    "DELETE FROM weather_subscriptions WHERE full_location=? AND group_id=? AND user_id=? AND location_type='location'",
-                    (full_location, group_id, user_id)
-                )
-                await db.commit()
+            await db_pool.execute(
+                "DELETE FROM weather_subscriptions WHERE full_location=? AND group_id=? AND user_id=? AND location_type='location'",
+                (full_location, group_id, user_id)
+            )
                 
             # 更新内存中的订阅信息
             if full_location in self.location_subscribers:
@@ -178,6 +205,7 @@ class CMAWeatherSubscriber:
                 ]
                 if not self.location_subscribers[full_location]:
                     del self.location_subscribers[full_location]
+                    self._unindex_location(full_location)
                     
             logging.info(f"用户 {user_id} 在群 {group_id} 取消订阅了 {full_location} 的气象预警")
             return True
@@ -189,12 +217,10 @@ class CMAWeatherSubscriber:
     async def unsubscribe_province(self, province: str, group_id: str, user_id: str) -> bool:
         """取消订阅特定省份的气象预警"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    "DELETE FROM weather_subscriptions WHERE province=? AND group_id=? AND user_id=?",
-                    (province, group_id, user_id)
-                )
-                await db.commit()
+            await db_pool.execute(
+                "DELETE FROM weather_subscriptions WHERE province=? AND group_id=? AND user_id=?",
+                (province, group_id, user_id)
+            )
                 
             # 更新内存中的订阅信息
             if province in self.subscribers:
@@ -204,6 +230,7 @@ class CMAWeatherSubscriber:
                 ]
                 if not self.subscribers[province]:
                     del self.subscribers[province]
+                    self._unindex_location(province)
                     
             logging.info(f"用户 {user_id} 在群 {group_id} 取消订阅了 {province} 的气象预警")
             return True
@@ -216,12 +243,10 @@ class CMAWeatherSubscriber:
         """订阅全国气象预警（接收所有预警）"""
         try:
             # 使用特殊标识"全国"作为省份字段
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    "INSERT OR IGNORE INTO weather_subscriptions (province, group_id, user_id, location_type, full_location) VALUES (?, ?, ?, 'nationwide', '全国')",
-                    ("全国", group_id, user_id)
-                )
-                await db.commit()
+            await db_pool.execute(
+                "INSERT OR IGNORE INTO weather_subscriptions (province, group_id, user_id, location_type, full_location) VALUES (?, ?, ?, 'nationwide', '全国')",
+                ("全国", group_id, user_id)
+            )
                 
             # 更新内存中的订阅信息
             if "全国" not in self.subscribers:
@@ -239,12 +264,10 @@ class CMAWeatherSubscriber:
     async def unsubscribe_nationwide(self, group_id: str, user_id: str) -> bool:
         """取消订阅全国气象预警"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    "DELETE FROM weather_subscriptions WHERE province='全国' AND group_id=? AND user_id=? AND location_type='nationwide'",
-                    (group_id, user_id)
-                )
-                await db.commit()
+            await db_pool.execute(
+                "DELETE FROM weather_subscriptions WHERE province='全国' AND group_id=? AND user_id=? AND location_type='nationwide'",
+                (group_id, user_id)
+            )
                 
             # 更新内存中的订阅信息
             if "全国" in self.subscribers:
@@ -265,32 +288,47 @@ class CMAWeatherSubscriber:
     async def get_user_subscriptions(self, user_id: str) -> List[Tuple[str, str, str]]:
         """获取用户的订阅列表 (display_name, group_id, location_type)"""
         subscriptions = []
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute(
-                "SELECT province, group_id, location_type, full_location FROM weather_subscriptions WHERE user_id=?", 
-                (user_id,)
-            ) as cursor:
-                rows = await cursor.fetchall()
-                for province, group_id, location_type, full_location in rows:
-                    # 根据订阅类型决定显示名称
-                    if location_type == 'location' and full_location:
-                        display_name = full_location  # 显示完整地区名称
-                    else:
-                        display_name = province  # 显示省份名称
-                    subscriptions.append((display_name, group_id, location_type))
+        rows = await db_pool.fetchall(
+            "SELECT province, group_id, location_type, full_location FROM weather_subscriptions WHERE user_id=?", 
+            (user_id,)
+        )
+        for province, group_id, location_type, full_location in rows:
+            # 根据订阅类型决定显示名称
+            if location_type == 'location' and full_location:
+                display_name = full_location  # 显示完整地区名称
+            else:
+                display_name = province  # 显示省份名称
+            subscriptions.append((display_name, group_id, location_type))
                 
         return subscriptions
         
     async def get_subscribed_provinces(self) -> List[str]:
         """获取所有被订阅的省份列表"""
-        provinces = set()
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT DISTINCT province FROM weather_subscriptions") as cursor:
-                rows = await cursor.fetchall()
-                provinces = {row[0] for row in rows}
+        rows = await db_pool.fetchall("SELECT DISTINCT province FROM weather_subscriptions")
+        provinces = {row[0] for row in rows}
                 
         return list(provinces)
         
+    def _index_location(self, location_key: str) -> None:
+        """把订阅的省份/地区名称加入匹配器（"全国"订阅不按名称匹配）"""
+        if location_key != "全国":
+            self.region_matcher.add(location_key)
+
+    def _unindex_location(self, location_key: str) -> None:
+        """名称不再被任何订阅使用时从匹配器移除"""
+        if location_key not in self.subscribers and location_key not in self.location_subscribers:
+            self.region_matcher.discard(location_key)
+
+    def match_subscribers(self, title: str) -> List[Tuple[str, str]]:
+        """返回与预警标题匹配的全部订阅者 (group_id, user_id)，同一订阅者只出现一次"""
+        matched = []
+        for location_key in sorted(self.region_matcher.find_all(title)):
+            matched.extend(self.subscribers.get(location_key, ()))
+            matched.extend(self.location_subscribers.get(location_key, ()))
+        # 全国订阅接收所有预警
+        matched.extend(self.subscribers.get("全国", ()))
+        return list(dict.fromkeys(matched))
+
     def extract_province_from_title(self, title: str) -> List[str]:
         """从预警标题中提取省份信息"""
         # 常见的中国省份列表（不包含"省"、"市"、"自治区"、"特别行政区"等后缀）
@@ -393,93 +431,121 @@ class CMAWeatherSubscriber:
             return
             
         self.last_checked_time = current_time
-        logging.info("开始检查CMA气象预警...")
+        logging.debug("开始检查CMA气象预警...")
         
         try:
-            # 获取最新的预警信息
-            latest_alarms = self.client.get_latest_alarms(count=20)
-            
-            if not latest_alarms:
-                logging.warning("未能获取到最新的气象预警信息")
+            # 增量获取新预警：遇到已处理的预警或早于水位线的预警即停止翻页
+            self.processed_alarms.evict_expired()
+            new_alarms = await self.client.get_new_alarms(
+                self.processed_alarms.__contains__, self.watermark, max_count=20, page_size=self.page_size)
+
+            # 上次轮询后已不在列表中的待重试预警不再跟踪
+            seen = {alarm.get('alertid', '') for alarm in new_alarms}
+            for alertid in [alertid for alertid in self.pending_deliveries if alertid not in seen]:
+                del self.pending_deliveries[alertid]
+
+            if not new_alarms:
                 return
                 
-            # 检查每个预警是否与订阅的省份匹配
-            for alarm in latest_alarms:
-                alertid = alarm.get('alertid', '')
-                title = alarm.get('title', '')
-                issuetime = alarm.get('issuetime', '')
-                
-                # 检查是否已经处理过这个预警
-                async with aiosqlite.connect(self.db_path) as db:
-                    async with db.execute(
-                        "SELECT 1 FROM processed_weather_alarms WHERE alertid=?", 
-                        (alertid,)
-                    ) as cursor:
-                        exists = await cursor.fetchone()
-                        
-                if exists:
-                    continue  # 已经处理过，跳过
-                    
-                # 提取标题中的省份信息
-                provinces_in_title = self.extract_province_from_title(title)
-                
-                # 检查是否有订阅的省份匹配
-                matched_subscribers = []
-                
-                # 检查普通省份订阅
-                for province in provinces_in_title:
-                    if province in self.subscribers:
-                        matched_subscribers.extend(self.subscribers[province])
-                
-                # 检查全国订阅（接收所有预警）
-                if "全国" in self.subscribers:
-                    matched_subscribers.extend(self.subscribers["全国"])
-                    logging.info(f"全国订阅者匹配到预警: {title}")
-                
-                # 检查地区级订阅
-                for full_location, subscribers_list in self.location_subscribers.items():
-                    # 简单匹配逻辑
-                    if full_location in title:
-                        matched_subscribers.extend(subscribers_list)
-                        logging.info(f"地区订阅者 {full_location} 匹配到预警: {title}")
-                        
+            # 检查每个预警是否与订阅的省份匹配，先筛选出需要推送的预警
+            unmatched_alarms = []
+            pending_alarms = []
+            for alarm in new_alarms:
+                # 一次扫描标题，找出订阅了标题中省份/地区的订阅者（以及全国订阅者）
+                matched_subscribers = self.match_subscribers(alarm.get('title', ''))
                 if not matched_subscribers:
-                    continue  # 没有匹配的订阅者，跳过
-                    
-                # 获取预警详情
-                detail = self.client.get_alarm_detail(alarm.get('url', ''))
-                
-                # 保存已处理的预警
-                async with aiosqlite.connect(self.db_path) as db:
-                    await db.execute(
-                        "INSERT OR IGNORE INTO processed_weather_alarms (alertid, title, issuetime) VALUES (?, ?, ?)",
-                        (alertid, title, issuetime)
-                    )
-                    await db.commit()
-                    
-                # 发送预警给所有匹配的订阅者
-                for group_id, user_id in matched_subscribers:
-                    try:
-                        # 构建预警消息
-                        message, icon_path = await self.build_warning_message(alarm, detail, user_id, group_id)
-                        
-                        # 使用复合消息发送函数，在同一消息中发送文本和图片，并正确@用户
-                        from message_sender import send_group_msg_with_text_and_image
-                        success = await send_group_msg_with_text_and_image(group_id, message, icon_path, user_id)
-                        
-                        if success:
-                            logging.info(f"成功发送预警消息到群 {group_id} @用户 {user_id}")
-                        else:
-                            logging.error(f"发送预警消息到群 {group_id} @用户 {user_id} 失败")
-                        
-                    except Exception as e:
-                        logging.error(f"发送预警给群 {group_id} 用户 {user_id} 时出错: {e}")
+                    unmatched_alarms.append(alarm)  # 没有匹配的订阅者，直接记为已处理
+                    continue
+                logging.info(f"预警匹配到 {len(matched_subscribers)} 个订阅者: {alarm.get('title', '')}")
+
+                pending_alarms.append((alarm, matched_subscribers))
+
+            await self.mark_alarms_processed(unmatched_alarms)
+
+            # 并发获取需要推送的预警详情
+            details = await self.client.get_alarm_details([alarm.get('url', '') for alarm, _ in pending_alarms],
+                                                          [alarm.get('alertid', '') for alarm, _ in pending_alarms])
+
+            for (alarm, matched_subscribers), detail in zip(pending_alarms, details):
+                if await self.deliver_alarm(alarm, detail, matched_subscribers):
+                    await self.mark_alarms_processed([alarm])
                         
         except Exception as e:
             logging.error(f"检查气象预警时出错: {e}")
             
-    async def build_warning_message(self, alarm: Dict, detail: Dict, user_id: str, group_id: str = None) -> tuple[str, Optional[str]]:
-        """构建预警消息，返回(文本消息, 图标文件路径)"""
+    async def mark_alarms_processed(self, alarms: List[Dict]) -> None:
+        """记录已处理的预警（内存与数据库），并推进水位线"""
+        if not alarms:
+            return
+        await db_pool.executemany(
+            "INSERT OR IGNORE INTO processed_weather_alarms (alertid, title, issuetime) VALUES (?, ?, ?)",
+            [(alarm.get('alertid', ''), alarm.get('title', ''), alarm.get('issuetime', '')) for alarm in alarms]
+        )
+        for alarm in alarms:
+            self.processed_alarms.add(alarm.get('alertid', ''))
+            self.pending_deliveries.pop(alarm.get('alertid', ''), None)
+            self.watermark = max(self.watermark, alarm.get('issuetime', ''))
+
+    async def deliver_alarm(self, alarm: Dict, detail: Dict, matched_subscribers: List[Tuple[str, str]]) -> bool:
+        """
+        推送一条预警给匹配的订阅者，已成功推送的群在重试时跳过
+        :return: 是否处理完毕（全部群推送成功，或已达到最大尝试次数）
+        """
+        alertid = alarm.get('alertid', '')
+        attempts, delivered_groups = self.pending_deliveries.get(alertid, (0, set()))
+        attempts += 1
+        last_attempt = attempts >= MAX_ALARM_ATTEMPTS
+        self.pending_deliveries[alertid] = (attempts, delivered_groups)
+
+        # 详情获取失败时留到下次轮询重试，最后一次尝试时不带详情推送
+        if not detail and not last_attempt:
+            logging.warning(f"获取预警详情失败，稍后重试 {alertid}（第 {attempts} 次）")
+            return False
+
+        # 按群合并订阅者：每个群只发送一条消息，@该群全部匹配的订阅者
+        groups = {}
+        for group_id, user_id in matched_subscribers:
+            if group_id not in delivered_groups:
+                groups.setdefault(group_id, []).append(user_id)
+
+        if groups:
+            # 预警消息和图标每条预警只构建一次，各群共用（图片编码由消息发送器按文件缓存）
+            try:
+                message, icon_path = await self.build_warning_message(alarm, detail, None, include_pic=True)
+            except Exception as e:
+                logging.error(f"构建预警消息时出错 {alertid}: {e}")
+                return last_attempt
+
+            # 使用复合消息发送函数，在同一消息中发送文本和图片，并正确@用户
+            from message_sender import send_group_msg_with_text_and_image
+            for group_id, user_ids in groups.items():
+                try:
+                    with send_priority(PRIORITY_ALERT):
+                        success = await send_group_msg_with_text_and_image(group_id, message, icon_path,
+                                                                           user_ids=user_ids)
+                    
+                    if success:
+                        delivered_groups.add(group_id)
+                        logging.info(f"成功发送预警消息到群 {group_id} @{len(user_ids)} 位用户")
+                    else:
+                        logging.error(f"发送预警消息到群 {group_id} @{len(user_ids)} 位用户失败")
+                    
+                except Exception as e:
+                    logging.error(f"发送预警给群 {group_id} 用户 {user_ids} 时出错: {e}")
+
+        if all(group_id in delivered_groups for group_id, _ in matched_subscribers):
+            return True
+        if last_attempt:
+            logging.error(f"预警 {alertid} 推送 {attempts} 次后仍有群未送达，不再重试")
+            return True
+        return False
+
+    async def build_warning_message(self, alarm: Dict, detail: Dict, user_id: str, group_id: str = None,
+                                    include_pic: Optional[bool] = None) -> tuple[str, Optional[str]]:
+        """
+        构建预警消息，返回(文本消息, 图标文件路径)
+        include_pic 为None时沿用原逻辑（指定了群才下载图标）
+        """
         title = alarm.get('title', '未知标题')
         issuetime = alarm.get('issuetime', '未知时间')
         pic_url = alarm.get('pic', '')
@@ -497,7 +563,9 @@ class CMAWeatherSubscriber:
         
         # 下载并缓存图标
         icon_path = None
-        if pic_url and group_id:
+        if include_pic is None:
+            include_pic = bool(group_id)
+        if pic_url and include_pic:
             icon_path = await self.download_and_cache_icon(pic_url, alertid)
             
         return message, icon_path
@@ -507,7 +575,7 @@ class CMAWeatherSubscriber:
         while True:
             try:
                 await self.check_and_send_alarms()
-                await asyncio.sleep(60)  # 每分钟检查一次是否到了检查时间
+                await asyncio.sleep(min(60, self.check_interval))  # 定期检查是否到了检查时间
             except Exception as e:
                 logging.error(f"定期检查任务出错: {e}")
                 await asyncio.sleep(60)  # 出错后等待一分钟再继续
@@ -524,15 +592,28 @@ async def init_cma_weather_subscriber(config: Dict):
         subscriber_instance = CMAWeatherSubscriber(config)
         await subscriber_instance.init_db()
         await subscriber_instance.load_subscriptions()
+        await subscriber_instance.load_processed_alarms()
         
         # 启动定期检查任务
-        asyncio.create_task(subscriber_instance.start_periodic_check())
+        subscriber_instance.check_task = asyncio.create_task(subscriber_instance.start_periodic_check())
         
         logging.info("CMA气象预警订阅器初始化完成")
         
     return subscriber_instance
 
 
+async def close_cma_weather_subscriber():
+    """停止定期检查任务并关闭HTTP会话"""
+    global subscriber_instance
+    if subscriber_instance is None:
+        return
+    if subscriber_instance.check_task:
+        subscriber_instance.check_task.cancel()
+        await asyncio.gather(subscriber_instance.check_task, return_exceptions=True)
+    await subscriber_instance.client.close()
+    subscriber_instance = None
+
+
 def get_subscriber():
     """获取订阅器实例"""
     return subscriber_instance
\ No newline at end of file
@@ -14,7 +14,7 @@ from ws_handler import process_message  # 复用处理逻辑
 
 # 导入天气API模块
 try:
-    from weather_api import QWeatherAPI, format_weather_response
+    from weather_api import QWeatherAPI, format_weather_response, get_weather_cache_stats
     WEATHER_API_AVAILABLE = True
 except ImportError as e:
     logging.warning(f"天气API模块导入失败: {e}")
@@ -57,6 +57,20 @@ except ImportError as e:
     logging.warning(f"绘图模块导入失败: {e}")
     DRAW_EQ_AVAILABLE = False
 
+# 广播模式状态 {user_id: True} 表示该用户处于广播模式
+# 放在本模块而不是入口 bydbot.py：以 python bydbot.py 启动时入口模块是 __main__，
+# 再 import bydbot 会得到另一份模块和另一个字典
+broadcast_mode = {}
+
+
+def get_broadcast_mode() -> Dict[str, bool]:
+    return broadcast_mode
+
+
+def is_broadcast_mode(user_id: str) -> bool:
+    """用户是否处于广播模式"""
+    return bool(broadcast_mode.get(user_id))
+
 
 def parse_cq_code(message: str) -> Tuple[str, List[Dict[str, Any]]]:
     """
@@ -736,6 +750,13 @@ async def handle_weather_stats(group_id: str, config: Dict[str, Any]) -> None:
             stats_msg += f"本月群组最多: 群{top_group_monthly[0]} ({top_group_monthly[1]}次)\n"
         else:
             stats_msg += "本月群组最多: 无数据\n"
+
+        cache_stats = get_weather_cache_stats()
+        stats_msg += (f"\n缓存命中: {cache_stats['hits']}次 | 未命中: {cache_stats['misses']}次 | "
+                      f"合并请求: {cache_stats['coalesced']}次 (命中率 {cache_stats['hit_rate']:.0%})\n")
+        stats_msg += f"缓存条目: {cache_stats['entries']}/{cache_stats['max_entries']}"
+        if cache_stats['persistent']:
+            stats_msg += f" | 持久缓存命中: {cache_stats['disk_hits']}次 (启动时加载 {cache_stats['warmed']} 条)"
         
         await send_group_msg(group_id, stats_msg)
         
@@ -964,7 +985,7 @@ async def handle_test_weather_alarm(args: list, group_id: str, user_id: str, con
     
     try:
         # 获取最新的气象预警
-        latest_alarms = subscriber.client.get_latest_alarms(count=1)
+        latest_alarms = await subscriber.client.get_latest_alarms(count=1)
         
         if not latest_alarms:
             await send_group_msg(group_id, "未获取到最新的气象预警信息")
@@ -974,7 +995,7 @@ async def handle_test_weather_alarm(args: list, group_id: str, user_id: str, con
         await send_group_msg(group_id, f"正在测试最新的气象预警推送...\n预警标题: {latest_alarm.get('title', '未知标题')}\n发布时间: {latest_alarm.get('issuetime', '未知时间')}")
         
         # 获取预警详情
-        alarm_detail = subscriber.client.get_alarm_detail(latest_alarm.get('url', ''))
+        alarm_detail = await subscriber.client.get_alarm_detail(latest_alarm.get('url', ''), latest_alarm.get('alertid', ''))
         if not alarm_detail:
             await send_group_msg(group_id, "获取预警详情失败")
             return
@@ -1220,17 +1241,13 @@ async def handle_command(event: Dict[str, Any], config: Dict[str, Any]) -> None:
             return
         
         # 启动广播模式
-        from bydbot import get_broadcast_mode
-        broadcast_mode = get_broadcast_mode()
         broadcast_mode[user_id] = True
         
         await send_group_msg(group_id, "已进入广播模式，请发送您要群发的消息（发送'0'退出广播模式）")
         return
 
     # 检查用户是否处于广播模式
-    from bydbot import get_broadcast_mode
-    broadcast_mode = get_broadcast_mode()
-    if user_id in broadcast_mode and broadcast_mode[user_id]:
+    if is_broadcast_mode(user_id):
         if raw_message == "0":
             # 退出广播模式
             broadcast_mode[user_id] = False
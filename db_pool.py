@@ -0,0 +1,184 @@
+"""
+Bydbot - 数据库连接池模块
+统一管理 eqdata.db 的长连接，避免每次查询都新建线程和打开文件
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterable, List, Optional, Sequence
+
+import aiosqlite
+
+# 默认数据库路径
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
+
+# 每个连接打开后执行的调优参数
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # 读写互不阻塞
+    "PRAGMA synchronous=NORMAL",    # WAL模式下足够安全，减少fsync
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8192",      # 约8MB页缓存
+    "PRAGMA mmap_size=67108864",    # 64MB内存映射
+    "PRAGMA busy_timeout=5000",
+)
+
+# sqlite3 按连接缓存预编译语句的数量，长连接下同一SQL只编译一次
+STATEMENT_CACHE_SIZE = 256
+
+
+class DBPool:
+    """
+    eqdata.db 连接池
+    一个写连接（串行化写入，避免 database is locked），若干个读连接（WAL下可并发读）
+    """
+
+    def __init__(self, db_path: str, readers: int = 2):
+        self.db_path = db_path
+        self.reader_count = max(1, readers)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._readers: asyncio.Queue = asyncio.Queue()
+        self._connections: List[aiosqlite.Connection] = []
+
+    async def _connect(self) -> aiosqlite.Connection:
+        """打开一个调优过的长连接"""
+        db = await aiosqlite.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in CONNECTION_PRAGMAS:
+            await db.execute(pragma)
+        self._connections.append(db)
+        return db
+
+    async def open(self) -> None:
+        """打开全部连接"""
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._writer = await self._connect()
+        for _ in range(self.reader_count):
+            self._readers.put_nowait(await self._connect())
+        logging.info(f"数据库连接池已打开: {self.db_path} (1写/{self.reader_count}读)")
+
+    async def close(self) -> None:
+        """关闭全部连接"""
+        for db in self._connections:
+            try:
+                await db.close()
+            except Exception as e:
+                logging.warning(f"关闭数据库连接时出错: {e}")
+        self._connections.clear()
+        self._writer = None
+        self._readers = asyncio.Queue()
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """借出一个读连接"""
+        db = await self._readers.get()
+        try:
+            yield db
+        finally:
+            self._readers.put_nowait(db)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """独占写连接，正常退出时提交，异常时回滚"""
+        async with self._write_lock:
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+    async def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+        async with self.reader() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        async with self.reader() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        """执行单条写语句并提交，返回受影响行数"""
+        async with self.transaction() as db:
+            cursor = await db.execute(sql, params)
+            rowcount = cursor.rowcount
+            await cursor.close()
+            return rowcount
+
+    async def executemany(self, sql: str, params_seq: Iterable[Sequence[Any]]) -> None:
+        """批量执行写语句并提交"""
+        async with self.transaction() as db:
+            await db.executemany(sql, params_seq)
+
+    async def execute_returning(self, sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+        """执行带 RETURNING 的写语句并提交，执行与取结果在同一次线程调用中完成"""
+        async with self.transaction() as db:
+            rows = await db.execute_fetchall(sql, params)
+            return rows[0] if rows else None
+
+
+# 全局连接池实例
+_pool: Optional[DBPool] = None
+_pool_lock = asyncio.Lock()
+
+
+async def init_db_pool(db_path: str = None, readers: int = 2) -> DBPool:
+    """初始化全局连接池（重复调用且路径相同时直接返回现有实例）"""
+    global _pool
+    db_path = db_path or DEFAULT_DB_PATH
+    async with _pool_lock:
+        if _pool is not None:
+            if _pool.db_path == db_path:
+                return _pool
+            await _pool.close()
+        pool = DBPool(db_path, readers)
+        await pool.open()
+        _pool = pool
+    return _pool
+
+
+async def get_db_pool() -> DBPool:
+    """获取全局连接池，未初始化时按默认路径打开"""
+    if _pool is None:
+        return await init_db_pool()
+    return _pool
+
+
+async def close_db_pool() -> None:
+    """关闭全局连接池"""
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+            logging.info("数据库连接池已关闭")
+
+
+# 便捷函数，供各模块直接调用
+async def fetchone(sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+    return await (await get_db_pool()).fetchone(sql, params)
+
+
+async def fetchall(sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+    return await (await get_db_pool()).fetchall(sql, params)
+
+
+async def execute(sql: str, params: Sequence[Any] = ()) -> int:
+    return await (await get_db_pool()).execute(sql, params)
+
+
+async def executemany(sql: str, params_seq: Iterable[Sequence[Any]]) -> None:
+    await (await get_db_pool()).executemany(sql, params_seq)
+
+
+async def execute_returning(sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+    return await (await get_db_pool()).execute_returning(sql, params)
+
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[aiosqlite.Connection]:
+    pool = await get_db_pool()
+    async with pool.transaction() as db:
+        yield db
@@ -0,0 +1,121 @@
+"""
+Bydbot - 消息去重存储模块
+按时间顺序保存已处理的消息键，过期自动淘汰，内存占用有上限
+"""
+
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# 默认保留两周
+DEFAULT_TTL_SECONDS = 14 * 24 * 3600
+# 默认最多保留的键数量（超出时淘汰最旧的）
+DEFAULT_MAX_ENTRIES = 200000
+
+
+def make_event_id(event_data: Dict[str, Any]) -> str:
+    """获取消息ID，没有ID时使用发震时间+经纬度+震级组合生成"""
+    eq_id = event_data.get('id')
+    if not eq_id:
+        eq_id = f"{event_data.get('shockTime', '')}_{event_data.get('latitude', '')}_{event_data.get('longitude', '')}_{event_data.get('magnitude', '')}"
+    return str(eq_id)
+
+
+def make_event_key(source: str, event_data: Dict[str, Any]) -> str:
+    """生成去重用的源+ID组合键，所有去重相关的代码都应使用此函数"""
+    return f"{source}_{make_event_id(event_data)}"
+
+
+class DedupStore:
+    """
+    去重存储
+    OrderedDict 按写入时间排序（键 -> 时间戳），成员判断 O(1)，
+    淘汰时只需从头部弹出过期项，不需要扫描全部数据
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        timestamp = self._entries.get(key)
+        if timestamp is None:
+            return False
+        # 已过期但尚未被淘汰的键视为不存在
+        return time.time() - timestamp < self.ttl_seconds
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def add(self, key: str) -> None:
+        """记录一个键（已存在时刷新时间并移到末尾）"""
+        self._entries[key] = time.time()
+        self._entries.move_to_end(key)
+        self._enforce_limit()
+
+    def update(self, keys: Iterable[str]) -> None:
+        """批量记录键"""
+        for key in keys:
+            self.add(key)
+
+    def discard(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def load(self, items: Iterable[Tuple[str, float]]) -> int:
+        """
+        合并带时间戳的键（如启动时从数据库加载），保持时间顺序
+        :param items: (键, unix时间戳) 序列
+        :return: 合并后的键数量
+        """
+        merged = dict(self._entries)
+        for key, timestamp in items:
+            if timestamp > merged.get(key, 0):
+                merged[key] = timestamp
+        # 原地重建，保证其他模块持有的引用依然有效
+        self._entries.clear()
+        self._entries.update(sorted(merged.items(), key=lambda item: item[1]))
+        self.evict_expired()
+        self._enforce_limit()
+        return len(self._entries)
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """淘汰过期的键，返回淘汰数量"""
+        cutoff = (now if now is not None else time.time()) - self.ttl_seconds
+        evicted = 0
+        while self._entries:
+            key, timestamp = next(iter(self._entries.items()))
+            if timestamp >= cutoff:
+                break
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def _enforce_limit(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def memory_usage(self) -> int:
+        """估算占用的内存（字节）：容器本身 + 全部键字符串 + 时间戳对象"""
+        size = sys.getsizeof(self._entries)
+        for key, timestamp in self._entries.items():
+            size += sys.getsizeof(key) + sys.getsizeof(timestamp)
+        return size
+
+    def stats(self) -> Dict[str, Any]:
+        """返回统计信息"""
+        oldest = next(iter(self._entries.values()), None)
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'memory_bytes': self.memory_usage(),
+            'oldest_age_seconds': time.time() - oldest if oldest is not None else 0,
+        }
@@ -6,12 +6,21 @@ import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
+from matplotlib.collections import LineCollection
 from matplotlib.patches import FancyBboxPatch
 import tempfile
+import io
+import multiprocessing
 import numpy as np
 import os
+from collections import OrderedDict
+from PIL import Image
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Dict, Any, Optional, Tuple
 
+from fault_lines import FaultLines
+
 # 获取项目根目录
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 FONT_PATH = os.path.join(PROJECT_ROOT, 'Minecraft AE.ttf')
@@ -29,134 +38,350 @@ plt.rcParams['axes.unicode_minus'] = False
 plt.ioff()
 
 
+# 绘图进程池配置默认值（可通过 earthquake.drawing.workers / queue_size / timeout 配置）
+DEFAULT_RENDER_WORKERS = 2
+DEFAULT_RENDER_QUEUE_SIZE = 8
+DEFAULT_RENDER_TIMEOUT = 20
+
+# 绘图使用的地图要素，工作进程启动时预先加载
+MAP_FEATURES = (cfeature.OCEAN, cfeature.LAND, cfeature.COASTLINE, cfeature.LAKES,
+                cfeature.RIVERS, cfeature.BORDERS, cfeature.STATES)
+
+# 地图画布：1200×900 像素，每度经纬度 220 像素（约 5.5°×4.1° 的视野）
+MAP_WIDTH_PX = 1200
+MAP_HEIGHT_PX = 900
+MAP_DPI = 180
+MAP_PX_PER_DEGREE = 220
+
+# 底图瓦片缓存：等经纬度栅格，每张瓦片覆盖 2°×2°，与地图相同的像素密度
+BASEMAP_VERSION = 1  # 地图要素样式变化时递增，旧瓦片自动失效
+BASEMAP_TILE_DIR = os.path.join(PROJECT_ROOT, 'data', 'basemap_tiles', f'v{BASEMAP_VERSION}')
+BASEMAP_DPI = MAP_DPI
+BASEMAP_PX_PER_DEGREE = MAP_PX_PER_DEGREE
+BASEMAP_TILE_DEGREES = 2
+BASEMAP_TILE_PX = BASEMAP_TILE_DEGREES * BASEMAP_PX_PER_DEGREE
+BASEMAP_TILE_PAD_PX = 16
+BASEMAP_TILE_COLUMNS = 360 // BASEMAP_TILE_DEGREES
+# 每个绘图进程在内存中保留的已解码瓦片数量（每张约0.6MB）
+BASEMAP_TILE_CACHE_SIZE = 48
+_tile_cache: "OrderedDict[Tuple[int, int], np.ndarray]" = OrderedDict()
+
+# 断层数据（每个绘图进程首次使用时加载）
+_fault_lines: Optional[FaultLines] = None
+_fault_lines_loaded = False
+
+# 全局绘图进程池
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_slots: Optional[asyncio.Semaphore] = None
+_render_workers = DEFAULT_RENDER_WORKERS
+_render_queue_size = DEFAULT_RENDER_QUEUE_SIZE
+_render_timeout = DEFAULT_RENDER_TIMEOUT
+# 后台底图瓦片渲染使用独立的单进程池（低优先级），不占用实时绘图的进程和排队名额，
+# 超时时也只重建这个进程池
+_basemap_pool: Optional[ProcessPoolExecutor] = None
+_basemap_lock: Optional[asyncio.Lock] = None
+# 正在后台渲染底图瓦片的区域，以及后台任务的引用（防止被垃圾回收）
+_warming_regions: set = set()
+_background_tasks: set = set()
+
+
+def _init_render_worker():
+    """
+    绘图工作进程初始化：预先加载 Cartopy 地图要素和字体
+    matplotlib 的 pyplot 全局状态不是线程安全的，每个进程独立绘图互不干扰
+    """
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s [render-%(process)d] %(levelname)s: %(message)s')
+    try:
+        # 6°×6° 视野下 Cartopy 自动选择 10m 精度，几何数据加载后缓存在进程内
+        for feature in MAP_FEATURES:
+            for _ in feature.with_scale('10m').geometries():
+                break
+        get_fault_lines()
+        # 预热字体缓存和Agg渲染器
+        fig = plt.figure(figsize=(1, 1))
+        fig.text(0.5, 0.5, '预热 M0.0', fontsize=14, weight='bold')
+        fig.canvas.draw()
+        plt.close(fig)
+    except Exception as e:
+        logging.warning(f"绘图进程预热失败（首次绘图时再加载）: {e}")
+
+
+def _init_basemap_worker():
+    """底图瓦片进程初始化：降低进程优先级，让出CPU给实时绘图"""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s [basemap-%(process)d] %(levelname)s: %(message)s')
+    if hasattr(os, 'nice'):
+        try:
+            os.nice(10)
+        except OSError:
+            pass
+
+
+def init_render_pool(workers: int = DEFAULT_RENDER_WORKERS, queue_size: int = DEFAULT_RENDER_QUEUE_SIZE,
+                     timeout: float = DEFAULT_RENDER_TIMEOUT) -> None:
+    """
+    初始化绘图进程池
+    :param workers: 工作进程数量
+    :param queue_size: 除正在绘制的任务外，最多排队等待的任务数，超出时直接放弃绘图
+    :param timeout: 单个绘图任务超时（秒），超时后重建进程池
+    """
+    global _render_pool, _render_slots, _render_workers, _render_queue_size, _render_timeout
+    close_render_pool()
+    _render_workers = max(1, int(workers))
+    _render_queue_size = max(0, int(queue_size))
+    _render_timeout = timeout
+    _render_slots = asyncio.Semaphore(_render_workers + _render_queue_size)
+    _render_pool = _create_render_pool()
+    logging.info(f"绘图进程池已启动: {_render_workers} 个进程, 队列上限 {_render_queue_size}, 超时 {timeout} 秒")
+
+
+def _create_render_pool() -> ProcessPoolExecutor:
+    # 统一使用spawn，与Windows行为一致，也避免fork继承事件循环和数据库线程
+    pool = ProcessPoolExecutor(max_workers=_render_workers,
+                               mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_render_worker)
+    # 进程池在首次提交任务时才启动进程，提交空任务让工作进程立即启动并在后台预热
+    for _ in range(_render_workers):
+        pool.submit(os.getpid)
+    return pool
+
+
+def _restart_render_pool(broken_pool: ProcessPoolExecutor) -> None:
+    """
+    关闭卡住或失效的进程池并换用新进程池（同一进程池只重建一次）
+    旧进程池中排队的任务被取消（由提交方在新进程池中重试），正在绘制的进程绘制结束后自行退出
+    """
+    global _render_pool
+    if _render_pool is not broken_pool:
+        return
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+    _render_pool = _create_render_pool()
+    logging.warning("绘图进程池已重建")
+
+
+def close_render_pool() -> None:
+    """关闭绘图进程池（以及后台底图瓦片进程池）"""
+    global _render_pool, _basemap_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+        logging.info("绘图进程池已关闭")
+    if _basemap_pool is not None:
+        _basemap_pool.shutdown(wait=False, cancel_futures=True)
+        _basemap_pool = None
+
+
+def _call_in_loop(loop: asyncio.AbstractEventLoop, callback, *args) -> None:
+    """从进程池的管理线程回调到事件循环（事件循环已关闭时忽略）"""
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        pass
+
+
+def _wrap_render_future(future: Future) -> asyncio.Future:
+    """
+    把进程池任务包装为 asyncio future
+    与 asyncio.wrap_future 不同：进程池重建时被取消的排队任务按进程池失效（BrokenProcessPool）处理，
+    不会被当作调用方的取消；等待方被取消时也不会反过来取消进程池任务
+    """
+    loop = asyncio.get_running_loop()
+    waiter = loop.create_future()
+
+    def _copy_result(done: Future) -> None:
+        if waiter.done():
+            return
+        if done.cancelled():
+            waiter.set_exception(BrokenProcessPool('绘图进程池已重建，排队中的任务被取消'))
+        elif done.exception() is not None:
+            waiter.set_exception(done.exception())
+        else:
+            waiter.set_result(done.result())
+
+    future.add_done_callback(lambda done: _call_in_loop(loop, _copy_result, done))
+    return waiter
+
+
 async def draw_earthquake_async(data: Dict[str, Any], source: Optional[str] = None) -> Optional[str]:
-    """异步绘制地震地图"""
+    """
+    异步绘制地震地图（在独立进程中绘制）
+    队列已满时放弃绘图返回None；超时时重建进程池并抛出 asyncio.TimeoutError
+    """
+    if _render_pool is None:
+        init_render_pool()
+
+    if _render_slots.locked():
+        logging.warning(f"绘图队列已满（{_render_workers + _render_queue_size}），放弃本次绘图")
+        return None
+
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, draw_earthquake, data, source)
+    slots = _render_slots
+    await slots.acquire()
+    release_slot = True
+    try:
+        # 进程池可能因其他任务超时被重建，此时在新进程池中重试一次
+        for attempt in range(2):
+            pool = _render_pool
+            future = None
+            try:
+                future = pool.submit(draw_earthquake, data, source)
+                result = await asyncio.wait_for(_wrap_render_future(future), timeout=_render_timeout)
+                _schedule_basemap_warm(data)
+                return result
+            except asyncio.TimeoutError:
+                logging.error(f"绘图任务超时（{_render_timeout} 秒），重建绘图进程池")
+                _restart_render_pool(pool)
+                raise
+            except asyncio.CancelledError:
+                # 调用方放弃等待（例如外层超时）：只取消本任务，不影响其他绘图；
+                # 已开始绘制的任务无法中断，绘制结束后再释放排队名额
+                if future is not None and not future.cancel():
+                    release_slot = False
+                    future.add_done_callback(lambda _: _call_in_loop(loop, slots.release))
+                raise
+            except BrokenProcessPool:
+                if attempt == 0:
+                    logging.warning("绘图进程池已失效，重试绘图任务")
+                    _restart_render_pool(pool)
+                    continue
+                raise
+    finally:
+        if release_slot:
+            slots.release()
 
 
 def draw_earthquake(data: Dict[str, Any], source: Optional[str] = None) -> Optional[str]:
     """绘制地震地图的主要函数"""
     try:
-        # 提取地震数据
-        lat = float(data['latitude'])
-        lon = float(data['longitude'])
-        mag = float(data['magnitude'])
-        time = data.get('shockTime', '未知时间')
-        place = data.get('placeName', '未知地点')
-        info_type = data.get('infoTypeName', '')
-
-        # 计算地图范围
-        map_extent = calculate_map_extent(lon, lat)
-        lon_min, lon_max, lat_min, lat_max = map_extent
-
         # 获取数据源信息（如果存在）
         data_source = data.get('_source', source)
 
-        # 创建地图图像
-        temp_map_path = create_map_image(lat, lon, map_extent, lon_min, lon_max, lat_min, lat_max, data_source)
-
-        # 在地图上添加信息框
-        final_image_path = add_info_box_to_image(temp_map_path, time, place, info_type, mag, lon, lat, data_source)
+        png_bytes = render_earthquake_png(data, data_source)
 
-        # 清理临时文件
-        if os.path.exists(temp_map_path):
-            os.remove(temp_map_path)
+        # 编码结果一次性写入文件
+        final_image_path = get_output_path(data_source)
+        with open(final_image_path, 'wb') as f:
+            f.write(png_bytes)
 
         logging.info(f"地震地图绘制成功：{final_image_path}")
         return final_image_path
 
     except KeyError as e:
         logging.error(f"绘图失败：缺少必要的数据字段 {e}")
-        plt.close('all')
         return None
     except ValueError as e:
         logging.error(f"绘图失败：数据格式错误 {e}")
-        plt.close('all')
         return None
     except Exception as e:
         logging.error(f"绘图失败：{str(e)}", exc_info=True)
-        plt.close('all')
         return None
 
 
+def render_earthquake_png(data: Dict[str, Any], data_source: Optional[str] = None) -> bytes:
+    """
+    在一张 1200×900 像素的画布上完成地图、震中标记和信息框的绘制，
+    直接编码为内存中的PNG数据
+    """
+    # 提取地震数据
+    lat = float(data['latitude'])
+    lon = float(data['longitude'])
+    mag = float(data['magnitude'])
+    time = data.get('shockTime', '未知时间')
+    place = data.get('placeName', '未知地点')
+    info_type = data.get('infoTypeName', '')
+
+    # 计算地图范围
+    lon_min, lon_max, lat_min, lat_max = calculate_map_extent(lon, lat)
+
+    # 优先使用底图瓦片，此时画布背景透明，只绘制震中、断层和信息框等叠加层
+    basemap = load_basemap(lon_min, lon_max, lat_min, lat_max, MAP_WIDTH_PX, MAP_HEIGHT_PX)
+
+    fig = plt.figure(figsize=(MAP_WIDTH_PX / MAP_DPI, MAP_HEIGHT_PX / MAP_DPI), dpi=MAP_DPI,
+                     facecolor='none' if basemap is not None else 'black')
+    try:
+        # 地图铺满整个画布，画布纵横比与地图范围一致，不需要再裁剪
+        ax_map = fig.add_axes([0, 0, 1, 1], projection=ccrs.PlateCarree(central_longitude=lon), frameon=False)
+        ax_map.set_extent([lon_min, lon_max, lat_min, lat_max], crs=ccrs.PlateCarree())
+
+        # 设置地图特征
+        set_map_features(ax_map, lon_min, lon_max, lat_min, lat_max, lat, lon, data_source,
+                         with_features=basemap is None)
+
+        # 添加震中标记
+        add_earthquake_marker(ax_map, lon, lat)
+
+        # 设置轴属性
+        ax_map.set_axis_off()
+        ax_map.patch.set_visible(False)
+
+        # 在同一张图上添加信息框
+        add_info_text(ax_map, time, place, info_type, mag, lon, lat)
+
+        buffer = io.BytesIO()
+        if basemap is None:
+            fig.savefig(buffer, format='png', dpi=MAP_DPI, facecolor='black')
+        else:
+            # 叠加层按透明度合成到底图上后编码
+            fig.canvas.draw()
+            overlay = np.asarray(fig.canvas.buffer_rgba())
+            alpha = overlay[..., 3:4].astype(np.float32) / 255.0
+            image = overlay[..., :3] * alpha + basemap * (1.0 - alpha)
+            Image.fromarray((image + 0.5).astype(np.uint8)).save(buffer, format='PNG')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def get_output_path(source: Optional[str] = None) -> str:
+    """生成地图输出路径"""
+    if source:
+        # 创建 pictures/{source} 目录
+        pictures_dir = os.path.join(os.path.dirname(__file__), 'pictures', source)
+        os.makedirs(pictures_dir, exist_ok=True)
+
+        # 生成唯一的文件名
+        import time as time_module
+        timestamp = int(time_module.time() * 1000)
+        # 多个绘图进程可能在同一毫秒完成，文件名带上进程号避免互相覆盖
+        filename = f"eq_{timestamp}_{os.getpid()}.png"
+        return os.path.join(pictures_dir, filename)
+
+    # 使用临时文件（向后兼容）
+    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_final:
+        return tmp_final.name
+
+
 def calculate_map_extent(lon, lat):
-    """计算地图范围"""
-    extent_size_lon = 3.0  # 扩大视野范围，显示更多陆地
-    extent_size_lat = 3.0 if abs(lat) < 60 else 4.0  # 考虑高纬度地区
-    lon_min, lon_max = lon - extent_size_lon, lon + extent_size_lon
-    lat_min, lat_max = lat - extent_size_lat, lat + extent_size_lat
+    """
+    计算地图范围：以震中为中心，按画布像素和每度像素数确定经纬度跨度；
+    各纬度的跨度相同（与原先高纬度 6°×8° 绘制后居中裁剪出的可见范围一致）
+    """
+    half_lon = MAP_WIDTH_PX / MAP_PX_PER_DEGREE / 2
+    half_lat = MAP_HEIGHT_PX / MAP_PX_PER_DEGREE / 2
+    lon_min, lon_max = lon - half_lon, lon + half_lon
+    lat_min, lat_max = lat - half_lat, lat + half_lat
 
     return lon_min, lon_max, lat_min, lat_max
 
 
-def create_map_image(lat, lon, map_extent, lon_min, lon_max, lat_min, lat_max, data_source=None):
-    """创建基础地图图像"""
-    # 固定画布尺寸 1200x900 像素
-    target_width_px, target_height_px = 1200, 900
-    dpi = 180
-
-    # 为了防止黑边，我们先创建一个稍大的画布，然后裁剪到目标尺寸
-    # 计算纵横比
-    aspect_ratio = (lon_max - lon_min) / (lat_max - lat_min)
-    target_width_inches = target_width_px / dpi
-    target_height_inches = target_height_px / dpi
-
-    # 计算画布尺寸
-    calc_width_inches = target_height_inches * aspect_ratio
-    calc_height_inches = target_width_inches / aspect_ratio
-
-    if calc_width_inches >= target_width_inches and calc_height_inches >= target_height_inches:
-        fig_width = calc_width_inches
-        fig_height = target_height_inches
-    elif calc_width_inches < target_width_inches:
-        fig_width = target_width_inches
-        fig_height = target_width_inches / aspect_ratio
-    else:
-        fig_height = target_height_inches
-        fig_width = target_height_inches * aspect_ratio
-
-    # 为了防止黑边，稍微增加画布尺寸
-    scale_factor = 1.1  # 增加10%的画布尺寸
-    fig_width *= scale_factor
-    fig_height *= scale_factor
-
-    # 绘制地图主体
-    fig_map = plt.figure(figsize=(fig_width, fig_height), facecolor='black', dpi=dpi)
-    ax_map = plt.axes(projection=ccrs.PlateCarree(central_longitude=lon), frameon=False)
-    # 使用精确的地图范围，不添加额外边距
-    ax_map.set_extent([lon_min, lon_max, lat_min, lat_max], crs=ccrs.PlateCarree())
-
-    # 设置地图特征
-    set_map_features(ax_map, lon_min, lon_max, lat_min, lat_max, lat, lon, data_source)
-
-    # 添加震中标记
-    add_earthquake_marker(ax_map, lon, lat)
-
-    # 设置轴属性
-    ax_map.set_axis_off()
-    ax_map.patch.set_visible(False)
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
-
-    # 保存临时地图图像
-    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_map:
-        plt.savefig(
-            tmp_map.name,
-            bbox_inches='tight',
-            pad_inches=0,
-            facecolor='black',
-            edgecolor='black',
-            dpi=dpi
-        )
-        plt.close(fig_map)
-        return tmp_map.name
-
-
-def set_map_features(ax_map, lon_min, lon_max, lat_min, lat_max, lat, lon, data_source=None):
-    """设置地图特征，包括陆地、海洋、边界等"""
+def set_map_features(ax_map, lon_min, lon_max, lat_min, lat_max, lat, lon, data_source=None, with_features=True):
+    """
+    设置地图特征，包括陆地、海洋、边界等
+    :param with_features: 为False时不绘制地图要素（底图已由瓦片提供），只绘制叠加层
+    """
     ax_map.margins(0)
 
-    # 添加地图特征
+    if with_features:
+        add_map_features(ax_map)
+
+    # 只有cenc、cea和cea-pr数据源才绘制中国断层
+    if data_source in ['cenc', 'cea', 'cea-pr']:
+        draw_china_faults(ax_map, lon_min, lon_max, lat_min, lat_max)
+
+
+def add_map_features(ax_map):
+    """添加地图要素（海洋、陆地、海岸线、湖泊、河流、国界、省界）"""
     ax_map.add_feature(cfeature.OCEAN, facecolor="#1f2323")
     ax_map.add_feature(cfeature.LAND, facecolor="#3d4141")
     ax_map.add_feature(cfeature.COASTLINE, edgecolor='white', linewidth=0.5)
@@ -165,47 +390,157 @@ def set_map_features(ax_map, lon_min, lon_max, lat_min, lat_max, lat, lon, data_
     ax_map.add_feature(cfeature.BORDERS, edgecolor='white', linewidth=0.4, linestyle='--')
     ax_map.add_feature(cfeature.STATES, linewidth=0.3, edgecolor='gray', facecolor='none', alpha=0.5)
 
-    # 只有cenc、cea和cea-pr数据源才绘制中国断层
-    if data_source in ['cenc', 'cea', 'cea-pr']:
-        draw_china_faults(ax_map, lon_min, lon_max, lat_min, lat_max)
+
+def _tile_range(lon_min, lon_max, lat_min, lat_max) -> Tuple[range, range]:
+    """覆盖给定范围所需的瓦片列号/行号（列号未按360°取模）"""
+    size = BASEMAP_TILE_DEGREES
+    cols = range(int(np.floor(lon_min / size)), int(np.ceil(lon_max / size)))
+    rows = range(int(np.floor(lat_min / size)), int(np.ceil(lat_max / size)))
+    return cols, rows
+
+
+def _tile_path(col: int, row: int) -> str:
+    return os.path.join(BASEMAP_TILE_DIR, f"{col % BASEMAP_TILE_COLUMNS}_{row}.png")
+
+
+def basemap_tiles_ready(lon_min, lon_max, lat_min, lat_max) -> bool:
+    """给定范围的底图瓦片是否已全部缓存"""
+    if lat_min < -90 or lat_max > 90:
+        return False
+    cols, rows = _tile_range(lon_min, lon_max, lat_min, lat_max)
+    return all(os.path.exists(_tile_path(col, row)) for col in cols for row in rows)
+
+
+def _load_tile(col: int, row: int) -> Optional[np.ndarray]:
+    """读取一张瓦片（进程内LRU缓存解码后的像素）"""
+    key = (col % BASEMAP_TILE_COLUMNS, row)
+    tile = _tile_cache.get(key)
+    if tile is not None:
+        _tile_cache.move_to_end(key)
+        return tile
+    path = _tile_path(col, row)
+    if not os.path.exists(path):
+        return None
+    with Image.open(path) as img:
+        tile = np.asarray(img.convert('RGB'))
+    _tile_cache[key] = tile
+    while len(_tile_cache) > BASEMAP_TILE_CACHE_SIZE:
+        _tile_cache.popitem(last=False)
+    return tile
+
+
+def load_basemap(lon_min, lon_max, lat_min, lat_max, width_px: int, height_px: int) -> Optional[np.ndarray]:
+    """
+    用缓存的底图瓦片拼出指定范围的底图（RGB像素数组）
+    地图投影是以震中经度为中心的 PlateCarree，瓦片同为等经纬度栅格且像素密度相同，
+    按像素裁剪即可，不需要重投影和重采样
+    :return: 瓦片不全时返回None，由调用方实时绘制地图要素
+    """
+    if not basemap_tiles_ready(lon_min, lon_max, lat_min, lat_max):
+        return None
+    cols, rows = _tile_range(lon_min, lon_max, lat_min, lat_max)
+
+    tile_px = BASEMAP_TILE_PX
+    mosaic = np.empty((len(rows) * tile_px, len(cols) * tile_px, 3), dtype=np.uint8)
+    for x, col in enumerate(cols):
+        # 图像第一行是最北端
+        for y, row in enumerate(reversed(rows)):
+            tile = _load_tile(col, row)
+            if tile is None:
+                return None
+            mosaic[y * tile_px:(y + 1) * tile_px, x * tile_px:(x + 1) * tile_px] = tile
+
+    size = BASEMAP_TILE_DEGREES
+    ppd = BASEMAP_PX_PER_DEGREE
+    x0 = int(round((lon_min - cols[0] * size) * ppd))
+    y0 = int(round(((rows[-1] + 1) * size - lat_max) * ppd))
+    basemap = mosaic[y0:y0 + height_px, x0:x0 + width_px]
+    if basemap.shape[:2] != (height_px, width_px):
+        return None
+    return basemap
+
+
+def render_basemap_tiles(lon_min, lon_max, lat_min, lat_max) -> int:
+    """
+    渲染并保存覆盖给定范围、尚未缓存的底图瓦片，返回新增瓦片数
+    整块区域一次绘制后再切成瓦片，四周多绘制一圈像素避免线条在瓦片边缘被截断
+    """
+    if lat_min < -90 or lat_max > 90:
+        return 0
+    cols, rows = _tile_range(lon_min, lon_max, lat_min, lat_max)
+    missing = [(col, row) for col in cols for row in rows if not os.path.exists(_tile_path(col, row))]
+    if not missing:
+        return 0
+
+    size = BASEMAP_TILE_DEGREES
+    tile_px = BASEMAP_TILE_PX
+    pad_px = BASEMAP_TILE_PAD_PX
+    pad_deg = pad_px / BASEMAP_PX_PER_DEGREE
+    width_px = len(cols) * tile_px + 2 * pad_px
+    height_px = len(rows) * tile_px + 2 * pad_px
+    block_lon_min, block_lon_max = cols[0] * size, (cols[-1] + 1) * size
+    block_lat_min, block_lat_max = rows[0] * size, (rows[-1] + 1) * size
+    center_lon = (block_lon_min + block_lon_max) / 2
+
+    fig = plt.figure(figsize=(width_px / BASEMAP_DPI, height_px / BASEMAP_DPI), dpi=BASEMAP_DPI, facecolor='black')
+    try:
+        ax = fig.add_axes([0, 0, 1, 1], projection=ccrs.PlateCarree(central_longitude=center_lon), frameon=False)
+        ax.set_extent([block_lon_min - pad_deg, block_lon_max + pad_deg,
+                       max(-90, block_lat_min - pad_deg), min(90, block_lat_max + pad_deg)],
+                      crs=ccrs.PlateCarree())
+        ax.set_axis_off()
+        add_map_features(ax)
+        fig.canvas.draw()
+        pixels = np.asarray(fig.canvas.buffer_rgba())[..., :3]
+    finally:
+        plt.close(fig)
+
+    if pixels.shape[:2] != (height_px, width_px):
+        logging.warning(f"底图块尺寸异常: {pixels.shape[:2]}，期望 {(height_px, width_px)}，不保存瓦片")
+        return 0
+
+    os.makedirs(BASEMAP_TILE_DIR, exist_ok=True)
+    saved = 0
+    for col, row in missing:
+        x = pad_px + (col - cols[0]) * tile_px
+        y = pad_px + (rows[-1] - row) * tile_px
+        tile = pixels[y:y + tile_px, x:x + tile_px]
+        path = _tile_path(col, row)
+        # 先写临时文件再替换，多个进程同时渲染同一瓦片时不会读到半个文件
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        Image.fromarray(np.ascontiguousarray(tile)).save(tmp_path, format='PNG')
+        os.replace(tmp_path, path)
+        saved += 1
+    logging.info(f"已缓存 {saved} 张底图瓦片")
+    return saved
+
+
+def get_fault_lines() -> Optional[FaultLines]:
+    """获取断层数据，每个进程只加载一次（优先读取 data/ 下的 .npz 缓存）"""
+    global _fault_lines, _fault_lines_loaded
+    if not _fault_lines_loaded:
+        _fault_lines_loaded = True
+        try:
+            _fault_lines = FaultLines.load()
+        except Exception as e:
+            logging.error(f"加载断层数据时出错: {e}")
+            _fault_lines = None
+    return _fault_lines
 
 
 def draw_china_faults(ax_map, lon_min, lon_max, lat_min, lat_max):
     """绘制中国断层数据"""
+    fault_lines = get_fault_lines()
+    if fault_lines is None:
+        return
     try:
-        gmt_file_path = os.path.join(os.path.dirname(__file__), 'data', 'CN-faults.gmt')
-        if os.path.exists(gmt_file_path):
-            with open(gmt_file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-
-            current_fault = []
-            for line in lines:
-                line = line.strip()
-                if line.startswith('>'):
-                    # 绘制当前断层数据
-                    if current_fault:
-                        lons, lats = zip(*current_fault)
-                        ax_map.plot(lons, lats, color='black', linewidth=0.5, alpha=0.6, transform=ccrs.PlateCarree())
-                    current_fault = []
-                elif line and not line.startswith('#'):
-                    # 解析坐标数据
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        try:
-                            lon_val = float(parts[0])
-                            lat_val = float(parts[1])
-                            # 只绘制在当前视图范围内的断层
-                            if lon_min <= lon_val <= lon_max and lat_min <= lat_val <= lat_max:
-                                current_fault.append((lon_val, lat_val))
-                        except ValueError:
-                            continue
-
-            # 绘制最后一组断层数据
-            if current_fault:
-                lons, lats = zip(*current_fault)
-                ax_map.plot(lons, lats, color='black', linewidth=0.5, alpha=0.6, transform=ccrs.PlateCarree())
+        # 与视野相交的断层整段绘制，超出视野的部分由坐标轴裁剪，避免断层在视野边缘被错误连接
+        segments = fault_lines.query(lon_min, lon_max, lat_min, lat_max)
+        if segments:
+            ax_map.add_collection(LineCollection(segments, colors='black', linewidths=0.5, alpha=0.6,
+                                                 transform=ccrs.PlateCarree()))
     except Exception as e:
-        logging.error(f"加载断层数据时出错: {e}")
+        logging.error(f"绘制断层数据时出错: {e}")
 
 
 def add_earthquake_marker(ax_map, lon, lat):
@@ -220,117 +555,6 @@ def add_earthquake_marker(ax_map, lon, lat):
     ax_map.plot([lon+0.05, lon-0.05], [lat+0.05, lat-0.05], color='#FF0000', linewidth=2, transform=ccrs.PlateCarree(), zorder=4)
 
 
-def add_info_box_to_image(temp_map_path, time, place, info_type, mag, lon, lat, source=None):
-    """在地图图像上添加信息框"""
-    # 读取临时图像
-    img = plt.imread(temp_map_path)
-    h, w = img.shape[:2]
-
-    # 目标尺寸
-    target_width_px, target_height_px = 1200, 900
-
-    # 如果当前图像尺寸小于目标尺寸，则扩展图像
-    img = ensure_minimum_size(img, target_width_px, target_height_px, h, w)
-
-    # 从中心裁剪到目标尺寸
-    img_cropped = crop_image(img, target_width_px, target_height_px)
-
-    # 创建最终画布
-    dpi = 180
-    fig_width_inches = target_width_px / dpi
-    fig_height_inches = target_height_px / dpi
-    fig_final = plt.figure(figsize=(fig_width_inches, fig_height_inches), dpi=dpi, facecolor='black')
-    ax_final = fig_final.add_axes([0, 0, 1, 1], frameon=False)
-    ax_final.imshow(img_cropped, aspect='auto')
-    ax_final.set_xlim(0, img_cropped.shape[1])
-    ax_final.set_ylim(img_cropped.shape[0], 0)
-    ax_final.set_axis_off()
-    ax_final.margins(0)
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
-
-    # 添加信息框
-    add_info_text(ax_final, time, place, info_type, mag, lon, lat)
-
-    # 保存最终图像到自定义目录
-    if source:
-        # 创建 pictures/{source} 目录
-        pictures_dir = os.path.join(os.path.dirname(__file__), 'pictures', source)
-        os.makedirs(pictures_dir, exist_ok=True)
-        
-        # 生成唯一的文件名
-        import time as time_module
-        timestamp = int(time_module.time() * 1000)
-        filename = f"eq_{timestamp}.png"
-        final_path = os.path.join(pictures_dir, filename)
-    else:
-        # 使用临时文件（向后兼容）
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_final:
-            final_path = tmp_final.name
-
-    plt.savefig(
-        final_path,
-        bbox_inches=0,
-        facecolor='black',
-        dpi=dpi
-    )
-    plt.close(fig_final)
-    return final_path
-
-
-def ensure_minimum_size(img, target_width_px, target_height_px, h, w):
-    """确保图像至少达到目标尺寸"""
-    if w < target_width_px or h < target_height_px:
-        # 计算需要扩展的像素
-        dw = max(0, target_width_px - w)
-        dh = max(0, target_height_px - h)
-
-        # 扩展图像
-        new_img = np.zeros((max(h, target_height_px), max(w, target_width_px), img.shape[2]), dtype=img.dtype)
-        new_img[:h, :w] = img
-
-        # 如果需要扩展宽度，在右侧扩展
-        if dw > 0:
-            for i in range(dw):
-                new_img[:, w + i] = new_img[:, w - 1]
-
-        # 如果需要扩展高度，在底部扩展
-        if dh > 0:
-            for i in range(dh):
-                new_img[h + i, :] = new_img[h - 1, :]
-
-        img = new_img
-    return img
-
-
-def crop_image(img, target_width_px, target_height_px):
-    """从图像中心裁剪到目标尺寸"""
-    h, w = img.shape[:2]
-    start_h = max(0, (h - target_height_px) // 2)
-    start_w = max(0, (w - target_width_px) // 2)
-    end_h = min(h, start_h + target_height_px)
-    end_w = min(w, start_w + target_width_px)
-
-    # 确保裁剪区域正好是目标尺寸
-    img_cropped = img[start_h:end_h, start_w:end_w]
-
-    # 如果裁剪后的图像仍小于目标尺寸，在右侧和底部填充
-    ch, cw = img_cropped.shape[:2]
-    if cw < target_width_px or ch < target_height_px:
-        padded_img = np.zeros((target_height_px, target_width_px, img_cropped.shape[2]), dtype=img_cropped.dtype)
-        padded_img[:ch, :cw] = img_cropped
-        # 填充右侧
-        if cw < target_width_px:
-            for i in range(cw, target_width_px):
-                padded_img[:ch, i] = padded_img[:ch, cw-1]
-        # 填充底部
-        if ch < target_height_px:
-            for i in range(ch, target_height_px):
-                padded_img[i, :target_width_px] = padded_img[ch-1, :target_width_px]
-        img_cropped = padded_img
-
-    return img_cropped
-
-
 def add_info_text(ax_final, time, place, info_type, mag, lon, lat):
     """添加地震信息文本和框"""
     # 格式化经纬度为带方向的形式
@@ -391,8 +615,8 @@ def calculate_font_size(info_text):
 def calculate_textbox_width(fig, info_text, font_size):
     """计算文本框宽度"""
     try:
-        # 使用TextPath来精确测量文本宽度
-        from matplotlib.textpath import TextPath
+        # 按字形步进宽度测量文本宽度（不需要展开字形轮廓计算边界框）
+        from matplotlib.textpath import text_to_path
         from matplotlib.font_manager import FontProperties
 
         # 获取字体属性 - 使用全局配置的字体
@@ -404,11 +628,8 @@ def calculate_textbox_width(fig, info_text, font_size):
             font_props = FontProperties()
             font_props.set_family([font_family, 'Microsoft YaHei', 'SimHei', 'SimSun'])
 
-        # 创建文本路径来测量实际文本宽度
-        tp = TextPath((0, 0), info_text, size=font_size, prop=font_props)
-        # 获取文本边界框的宽度
-        text_bbox = tp.get_extents()
-        text_width_points = text_bbox.width
+        font_props.set_size(font_size)
+        text_width_points, _, _ = text_to_path.get_text_width_height_descent(info_text, font_props, ismath=False)
 
         # 转换为相对于图形的宽度估算
         estimated_text_width_ratio = text_width_points / (fig.get_figwidth() * 72)
@@ -421,4 +642,47 @@ def calculate_textbox_width(fig, info_text, font_size):
         return max(0.2, calculated_text_box_width)
     except:
         # 如果无法精确计算，使用默认宽度
-        return 0.4
\ No newline at end of file
+        return 0.4
+
+
+def _schedule_basemap_warm(data: Dict[str, Any]) -> None:
+    """实时绘制过的区域如果还没有底图瓦片，在后台的低优先级进程中补齐"""
+    try:
+        extent = calculate_map_extent(float(data['longitude']), float(data['latitude']))
+    except (KeyError, TypeError, ValueError):
+        return
+    cols, rows = _tile_range(*extent)
+    region = (cols.start, cols.stop, rows.start, rows.stop)
+    if region in _warming_regions or _render_slots.locked() or basemap_tiles_ready(*extent):
+        return
+    _warming_regions.add(region)
+    task = asyncio.create_task(_warm_basemap(region, extent))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _warm_basemap(region, extent) -> None:
+    """在独立的低优先级进程中渲染底图瓦片，一次只渲染一个区域"""
+    global _basemap_pool, _basemap_lock
+    loop = asyncio.get_running_loop()
+    if _basemap_lock is None:
+        _basemap_lock = asyncio.Lock()
+    try:
+        async with _basemap_lock:
+            if _basemap_pool is None:
+                _basemap_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                                    initializer=_init_basemap_worker)
+            pool = _basemap_pool
+            try:
+                await asyncio.wait_for(loop.run_in_executor(pool, render_basemap_tiles, *extent),
+                                       timeout=_render_timeout * 2)
+            except (asyncio.TimeoutError, BrokenProcessPool) as e:
+                # 只关闭底图进程池，下次需要时重新创建；实时绘图的进程池不受影响
+                logging.error(f"底图瓦片渲染失败（{type(e).__name__}），重建底图进程池")
+                pool.shutdown(wait=False, cancel_futures=True)
+                if _basemap_pool is pool:
+                    _basemap_pool = None
+    except Exception as e:
+        logging.warning(f"底图瓦片渲染失败: {e}")
+    finally:
+        _warming_regions.discard(region)
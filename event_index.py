@@ -0,0 +1,202 @@
+"""
+Bydbot - 近期地震事件时空索引模块
+按 (发震时间分桶, 纬度格, 经度格) 把近期事件放进内存网格，
+查询“某时刻某位置附近的事件”只需检查少量相邻格子，与地震表大小无关
+"""
+
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# 网格大小（度）
+DEFAULT_CELL_DEGREES = 0.5
+# 时间分桶大小（秒）
+DEFAULT_TIME_BUCKET_SECONDS = 60
+# 索引保留时长（按接收时间计算）
+DEFAULT_RETENTION_SECONDS = 24 * 3600
+
+# 跨数据源聚类的容差：不同机构对同一地震的定位、发震时间和震级（震级标度不同）差异较大
+CLUSTER_DEGREES = 1.0
+CLUSTER_SECONDS = 120
+CLUSTER_MAGNITUDE = 0.8
+
+
+def parse_shock_time(shock_time_str: Optional[str]) -> Optional[float]:
+    """把发震时间字符串解析为unix时间戳，无法解析时返回None"""
+    if not shock_time_str:
+        return None
+    try:
+        return datetime.strptime(shock_time_str, '%Y-%m-%d %H:%M:%S').timestamp()
+    except ValueError:
+        try:
+            return datetime.fromisoformat(shock_time_str.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None
+
+
+class IndexedEvent:
+    """索引中的一条事件"""
+
+    __slots__ = ('key', 'source', 'event_id', 'shock_ts', 'latitude', 'longitude',
+                 'magnitude', 'received_ts', 'cluster_id', 'cell')
+
+    def __init__(self, key: str, source: str, event_id: str, shock_ts: float,
+                 latitude: float, longitude: float, magnitude: Optional[float], received_ts: float):
+        self.key = key
+        self.source = source
+        self.event_id = event_id
+        self.shock_ts = shock_ts
+        self.latitude = latitude
+        self.longitude = longitude
+        self.magnitude = magnitude
+        self.received_ts = received_ts
+        self.cluster_id = key
+        self.cell: Tuple[int, int, int] = (0, 0, 0)
+
+    def __repr__(self) -> str:
+        return (f"IndexedEvent({self.key}, lat={self.latitude}, lon={self.longitude}, "
+                f"M={self.magnitude}, cluster={self.cluster_id})")
+
+
+class EventIndex:
+    """近期地震事件的时空网格索引"""
+
+    def __init__(self, cell_degrees: float = DEFAULT_CELL_DEGREES,
+                 time_bucket_seconds: int = DEFAULT_TIME_BUCKET_SECONDS,
+                 retention_seconds: float = DEFAULT_RETENTION_SECONDS):
+        self.cell_degrees = cell_degrees
+        self.time_bucket_seconds = time_bucket_seconds
+        self.retention_seconds = retention_seconds
+        self._lon_cells = int(round(360 / cell_degrees))
+        # (时间桶, 纬度格, 经度格) -> {键: 事件}
+        self._cells: Dict[Tuple[int, int, int], Dict[str, IndexedEvent]] = {}
+        # 键 -> 事件，按接收时间排序，用于淘汰
+        self._events: "OrderedDict[str, IndexedEvent]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._events
+
+    def get(self, key: str) -> Optional[IndexedEvent]:
+        return self._events.get(key)
+
+    def _cell_of(self, shock_ts: float, latitude: float, longitude: float) -> Tuple[int, int, int]:
+        return (int(shock_ts // self.time_bucket_seconds),
+                int(math.floor(latitude / self.cell_degrees)),
+                int(math.floor(longitude / self.cell_degrees)) % self._lon_cells)
+
+    def add(self, key: str, source: str, event_id: str, shock_ts: float, latitude: float,
+            longitude: float, magnitude: Optional[float] = None, received_ts: Optional[float] = None,
+            cluster: bool = True) -> IndexedEvent:
+        """
+        加入或更新一条事件（同一键的新版本会替换旧位置）
+        :param cluster: 是否与其他数据源的相近事件归为同一簇
+        """
+        self.remove(key)
+        event = IndexedEvent(key, source, event_id, shock_ts, float(latitude), float(longitude),
+                             float(magnitude) if magnitude is not None else None,
+                             received_ts if received_ts is not None else time.time())
+        # 无震级的事件无法判断是否为同一地震，不与其他事件归为同一簇
+        if cluster and event.magnitude is not None:
+            matches = self.query(event.latitude, event.longitude, shock_ts,
+                                 degrees=CLUSTER_DEGREES, seconds=CLUSTER_SECONDS,
+                                 magnitude=event.magnitude, magnitude_tolerance=CLUSTER_MAGNITUDE)
+            others = [m for m in matches if m.source != source]
+            if others:
+                # 归入最早接收的相近事件所在的簇
+                event.cluster_id = min(others, key=lambda m: m.received_ts).cluster_id
+
+        event.cell = self._cell_of(shock_ts, event.latitude, event.longitude)
+        self._cells.setdefault(event.cell, {})[key] = event
+        self._events[key] = event
+        self._evict(event.received_ts)
+        return event
+
+    def remove(self, key: str) -> None:
+        event = self._events.pop(key, None)
+        if event is None:
+            return
+        bucket = self._cells.get(event.cell)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._cells[event.cell]
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._events.clear()
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.retention_seconds
+        while self._events:
+            event = next(iter(self._events.values()))
+            if event.received_ts >= cutoff:
+                break
+            self.remove(event.key)
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """淘汰超过保留时长的事件，返回淘汰数量"""
+        before = len(self._events)
+        self._evict(now if now is not None else time.time())
+        return before - len(self._events)
+
+    def query(self, latitude: float, longitude: float, shock_ts: float,
+              degrees: float = 0.5, seconds: float = 60,
+              magnitude: Optional[float] = None, magnitude_tolerance: float = 0.3,
+              source: Optional[str] = None, received_after: Optional[float] = None,
+              exclude_key: Optional[str] = None) -> List[IndexedEvent]:
+        """
+        查询时空邻域内的事件
+        :param degrees: 经纬度容差（度）
+        :param seconds: 发震时间容差（秒）
+        :param magnitude: 给定时同时要求震级差不超过 magnitude_tolerance（此时无震级的事件不会匹配）
+        :param source: 只匹配指定数据源
+        :param received_after: 只匹配在此时间戳之后接收的事件
+        """
+        t_lo = int((shock_ts - seconds) // self.time_bucket_seconds)
+        t_hi = int((shock_ts + seconds) // self.time_bucket_seconds)
+        lat_lo = int(math.floor((latitude - degrees) / self.cell_degrees))
+        lat_hi = int(math.floor((latitude + degrees) / self.cell_degrees))
+        lon_lo = int(math.floor((longitude - degrees) / self.cell_degrees))
+        lon_hi = int(math.floor((longitude + degrees) / self.cell_degrees))
+
+        results = []
+        for t in range(t_lo, t_hi + 1):
+            for lat_cell in range(lat_lo, lat_hi + 1):
+                for lon_cell in range(lon_lo, lon_hi + 1):
+                    bucket = self._cells.get((t, lat_cell, lon_cell % self._lon_cells))
+                    if not bucket:
+                        continue
+                    for event in bucket.values():
+                        if event.key == exclude_key:
+                            continue
+                        if source is not None and event.source != source:
+                            continue
+                        if received_after is not None and event.received_ts < received_after:
+                            continue
+                        if abs(event.shock_ts - shock_ts) > seconds:
+                            continue
+                        if abs(event.latitude - latitude) > degrees:
+                            continue
+                        # 经度差考虑180°经线两侧
+                        lon_diff = abs(event.longitude - longitude) % 360
+                        if min(lon_diff, 360 - lon_diff) > degrees:
+                            continue
+                        if magnitude is not None and (event.magnitude is None
+                                                      or abs(event.magnitude - magnitude) > magnitude_tolerance):
+                            continue
+                        results.append(event)
+        return results
+
+    def get_cluster(self, key: str) -> List[IndexedEvent]:
+        """返回与指定事件属于同一簇（同一地震的多机构报告）的全部事件"""
+        event = self._events.get(key)
+        if event is None:
+            return []
+        results = self.query(event.latitude, event.longitude, event.shock_ts,
+                             degrees=CLUSTER_DEGREES, seconds=CLUSTER_SECONDS)
+        return [e for e in results if e.cluster_id == event.cluster_id]
@@ -0,0 +1,163 @@
+"""
+Bydbot - FAN 消息分发模块
+WebSocket 接收循环只负责收消息并放入有界队列，由工作协程池并发处理：
+同一 (数据源, 事件ID) 的消息按到达顺序逐条处理，不同事件之间互不阻塞；
+预警类消息优先处理，并有专用的工作协程，不会被慢速的普通消息（如绘图、推送）拖住
+
+注意：按键保序只覆盖处理函数本身（ws_handler 中为入库与去重）。启用合并推送时，推送由每个事件
+各自的后台任务（schedule_coalesced_push）完成，同一事件的修订在该任务内按到达顺序推送最新一版，
+不占用分发器的工作协程
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# 默认值（可通过 earthquake.fan.* 配置）
+DEFAULT_WORKERS = 4
+DEFAULT_ALERT_WORKERS = 1
+DEFAULT_MAX_PENDING = 500
+
+LAG_HISTORY = 200
+
+
+class FanDispatcher:
+    """按事件键保序、按预警/普通分级的消息分发器"""
+
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], workers: int = DEFAULT_WORKERS,
+                 alert_workers: int = DEFAULT_ALERT_WORKERS, max_pending: int = DEFAULT_MAX_PENDING):
+        """
+        :param handler: 处理单条消息的协程函数
+        :param workers: 普通工作协程数（也会处理预警消息）
+        :param alert_workers: 只处理预警消息的工作协程数
+        :param max_pending: 排队消息上限，超出时丢弃新到的普通消息（预警消息不受限制）
+        """
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.alert_workers = max(0, alert_workers)
+        self.max_pending = max_pending
+        # 事件键 -> 待处理消息 (消息, 接收时间)
+        self._pending: Dict[str, Deque[Tuple[Any, float]]] = {}
+        # 已排入就绪队列或正在处理的事件键
+        self._active: set = set()
+        # 就绪的事件键：预警 / 普通
+        self._ready: Dict[bool, Deque[str]] = {True: deque(), False: deque()}
+        self._key_is_alert: Dict[str, bool] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self.pending_count = 0
+        self.stats = {'received': 0, 'processed': 0, 'failed': 0, 'overflow': 0, 'max_pending': 0}
+        # 各级别的处理延迟（接收到开始处理，毫秒）
+        self._lag: Dict[bool, deque] = {True: deque(maxlen=LAG_HISTORY), False: deque(maxlen=LAG_HISTORY)}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """启动工作协程（需在事件循环中调用）"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(alert_only=False)) for _ in range(self.workers)]
+        self._tasks += [asyncio.create_task(self._worker(alert_only=True)) for _ in range(self.alert_workers)]
+        logging.info(f"FAN 消息分发已启动：{self.workers} 个工作协程，{self.alert_workers} 个预警专用")
+
+    async def stop(self) -> None:
+        """停止工作协程，丢弃尚未处理的消息"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._pending.clear()
+        self._active.clear()
+        self._key_is_alert.clear()
+        for ready in self._ready.values():
+            ready.clear()
+        self.pending_count = 0
+
+    def submit(self, item: Any, key: str, alert: bool = False) -> bool:
+        """
+        放入一条消息（不阻塞接收循环）
+        :param key: 保序键，同一键的消息按顺序处理
+        :param alert: 是否为预警类消息
+        :return: 队列已满而丢弃时返回False
+        """
+        self.stats['received'] += 1
+        if not alert and self.pending_count >= self.max_pending:
+            self.stats['overflow'] += 1
+            logging.warning(f"FAN 消息队列已满（{self.pending_count}），丢弃消息: {key}")
+            return False
+
+        queue = self._pending.get(key)
+        if queue is None:
+            queue = self._pending[key] = deque()
+        queue.append((item, time.perf_counter()))
+        self.pending_count += 1
+        self.stats['max_pending'] = max(self.stats['max_pending'], self.pending_count)
+
+        # 同一键的消息只要有一条是预警就按预警处理
+        promoted = alert and not self._key_is_alert.get(key, False)
+        self._key_is_alert[key] = self._key_is_alert.get(key, False) or alert
+        if promoted and key in self._active and key in self._ready[False]:
+            # 已在普通就绪队列中排队的键升级为预警，移到预警队列
+            self._ready[False].remove(key)
+            self._ready[True].append(key)
+            self._wakeup.set()
+        if key not in self._active:
+            self._active.add(key)
+            self._ready[self._key_is_alert[key]].append(key)
+            self._wakeup.set()
+        return True
+
+    def _take_key(self, alert_only: bool) -> Optional[str]:
+        if self._ready[True]:
+            return self._ready[True].popleft()
+        if not alert_only and self._ready[False]:
+            return self._ready[False].popleft()
+        return None
+
+    async def _worker(self, alert_only: bool) -> None:
+        while True:
+            key = self._take_key(alert_only)
+            if key is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            queue = self._pending[key]
+            item, received_at = queue.popleft()
+            self.pending_count -= 1
+            alert = self._key_is_alert[key]
+            self._lag[alert].append((time.perf_counter() - received_at) * 1000)
+            try:
+                await self.handler(item)
+                self.stats['processed'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logging.error(f"处理 FAN 消息失败（{key}）: {e}")
+
+            # 同一键还有消息则重新排队（排在其他键之后，避免一个事件独占工作协程）
+            if queue:
+                self._ready[self._key_is_alert[key]].append(key)
+                self._wakeup.set()
+            else:
+                del self._pending[key]
+                del self._key_is_alert[key]
+                self._active.discard(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取分发统计：排队数、溢出次数和各级别的处理延迟"""
+        lag = {}
+        for alert, samples in self._lag.items():
+            if samples:
+                ordered = sorted(samples)
+                lag['alert' if alert else 'normal'] = {
+                    'count': len(ordered),
+                    'avg_ms': sum(ordered) / len(ordered),
+                    'p95_ms': ordered[max(0, int(len(ordered) * 0.95) - 1)],
+                    'max_ms': ordered[-1],
+                }
+        return dict(self.stats, pending=self.pending_count, active_keys=len(self._active), lag=lag)
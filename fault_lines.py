@@ -0,0 +1,112 @@
+"""
+Bydbot - 中国断层数据模块
+GMT 格式的断层文件只解析一次，转成 NumPy 数组（全部坐标点 + 每段的起止偏移 + 每段的外包框），
+并缓存为 data/ 下的 .npz 文件；按视野查询断层只需一次向量化的外包框比较
+"""
+
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GMT_PATH = os.path.join(PROJECT_ROOT, 'data', 'CN-faults.gmt')
+
+# 缓存格式变化时递增，旧缓存自动失效
+CACHE_VERSION = 1
+
+
+def parse_gmt(gmt_path: str):
+    """
+    解析 GMT 多段线文件（以 '>' 分隔各段，'#' 开头为注释）
+    :return: (坐标数组 (N, 2)，各段起止偏移 (M+1,))
+    """
+    coords = []
+    offsets = [0]
+    with open(gmt_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('>'):
+                if len(coords) > offsets[-1]:
+                    offsets.append(len(coords))
+            elif line and not line.startswith('#'):
+                parts = line.split()
+                if len(parts) >= 2:
+                    try:
+                        coords.append((float(parts[0]), float(parts[1])))
+                    except ValueError:
+                        continue
+    if len(coords) > offsets[-1]:
+        offsets.append(len(coords))
+
+    return np.array(coords, dtype=np.float64).reshape(-1, 2), np.array(offsets, dtype=np.int64)
+
+
+class FaultLines:
+    """断层多段线集合，按外包框做视野查询"""
+
+    def __init__(self, coords: np.ndarray, offsets: np.ndarray):
+        self.coords = coords
+        self.offsets = offsets
+        # 每段的外包框 (lon_min, lon_max, lat_min, lat_max)
+        if len(offsets) > 1:
+            starts = offsets[:-1]
+            self.bboxes = np.column_stack((
+                np.minimum.reduceat(coords[:, 0], starts),
+                np.maximum.reduceat(coords[:, 0], starts),
+                np.minimum.reduceat(coords[:, 1], starts),
+                np.maximum.reduceat(coords[:, 1], starts),
+            ))
+        else:
+            self.bboxes = np.empty((0, 4), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def point_count(self) -> int:
+        return len(self.coords)
+
+    def query(self, lon_min: float, lon_max: float, lat_min: float, lat_max: float) -> List[np.ndarray]:
+        """
+        返回外包框与视野相交的断层段（完整的段，超出视野的部分由坐标轴裁剪）
+        """
+        bboxes = self.bboxes
+        hit = np.flatnonzero((bboxes[:, 0] <= lon_max) & (bboxes[:, 1] >= lon_min)
+                             & (bboxes[:, 2] <= lat_max) & (bboxes[:, 3] >= lat_min))
+        offsets = self.offsets
+        return [self.coords[offsets[i]:offsets[i + 1]] for i in hit]
+
+    @classmethod
+    def load(cls, gmt_path: str = DEFAULT_GMT_PATH, cache_path: Optional[str] = None) -> Optional["FaultLines"]:
+        """
+        加载断层数据：优先读取 .npz 缓存，源文件变化（大小或修改时间）后重新解析并写回缓存
+        :return: 源文件不存在时返回None
+        """
+        if not os.path.exists(gmt_path):
+            return None
+        if cache_path is None:
+            cache_path = os.path.splitext(gmt_path)[0] + '.npz'
+
+        stat = os.stat(gmt_path)
+        signature = np.array([CACHE_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as cached:
+                    if np.array_equal(cached['signature'], signature):
+                        return cls(cached['coords'], cached['offsets'])
+            except Exception as e:
+                logging.warning(f"读取断层缓存失败，重新解析: {e}")
+
+        coords, offsets = parse_gmt(gmt_path)
+        try:
+            # 先写临时文件再替换，多个绘图进程同时生成缓存时不会读到半个文件
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_path, signature=signature, coords=coords, offsets=offsets)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logging.warning(f"写入断层缓存失败: {e}")
+        logging.info(f"已解析断层数据：{len(offsets) - 1} 段，{len(coords)} 个点")
+        return cls(coords, offsets)
@@ -1,29 +1,108 @@
+import asyncio
 import base64
 import aiohttp
+import heapq
+import itertools
 import logging
 import os
-from typing import Optional, Dict, Any
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Tuple
 
 # 全局变量
 SESSION: Optional[aiohttp.ClientSession] = None
 HEADERS: Dict[str, str] = {}
 
-
-"""
-Bydbot - 消息发送器
-负责向QQ群发送文本和图片消息
-"""
-
-
-async def init_sender(url: str, token: str) -> None:
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 图片发送方式：
+#   base64 - 读取文件并编码为 base64:// 发送（默认，NapCat 与机器人不在同一台机器时使用）
+#   file   - 发送 file:// 绝对路径，NapCat 与机器人共享文件系统时无需编码
+#   url    - 发送 image_url_prefix + 相对项目根目录的路径，由静态文件服务提供图片
+IMAGE_MODES = ('base64', 'file', 'url')
+IMAGE_MODE = 'base64'
+IMAGE_URL_PREFIX = ''
+
+# 已编码图片的缓存：(路径, 修改时间, 大小) -> "base64://..."，按总字节数做LRU淘汰
+DEFAULT_PAYLOAD_CACHE_BYTES = 32 * 1024 * 1024
+_payload_cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_payload_cache_bytes = 0
+_payload_cache_max_bytes = DEFAULT_PAYLOAD_CACHE_BYTES
+_payload_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+# 发送通道（数值越小越优先），由调用方通过 send_priority() 上下文设置
+PRIORITY_ALERT = 0          # 预警通道：地震预警、海啸、气象预警
+PRIORITY_PUSH = 1           # 推送通道：其他地震速报
+PRIORITY_INTERACTIVE = 2    # 交互通道：命令回复（默认）
+PRIORITY_BACKGROUND = 3     # 后台通道：早晚安等
+PRIORITY_NAMES = {PRIORITY_ALERT: 'alert', PRIORITY_PUSH: 'push',
+                  PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BACKGROUND: 'background'}
+_send_priority: ContextVar[int] = ContextVar('send_priority', default=PRIORITY_INTERACTIVE)
+
+# 发送队列配置默认值（可通过 napcat.send_queue 配置）
+DEFAULT_SEND_QUEUE_CONFIG = {
+    'enabled': True,
+    'concurrency': 8,       # 同时进行的HTTP请求数
+    'alert_reserved': 2,    # 其中为预警通道保留的名额，其他通道最多占用 concurrency - alert_reserved
+    'global_rate': 10.0,    # 全局每秒发送条数
+    'global_burst': 20,
+    'group_rate': 0.5,      # 单群每秒发送条数（每分钟30条）
+    'group_burst': 5,
+    'group_alert_burst': 2, # 单群令牌用完后预警消息还可透支的条数，透支的令牌由之后的消息补上
+    'max_retries': 3,
+    'retry_base': 0.5,      # 重试退避基数（秒），每次翻倍并加随机抖动
+    'retry_max': 10.0,
+    'max_size': 1000,       # 队列上限，满时调用方等待（背压）
+}
+
+# 发送队列状态：所有通道共用一个按 (通道, 入队序号) 排列的堆，调度器总是先看堆顶
+_send_heap: List[Tuple[int, int, "_SendJob"]] = []
+_send_queue_running = False
+_send_queue_config: Dict[str, Any] = dict(DEFAULT_SEND_QUEUE_CONFIG)
+_dispatch_wakeup: Optional[asyncio.Event] = None
+_queue_space: Optional[asyncio.Event] = None
+_dispatcher_task: Optional[asyncio.Task] = None
+_send_tasks: set = set()
+_send_seq = itertools.count()
+_global_bucket: Optional["TokenBucket"] = None
+_group_buckets: Dict[int, "TokenBucket"] = {}
+# 令牌不足的群的积压消息（按通道和入队顺序排列的堆），由每群一个的任务逐条放回队列
+_group_backlogs: Dict[int, List[Tuple[int, int, "_SendJob"]]] = {}
+_send_stats = {'sent': 0, 'failed': 0, 'retried': 0, 'deferred': 0, 'retry_waiting': 0}
+# 各通道正在发送的请求数
+_lane_in_flight: Dict[int, int] = {priority: 0 for priority in PRIORITY_NAMES}
+# 各通道的调度延迟（入队到开始发送）和总延迟（入队到发送完成），毫秒
+_lane_dispatch_delay: Dict[int, deque] = {priority: deque(maxlen=200) for priority in PRIORITY_NAMES}
+_send_latency: Dict[int, deque] = {priority: deque(maxlen=200) for priority in PRIORITY_NAMES}
+
+
+async def init_sender(url: str, token: str, image_mode: str = 'base64', image_url_prefix: str = '',
+                      payload_cache_bytes: int = DEFAULT_PAYLOAD_CACHE_BYTES,
+                      send_queue: Optional[Dict[str, Any]] = None) -> None:
     """
     初始化消息发送器
     :param url: NapCat HTTP API服务地址
     :param token: NapCat访问令牌（可选）
+    :param image_mode: 图片发送方式（base64 / file / url）
+    :param image_url_prefix: url 方式下图片地址的前缀
+    :param payload_cache_bytes: 已编码图片缓存的字节上限
+    :param send_queue: 发送队列配置，为None时不经队列直接发送
     """
-    global SESSION, HEADERS
-    
-    # 关闭现有的会话（如果存在）
+    global SESSION, HEADERS, IMAGE_MODE, IMAGE_URL_PREFIX, _payload_cache_max_bytes
+
+    if image_mode not in IMAGE_MODES or (image_mode == 'url' and not image_url_prefix):
+        logging.warning(f"图片发送方式配置无效（{image_mode}），使用 base64")
+        image_mode = 'base64'
+    IMAGE_MODE = image_mode
+    IMAGE_URL_PREFIX = image_url_prefix.rstrip('/')
+    _payload_cache_max_bytes = payload_cache_bytes
+    clear_payload_cache()
+
+    # 关闭现有的会话和发送队列（如果存在）
+    await stop_send_queue()
     if SESSION:
         await SESSION.close()
     
@@ -34,6 +113,358 @@ async def init_sender(url: str, token: str) -> None:
     if token:
         HEADERS['Authorization'] = f'Bearer {token}'
 
+    if send_queue is not None and send_queue.get('enabled', True):
+        start_send_queue(send_queue)
+
+
+def clear_payload_cache() -> None:
+    """清空已编码图片缓存"""
+    global _payload_cache_bytes
+    _payload_cache.clear()
+    _payload_cache_bytes = 0
+
+
+def get_payload_cache_stats() -> Dict[str, Any]:
+    """获取已编码图片缓存的统计信息"""
+    return dict(_payload_cache_stats, entries=len(_payload_cache), bytes=_payload_cache_bytes,
+                max_bytes=_payload_cache_max_bytes, mode=IMAGE_MODE)
+
+
+def _encode_image(path: str, stat: os.stat_result) -> str:
+    """读取图片并编码为 base64:// 字符串，同一文件（路径+修改时间+大小）只编码一次"""
+    global _payload_cache_bytes
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    payload = _payload_cache.get(key)
+    if payload is not None:
+        _payload_cache.move_to_end(key)
+        _payload_cache_stats['hits'] += 1
+        return payload
+
+    _payload_cache_stats['misses'] += 1
+    with open(path, 'rb') as f:
+        payload = f"base64://{base64.b64encode(f.read()).decode('utf-8')}"
+
+    size = len(payload)
+    if size > _payload_cache_max_bytes:
+        return payload
+    _payload_cache[key] = payload
+    _payload_cache_bytes += size
+    while _payload_cache_bytes > _payload_cache_max_bytes:
+        _, evicted = _payload_cache.popitem(last=False)
+        _payload_cache_bytes -= len(evicted)
+        _payload_cache_stats['evictions'] += 1
+    return payload
+
+
+def get_image_file(image_path: str) -> str:
+    """
+    生成图片消息段的 file 字段
+    :raises FileNotFoundError: 图片文件不存在
+    """
+    path = os.path.abspath(image_path)
+    stat = os.stat(path)
+    if IMAGE_MODE == 'file':
+        return f"file://{path}"
+    if IMAGE_MODE == 'url':
+        relative = os.path.relpath(path, PROJECT_ROOT).replace(os.sep, '/')
+        return f"{IMAGE_URL_PREFIX}/{relative}"
+    return _encode_image(path, stat)
+
+
+class TokenBucket:
+    """令牌桶：按固定速率补充令牌，允许一定的突发"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def try_acquire(self, overdraft: float = 0) -> float:
+        """
+        尝试取一个令牌
+        :param overdraft: 允许透支的令牌数，透支后桶内令牌为负，之后的请求要等令牌补回
+        :return: 0 表示已取得，否则为令牌可用前需要等待的秒数
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens + overdraft >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - overdraft - self.tokens) / self.rate
+
+
+class _SendJob:
+    """发送队列中的一条请求"""
+
+    __slots__ = ('endpoint', 'payload', 'group_id', 'priority', 'seq', 'future',
+                 'enqueued_at', 'attempts', 'token_acquired')
+
+    def __init__(self, endpoint: str, payload: Dict[str, Any], priority: int):
+        self.endpoint = endpoint
+        self.payload = payload
+        self.group_id = payload.get('group_id')
+        self.priority = priority
+        self.seq = next(_send_seq)
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.perf_counter()
+        self.attempts = 0
+        self.token_acquired = False
+
+
+@contextmanager
+def send_priority(priority: int):
+    """在此上下文（及其中创建的任务）内发送的消息使用指定优先级"""
+    token = _send_priority.set(priority)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+def start_send_queue(queue_config: Optional[Dict[str, Any]] = None) -> None:
+    """启动发送队列（需在事件循环中调用）"""
+    global _send_queue_running, _dispatch_wakeup, _queue_space, _dispatcher_task, _global_bucket, _send_queue_config
+    if _dispatcher_task is not None:
+        return
+    _send_queue_config = dict(DEFAULT_SEND_QUEUE_CONFIG, **(queue_config or {}))
+    cfg = _send_queue_config
+    cfg['alert_reserved'] = max(0, min(cfg['alert_reserved'], cfg['concurrency'] - 1))
+    _send_heap.clear()
+    _dispatch_wakeup = asyncio.Event()
+    _queue_space = asyncio.Event()
+    _global_bucket = TokenBucket(cfg['global_rate'], cfg['global_burst'])
+    _group_buckets.clear()
+    _group_backlogs.clear()
+    for key in _send_stats:
+        _send_stats[key] = 0
+    for priority in PRIORITY_NAMES:
+        _lane_in_flight[priority] = 0
+        _lane_dispatch_delay[priority].clear()
+        _send_latency[priority].clear()
+    _send_queue_running = True
+    _dispatcher_task = asyncio.create_task(_dispatch_loop())
+    logging.info(f"消息发送队列已启动：并发 {cfg['concurrency']}（预警保留 {cfg['alert_reserved']}），"
+                 f"全局 {cfg['global_rate']}/s，单群 {cfg['group_rate']}/s，最多重试 {cfg['max_retries']} 次")
+
+
+async def stop_send_queue() -> None:
+    """停止发送队列，未发送的消息以取消结束"""
+    global _send_queue_running, _dispatcher_task
+    if _dispatcher_task is None:
+        return
+    _send_queue_running = False
+    tasks = [_dispatcher_task, *_send_tasks]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _send_tasks.clear()
+
+    pending = [item[2] for item in _send_heap]
+    for backlog in _group_backlogs.values():
+        pending.extend(item[2] for item in backlog)
+    for job in pending:
+        if not job.future.done():
+            job.future.cancel()
+    _send_heap.clear()
+    _group_backlogs.clear()
+    _dispatcher_task = None
+    logging.info(f"消息发送队列已停止，丢弃 {len(pending)} 条未发送消息")
+
+
+def _spawn(coro) -> None:
+    task = asyncio.create_task(coro)
+    _send_tasks.add(task)
+    task.add_done_callback(_send_tasks.discard)
+
+
+def _group_bucket(group_id) -> TokenBucket:
+    bucket = _group_buckets.get(group_id)
+    if bucket is None:
+        cfg = _send_queue_config
+        bucket = _group_buckets[group_id] = TokenBucket(cfg['group_rate'], cfg['group_burst'])
+    return bucket
+
+
+def _push(item: Tuple[int, int, "_SendJob"]) -> None:
+    heapq.heappush(_send_heap, item)
+    _dispatch_wakeup.set()
+
+
+def _has_capacity(priority: int) -> bool:
+    """预警通道可使用全部发送名额，其他通道不能占用为预警保留的名额"""
+    cfg = _send_queue_config
+    total = sum(_lane_in_flight.values())
+    if total >= cfg['concurrency']:
+        return False
+    if priority == PRIORITY_ALERT:
+        return True
+    return total - _lane_in_flight[PRIORITY_ALERT] < cfg['concurrency'] - cfg['alert_reserved']
+
+
+async def _dispatch_loop() -> None:
+    """按通道优先级取出消息，经过单群和全局限速后交给发送任务"""
+    while True:
+        # 堆顶总是当前最高优先级的消息；名额不足时等待，期间新到的预警消息会成为堆顶
+        if not _send_heap or not _has_capacity(_send_heap[0][0]):
+            _dispatch_wakeup.clear()
+            await _dispatch_wakeup.wait()
+            continue
+        item = _send_heap[0]
+        job = item[2]
+        if job.future.done():
+            heapq.heappop(_send_heap)
+            _queue_space.set()
+            continue
+
+        if not job.token_acquired and job.group_id is not None:
+            # 该群已有积压或令牌不足时排到积压队列，保持同一群内的先后顺序，且不占用发送名额；
+            # 预警消息越过积压直接取令牌（可少量透支），仍不足时排在积压队列最前
+            backlog = _group_backlogs.get(job.group_id)
+            bucket = _group_bucket(job.group_id)
+            if job.priority == PRIORITY_ALERT:
+                deferred = bucket.try_acquire(_send_queue_config['group_alert_burst']) > 0
+            else:
+                deferred = backlog is not None or bucket.try_acquire() > 0
+            if deferred:
+                heapq.heappop(_send_heap)
+                _queue_space.set()
+                _send_stats['deferred'] += 1
+                if backlog is None:
+                    backlog = _group_backlogs[job.group_id] = []
+                    _spawn(_drain_group_backlog(job.group_id))
+                heapq.heappush(backlog, item)
+                continue
+            job.token_acquired = True
+
+        # 全局令牌不足时消息留在堆中等待，等待结束后重新查看堆顶（期间到达的预警消息先发）
+        wait = _global_bucket.try_acquire()
+        if wait > 0:
+            await asyncio.sleep(wait)
+            continue
+        heapq.heappop(_send_heap)
+        _queue_space.set()
+        _lane_in_flight[job.priority] += 1
+        _lane_dispatch_delay[job.priority].append((time.perf_counter() - job.enqueued_at) * 1000)
+        _spawn(_deliver(job))
+
+
+async def _drain_group_backlog(group_id) -> None:
+    """按单群令牌速率把积压消息逐条放回队列"""
+    backlog = _group_backlogs[group_id]
+    bucket = _group_bucket(group_id)
+    try:
+        while backlog:
+            wait = bucket.try_acquire()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            item = heapq.heappop(backlog)
+            item[2].token_acquired = True
+            _push(item)
+    finally:
+        if not backlog:
+            _group_backlogs.pop(group_id, None)
+
+
+async def _requeue_later(job: _SendJob, delay: float) -> None:
+    _send_stats['retry_waiting'] += 1
+    try:
+        await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        job.future.cancel()
+        raise
+    finally:
+        _send_stats['retry_waiting'] -= 1
+    job.token_acquired = False
+    _push((job.priority, job.seq, job))
+
+
+async def _deliver(job: _SendJob) -> None:
+    """执行一次HTTP请求，连接错误、429和5xx按带抖动的指数退避重试"""
+    try:
+        error = None
+        try:
+            status, response_text = await _do_post(job.endpoint, job.payload)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status, response_text, error = 0, '', e
+
+        retryable = error is not None or status == 429 or status >= 500
+        cfg = _send_queue_config
+        if retryable and job.attempts < cfg['max_retries'] and not job.future.done():
+            job.attempts += 1
+            _send_stats['retried'] += 1
+            delay = min(cfg['retry_max'], cfg['retry_base'] * 2 ** (job.attempts - 1)) * random.uniform(0.5, 1.5)
+            logging.warning(f"发送到群 {job.group_id} 失败（{error or status}），{delay:.1f} 秒后第 {job.attempts} 次重试")
+            _spawn(_requeue_later(job, delay))
+            return
+
+        _send_stats['sent' if status == 200 else 'failed'] += 1
+        _send_latency[job.priority].append((time.perf_counter() - job.enqueued_at) * 1000)
+        if not job.future.done():
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result((status, response_text))
+    finally:
+        _lane_in_flight[job.priority] -= 1
+        _dispatch_wakeup.set()
+
+
+async def _do_post(endpoint: str, payload: Dict[str, Any]) -> Tuple[int, str]:
+    async with SESSION.post(endpoint, json=payload, headers=HEADERS) as resp:
+        return resp.status, await resp.text()
+
+
+async def _post(endpoint: str, payload: Dict[str, Any]) -> Tuple[int, str]:
+    """
+    发送请求到 NapCat：发送队列已启动时排队（限速、通道优先级、重试），否则直接发送
+    :return: (HTTP状态码, 响应文本)
+    """
+    if not _send_queue_running:
+        return await _do_post(endpoint, payload)
+    job = _SendJob(endpoint, payload, _send_priority.get())
+    # 队列已满时等待（预警通道不受队列上限限制）
+    while job.priority != PRIORITY_ALERT and len(_send_heap) >= _send_queue_config['max_size']:
+        _queue_space.clear()
+        await _queue_space.wait()
+    _push((job.priority, job.seq, job))
+    return await job.future
+
+
+def _summarize(samples: deque) -> Optional[Dict[str, float]]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'avg_ms': sum(ordered) / len(ordered),
+        'p95_ms': ordered[max(0, int(len(ordered) * 0.95) - 1)],
+        'max_ms': ordered[-1],
+    }
+
+
+def get_send_queue_stats() -> Dict[str, Any]:
+    """获取发送队列统计：发送结果计数，以及各通道的排队数、发送中数量、调度延迟和总延迟"""
+    depth = {priority: 0 for priority in PRIORITY_NAMES}
+    for priority, _, _ in _send_heap:
+        depth[priority] += 1
+    lanes = {}
+    for priority, name in PRIORITY_NAMES.items():
+        lanes[name] = {
+            'queued': depth[priority],
+            'in_flight': _lane_in_flight[priority],
+            'dispatch_delay': _summarize(_lane_dispatch_delay[priority]),
+            'latency': _summarize(_send_latency[priority]),
+        }
+    return dict(_send_stats,
+                running=_send_queue_running,
+                queue_depth=len(_send_heap),
+                in_flight=sum(_lane_in_flight.values()),
+                backlog=sum(len(backlog) for backlog in _group_backlogs.values()),
+                lanes=lanes)
+
 
 async def send_group_msg_with_at(group_id: str, text: str, user_id: str = None) -> bool:
     """
@@ -81,16 +512,15 @@ async def send_group_msg_with_at(group_id: str, text: str, user_id: str = None)
             "message": message_content
         }
 
-        async with SESSION.post('/send_group_msg', json=payload, headers=HEADERS) as resp:
-            response_text = await resp.text()
+        status, response_text = await _post('/send_group_msg', payload)
 
-            if resp.status == 200:
-                at_info = f"@{user_id} " if user_id else ""
-                logging.info(f"发送带@消息到群 {group_id}: {at_info}{text[:50]}...")
-                return True
-            else:
-                logging.error(f"发送带@消息失败，状态码 {resp.status}: {response_text}")
-                return False
+        if status == 200:
+            at_info = f"@{user_id} " if user_id else ""
+            logging.info(f"发送带@消息到群 {group_id}: {at_info}{text[:50]}...")
+            return True
+        else:
+            logging.error(f"发送带@消息失败，状态码 {status}: {response_text}")
+            return False
 
     except ValueError as e:
         logging.error(f"群号格式错误: {e}")
@@ -103,13 +533,15 @@ async def send_group_msg_with_at(group_id: str, text: str, user_id: str = None)
         return False
 
 
-async def send_group_msg_with_text_and_image(group_id: str, text: str, image_path: str = None, user_id: str = None) -> bool:
+async def send_group_msg_with_text_and_image(group_id: str, text: str, image_path: str = None, user_id: str = None,
+                                             user_ids: List[str] = None) -> bool:
     """
     在同一消息中发送文本和图片到QQ群
     :param group_id: 群号
     :param text: 文本内容
     :param image_path: 图片文件路径（可选）
     :param user_id: 要@的用户ID（可选）
+    :param user_ids: 要@的多个用户ID（可选，与 user_id 合并并去重，同一群的多个订阅者只需发送一条消息）
     :return: 发送是否成功
     """
     global SESSION, HEADERS
@@ -117,17 +549,28 @@ async def send_group_msg_with_text_and_image(group_id: str, text: str, image_pat
         logging.error("消息发送器未初始化")
         return False
 
+    # 去掉重复的用户ID（同一用户多个订阅匹配时只@一次），保持原有顺序
+    at_users = list(dict.fromkeys(str(uid) for uid in ([user_id] + list(user_ids or [])) if uid))
+
     try:
         message_content = []
         
-        # 如果有用户ID，添加@CQ码
-        if user_id:
-            message_content.append({
-                "type": "at",
-                "data": {
-                    "qq": str(user_id)
-                }
-            })
+        # 如果有用户ID，添加@CQ码（多个@之间用空格分隔）
+        if at_users:
+            for i, at_user in enumerate(at_users):
+                if i:
+                    message_content.append({
+                        "type": "text",
+                        "data": {
+                            "text": " "
+                        }
+                    })
+                message_content.append({
+                    "type": "at",
+                    "data": {
+                        "qq": str(at_user)
+                    }
+                })
             # 添加换行
             message_content.append({
                 "type": "text",
@@ -154,15 +597,10 @@ async def send_group_msg_with_text_and_image(group_id: str, text: str, image_pat
                 }
             })
             
-            # 读取并编码图片数据
-            with open(image_path, 'rb') as f:
-                img_data = f.read()
-                b64 = base64.b64encode(img_data).decode('utf-8')
-            
             message_content.append({
                 "type": "image",
                 "data": {
-                    "file": f"base64://{b64}"
+                    "file": get_image_file(image_path)
                 }
             })
         
@@ -171,17 +609,16 @@ async def send_group_msg_with_text_and_image(group_id: str, text: str, image_pat
             "message": message_content
         }
 
-        async with SESSION.post('/send_group_msg', json=payload, headers=HEADERS) as resp:
-            response_text = await resp.text()
-            
-            if resp.status == 200:
-                at_info = f"@{user_id} " if user_id else ""
-                img_info = "含图片" if image_path else "纯文本"
-                logging.info(f"发送复合消息到群 {group_id}: {at_info}{img_info}, 文本长度: {len(text)}")
-                return True
-            else:
-                logging.error(f"发送复合消息失败，状态码 {resp.status}: {response_text}")
-                return False
+        status, response_text = await _post('/send_group_msg', payload)
+
+        if status == 200:
+            at_info = "".join(f"@{at_user} " for at_user in at_users)
+            img_info = "含图片" if image_path else "纯文本"
+            logging.info(f"发送复合消息到群 {group_id}: {at_info}{img_info}, 文本长度: {len(text)}")
+            return True
+        else:
+            logging.error(f"发送复合消息失败，状态码 {status}: {response_text}")
+            return False
                 
     except Exception as e:
         logging.error(f"发送复合消息时发生错误: {e}")
@@ -211,16 +648,15 @@ async def send_group_msg(group_id: str, text: str, no_merge_forward: bool = Fals
                 "message": text
             }
 
-            async with SESSION.post('/send_group_msg', json=payload, headers=HEADERS) as resp:
-                response_text = await resp.text()
+            status, response_text = await _post('/send_group_msg', payload)
 
-                if resp.status == 200:
-                    forward_info = "(禁用合并转发)" if no_merge_forward else ""
-                    logging.info(f"发送文本到群 {group_id}{forward_info}: {text[:50]}...")  # 只记录前50个字符
-                    return True
-                else:
-                    logging.error(f"发送失败，状态码 {resp.status}: {response_text}")
-                    return False
+            if status == 200:
+                forward_info = "(禁用合并转发)" if no_merge_forward else ""
+                logging.info(f"发送文本到群 {group_id}{forward_info}: {text[:50]}...")  # 只记录前50个字符
+                return True
+            else:
+                logging.error(f"发送失败，状态码 {status}: {response_text}")
+                return False
 
     except ValueError as e:
         logging.error(f"群号格式错误: {e}")
@@ -264,14 +700,13 @@ async def send_forward_msg(group_id: str, text: str) -> bool:
 
         # 首先尝试使用 send_group_forward_msg API
         try:
-            async with SESSION.post('/send_group_forward_msg', json=payload, headers=HEADERS) as resp:
-                response_text = await resp.text()
-
-                if resp.status == 200:
-                    logging.info(f"发送合并转发消息到群 {group_id}，消息长度: {len(text)} 字符")
-                    return True
-                else:
-                    logging.warning(f"合并转发API失败，状态码 {resp.status}: {response_text}")
+            status, response_text = await _post('/send_group_forward_msg', payload)
+
+            if status == 200:
+                logging.info(f"发送合并转发消息到群 {group_id}，消息长度: {len(text)} 字符")
+                return True
+            else:
+                logging.warning(f"合并转发API失败，状态码 {status}: {response_text}")
         except Exception as api_error:
             logging.warning(f"合并转发API调用失败: {api_error}")
 
@@ -282,14 +717,14 @@ async def send_forward_msg(group_id: str, text: str) -> bool:
             "message": text
         }
         
-        async with SESSION.post('/send_group_msg', json=payload_fallback, headers=HEADERS) as fallback_resp:
-            if fallback_resp.status == 200:
-                logging.info(f"使用普通消息方式发送长消息到群 {group_id}，消息长度: {len(text)} 字符")
-                return True
-            else:
-                fallback_response_text = await fallback_resp.text()
-                logging.error(f"发送长消息失败，状态码 {fallback_resp.status}: {fallback_response_text}")
-                return False
+        status, fallback_response_text = await _post('/send_group_msg', payload_fallback)
+
+        if status == 200:
+            logging.info(f"使用普通消息方式发送长消息到群 {group_id}，消息长度: {len(text)} 字符")
+            return True
+        else:
+            logging.error(f"发送长消息失败，状态码 {status}: {fallback_response_text}")
+            return False
 
     except ValueError as e:
         logging.error(f"群号格式错误: {e}")
@@ -315,30 +750,24 @@ async def send_group_img(group_id: str, file_path: str) -> bool:
         return False
 
     try:
-        # 读取并编码图片数据
-        with open(file_path, 'rb') as f:
-            img_data = f.read()
-            b64 = base64.b64encode(img_data).decode('utf-8')
-
         payload = {
             "group_id": int(group_id),
             "message": [{
                 "type": "image",
                 "data": {
-                    "file": f"base64://{b64}"  # NapCat 支持 base64:// 前缀
+                    "file": get_image_file(file_path)  # base64:// / file:// / URL，同一图片只编码一次
                 }
             }]
         }
 
-        async with SESSION.post('/send_group_msg', json=payload, headers=HEADERS) as resp:
-            response_text = await resp.text()
-            
-            if resp.status == 200:
-                logging.info(f"发送 base64 图片到群 {group_id} 成功: {file_path}")
-                return True
-            else:
-                logging.error(f"发送 base64 图片失败，状态码 {resp.status}: {response_text}")
-                return False
+        status, response_text = await _post('/send_group_msg', payload)
+
+        if status == 200:
+            logging.info(f"发送图片到群 {group_id} 成功（{IMAGE_MODE}）: {file_path}")
+            return True
+        else:
+            logging.error(f"发送图片失败，状态码 {status}: {response_text}")
+            return False
                 
     except FileNotFoundError:
         logging.error(f"图片文件不存在: {file_path}")
@@ -358,8 +787,9 @@ async def send_group_img(group_id: str, file_path: str) -> bool:
 
 
 async def close_sender() -> None:
-    """关闭HTTP会话"""
+    """关闭发送队列和HTTP会话"""
     global SESSION
+    await stop_send_queue()
     if SESSION:
         await SESSION.close()
         SESSION = None  # 重置为None以便后续初始化
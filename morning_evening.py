@@ -5,22 +5,23 @@ Bydbot - 早晚安功能模块
 
 import asyncio
 import logging
-import aiosqlite
 import os
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Tuple
-from message_sender import send_group_msg, send_group_msg_with_text_and_image
+import db_pool
+from message_sender import send_group_msg, send_group_msg_with_text_and_image, send_priority, PRIORITY_BACKGROUND
 from weather_api import QWeatherAPI
 
 # 全局变量
 morning_evening_db_path = None
 
 async def init_morning_evening_db():
-    """初始化早晚安数据库路径"""
+    """初始化早晚安数据库路径（查询经由全局连接池）"""
     global morning_evening_db_path
     data_dir = os.path.join(os.path.dirname(__file__), 'data')
     os.makedirs(data_dir, exist_ok=True)
     morning_evening_db_path = os.path.join(data_dir, 'eqdata.db')
+    await db_pool.get_db_pool()
     logging.info("早晚安数据库路径初始化完成")
 
 def get_db_path() -> str:
@@ -33,20 +34,18 @@ def get_db_path() -> str:
 async def get_user_status(user_id: str, group_id: str) -> Optional[Dict]:
     """获取用户早晚安状态（简化版）"""
     try:
-        async with aiosqlite.connect(get_db_path()) as db:
-            async with db.execute(
-                """SELECT last_morning_time, last_evening_time, location_id 
-                   FROM morning_evening_status 
-                   WHERE user_id = ? AND group_id = ?""",
-                (user_id, group_id)
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return {
-                        'last_morning_time': row[0],
-                        'last_evening_time': row[1],
-                        'location_id': row[2]
-                    }
+        row = await db_pool.fetchone(
+            """SELECT last_morning_time, last_evening_time, location_id 
+               FROM morning_evening_status 
+               WHERE user_id = ? AND group_id = ?""",
+            (user_id, group_id)
+        )
+        if row:
+            return {
+                'last_morning_time': row[0],
+                'last_evening_time': row[1],
+                'location_id': row[2]
+            }
         return None
     except Exception as e:
         logging.error(f"获取用户状态失败: {e}")
@@ -56,7 +55,7 @@ async def update_user_status(user_id: str, group_id: str, is_morning: bool, loca
     """更新用户早晚安状态 - 简化版（移除清醒时间计算）"""
     try:
         current_time = datetime.now()
-        async with aiosqlite.connect(get_db_path()) as db:
+        async with db_pool.transaction() as db:
             # 定义一天的开始时间
             today_start = current_time.replace(hour=6, minute=0, second=0, microsecond=0)
             if current_time.hour < 6:
@@ -102,7 +101,6 @@ async def update_user_status(user_id: str, group_id: str, is_morning: bool, loca
                         VALUES (?, ?, ?, ?, ?)
                     """, (user_id, group_id, current_time.isoformat(), location_id, current_time.isoformat()))
             
-            await db.commit()
             logging.info(f"用户 {user_id} 状态更新成功 (早安: {is_morning})")
         return True
     except Exception as e:
@@ -112,14 +110,12 @@ async def update_user_status(user_id: str, group_id: str, is_morning: bool, loca
 async def get_last_evening_time(user_id: str, group_id: str) -> Optional[datetime]:
     """获取用户上次晚安时间"""
     try:
-        async with aiosqlite.connect(get_db_path()) as db:
-            async with db.execute(
-                "SELECT last_evening_time FROM morning_evening_status WHERE user_id = ? AND group_id = ?",
-                (user_id, group_id)
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row and row[0]:
-                    return datetime.fromisoformat(row[0])
+        row = await db_pool.fetchone(
+            "SELECT last_evening_time FROM morning_evening_status WHERE user_id = ? AND group_id = ?",
+            (user_id, group_id)
+        )
+        if row and row[0]:
+            return datetime.fromisoformat(row[0])
         return None
     except Exception as e:
         logging.error(f"获取上次晚安时间失败: {e}")
@@ -185,7 +181,7 @@ async def is_already_greeted_today(user_id: str, group_id: str, is_morning: bool
         return False
     
     try:
-        async with aiosqlite.connect(get_db_path()) as db:
+        async with db_pool.transaction() as db:
             # 定义一天的开始时间为早上6点
             now = datetime.now()
             today_start = now.replace(hour=6, minute=0, second=0, microsecond=0)
@@ -250,17 +246,15 @@ async def get_user_location_id(user_id: str, group_id: str) -> Optional[str]:
     """获取用户订阅地区的LocationID"""
     try:
         # 从订阅表中获取用户订阅的最小行政区域
-        async with aiosqlite.connect(get_db_path()) as db:
-            async with db.execute(
-                """SELECT full_location FROM weather_subscriptions 
-                   WHERE user_id = ? AND group_id = ? AND location_type = 'location' 
-                   ORDER BY full_location DESC LIMIT 1""",
-                (user_id, group_id)
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row and row[0]:
-                    # 使用城市搜索获取LocationID
-                    return await get_location_id_by_name(row[0])
+        row = await db_pool.fetchone(
+            """SELECT full_location FROM weather_subscriptions 
+               WHERE user_id = ? AND group_id = ? AND location_type = 'location' 
+               ORDER BY full_location DESC LIMIT 1""",
+            (user_id, group_id)
+        )
+        if row and row[0]:
+            # 使用城市搜索获取LocationID
+            return await get_location_id_by_name(row[0])
         return None
     except Exception as e:
         logging.error(f"获取用户LocationID失败: {e}")
@@ -298,6 +292,12 @@ async def get_location_id_by_name(location_name: str) -> Optional[str]:
         return "101010100"  # 默认北京的LocationID
 
 async def handle_morning_evening_command(command: str, user_id: str, group_id: str, config: Dict) -> bool:
+    """处理早晚安命令（问候消息以低优先级发送，不挤占预警推送）"""
+    with send_priority(PRIORITY_BACKGROUND):
+        return await _handle_morning_evening_command(command, user_id, group_id, config)
+
+
+async def _handle_morning_evening_command(command: str, user_id: str, group_id: str, config: Dict) -> bool:
     """处理早晚安命令"""
     try:
         is_morning = command == "早安"
@@ -0,0 +1,126 @@
+"""
+Bydbot - 地区名称多模式匹配模块
+基于 Aho–Corasick 自动机：对全部订阅的省/市/区县名称建一棵字典树，
+扫描一遍预警标题即可找出所有出现的地区名，耗时与订阅地区的数量无关
+"""
+
+from typing import Dict, Iterable, List, Optional, Set
+
+# 不再属于任何名称的节点超过此数量且超过节点总数的一半时，按现有名称重建字典树
+COMPACT_MIN_ORPHANS = 256
+
+
+class RegionMatcher:
+    """
+    地区名称匹配器
+    新增名称只修改字典树并标记失效，失败指针在下一次匹配时统一重建（订阅变更远少于匹配）；
+    移除名称只清除结尾标记，不需要重建，不再使用的节点累积到一定数量后整体重建字典树
+    """
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self._reset()
+        for pattern in patterns:
+            self.add(pattern)
+
+    def _reset(self) -> None:
+        # 节点 i 的转移表、失败指针、以该节点结尾的名称、沿失败链最近的结尾节点
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]
+        self._output_link: List[int] = [-1]
+        # 经过节点 i 的名称数量，为0的节点（根节点除外）已不属于任何名称
+        self._refs: List[int] = [0]
+        self._orphans = 0
+        self._patterns: Set[str] = set()
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def __contains__(self, pattern: str) -> bool:
+        return pattern in self._patterns
+
+    def add(self, pattern: str) -> None:
+        """加入一个名称（已存在时忽略）"""
+        if not pattern or pattern in self._patterns:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._output_link.append(-1)
+                self._refs.append(0)
+            elif self._refs[next_node] == 0:
+                self._orphans -= 1
+            node = next_node
+            self._refs[node] += 1
+        self._output[node] = pattern
+        self._patterns.add(pattern)
+        self._dirty = True
+
+    def discard(self, pattern: str) -> None:
+        """
+        移除一个名称（不存在时忽略）
+        失败指针和输出链保持不变（匹配时跳过没有名称的节点），节点暂时保留供之后复用
+        """
+        if pattern not in self._patterns:
+            return
+        node = 0
+        for char in pattern:
+            node = self._goto[node][char]
+            self._refs[node] -= 1
+            if self._refs[node] == 0:
+                self._orphans += 1
+        self._output[node] = None
+        self._patterns.discard(pattern)
+        if self._orphans > COMPACT_MIN_ORPHANS and self._orphans * 2 > len(self._goto):
+            self._compact()
+
+    def _compact(self) -> None:
+        """按现有名称重建字典树，释放不再使用的节点"""
+        patterns = self._patterns
+        self._reset()
+        for pattern in patterns:
+            self.add(pattern)
+
+    def _build(self) -> None:
+        """按广度优先重建失败指针和输出链"""
+        queue = []
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            self._output_link[node] = -1
+            queue.append(node)
+        for node in queue:
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._output_link[child] = fail if self._output[fail] is not None else self._output_link[fail]
+                queue.append(child)
+        self._dirty = False
+
+    def find_all(self, text: str) -> Set[str]:
+        """返回文本中出现的全部名称（包括相互重叠或包含的名称）"""
+        if self._dirty:
+            self._build()
+        goto, fail, output, output_link = self._goto, self._fail, self._output, self._output_link
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if output[node] is not None else output_link[node]
+            while match > 0:
+                # 移除名称后输出链不重建，链上可能有已没有名称的节点
+                if output[match] is not None:
+                    found.add(output[match])
+                match = output_link[match]
+        return found
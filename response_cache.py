@@ -0,0 +1,166 @@
+"""
+Bydbot - 接口响应缓存模块
+带过期时间的LRU缓存：条目数（以及可选的总字节数）有上限，过期条目在读取和写入时淘汰；
+同一键的并发请求只发起一次（single-flight），其余请求等待同一结果
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 600
+
+
+def payload_size(value: Any) -> int:
+    """估算缓存值占用的字节数：二进制数据按长度计算，其他按字符串形式的长度估算"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(str(value))
+
+
+class ResponseCache:
+    """带TTL的LRU响应缓存"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, default_ttl: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: Optional[int] = None):
+        """
+        :param max_entries: 条目数上限
+        :param default_ttl: 写入时未指定过期时间则使用此值（秒）
+        :param max_bytes: 总字节数上限（按 payload_size 估算），None 表示不限制
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        # 键 -> (值, 过期时间, 字节数)，按最近使用排序
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        # 正在请求中的键 -> 等待结果的 Future
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'expired': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.time()
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，不存在或已过期时返回None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        if entry[1] <= time.time():
+            self._remove(key)
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存，超出上限时先淘汰过期项，再淘汰最久未使用的"""
+        self.discard(key)
+        size = payload_size(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            # 单个值超过总上限时不缓存
+            return
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at, size)
+        self._bytes += size
+        if self._over_limit():
+            self.evict_expired()
+        while self._over_limit():
+            self._remove(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+    def resize(self, max_entries: int, max_bytes: Optional[int] = None) -> None:
+        """修改条目数和总字节数上限，超出新上限的条目立即淘汰（已缓存条目的字节数按原设置计算）"""
+        if max_bytes is not None and self.max_bytes is None:
+            # 原来不限制字节数时没有记录各条目的大小，清空后重新计算
+            self.clear()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        if self._over_limit():
+            self.evict_expired()
+        while self._over_limit():
+            self._remove(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+    def _over_limit(self) -> bool:
+        return len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes)
+
+    def _remove(self, key: str) -> None:
+        self._bytes -= self._entries.pop(key)[2]
+
+    def discard(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """淘汰所有过期条目，返回淘汰数量"""
+        now = time.time() if now is None else now
+        expired = [key for key, entry in self._entries.items() if entry[1] <= now]
+        for key in expired:
+            self._remove(key)
+        self.stats['expired'] += len(expired)
+        return len(expired)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Optional[Any]]],
+                           ttl: Optional[float] = None,
+                           cacheable: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        读取缓存，未命中时调用 fetch 获取并写入缓存
+        同一键已有请求在进行时不再重复请求，直接等待其结果；
+        fetch 返回None（请求失败）或 cacheable(结果) 为False时只返回结果，不缓存
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats['coalesced'] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # 发起请求的一方被取消（如命令超时）时由当前等待者重新请求
+                if not inflight.cancelled():
+                    raise
+                return await self.get_or_fetch(key, fetch, ttl, cacheable)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+            # fetch 自行写入了缓存（如沿用下层缓存的剩余有效期）时不覆盖
+            if value is not None and key not in self and (cacheable is None or cacheable(value)):
+                self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计：命中/未命中/合并请求次数、命中率、条目数和占用字节数"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        hit_rate = (self.stats['hits'] + self.stats['coalesced']) / (lookups or 1)
+        return dict(self.stats, entries=len(self._entries), max_entries=self.max_entries,
+                    bytes=self._bytes, max_bytes=self.max_bytes,
+                    inflight=len(self._inflight), hit_rate=hit_rate)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+测试广播模式下命令不受超时限制的脚本（入口模块与 command_handler 共享同一份广播状态）
+"""
+
+import asyncio
+import importlib.util
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import command_handler
+
+
+def load_entry_module():
+    """
+    像 python bydbot.py 那样加载入口模块：模块对象独立于 import bydbot 得到的那一份
+    （以 __main__ 名义执行会启动机器人，这里换一个名字加载）
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bydbot.py')
+    spec = importlib.util.spec_from_file_location('bydbot_entry', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_broadcast_timeout():
+    """测试进入广播模式后，入口模块读到的命令超时为None，退出后恢复默认值"""
+    print("=== 测试广播模式命令超时 ===")
+    entry = load_entry_module()
+    import bydbot
+    assert entry is not bydbot
+
+    config = {'enable_command_listener': True, 'owner_id': '10001'}
+    sent = []
+
+    async def fake_send(group_id, message, *args, **kwargs):
+        sent.append(message)
+
+    def event(message):
+        return {'post_type': 'message', 'message_type': 'group', 'group_id': 1,
+                'user_id': 10001, 'raw_message': message}
+
+    async def run():
+        original_send = command_handler.send_group_msg
+        command_handler.send_group_msg = fake_send
+        try:
+            await command_handler.handle_command(event('/broadcast'), config)
+            in_broadcast = entry.get_command_timeout(event('通知'), config)
+            await command_handler.handle_command(event('0'), config)
+            after_exit = entry.get_command_timeout(event('通知'), config)
+            return in_broadcast, after_exit
+        finally:
+            command_handler.send_group_msg = original_send
+            command_handler.broadcast_mode.clear()
+
+    in_broadcast, after_exit = asyncio.run(run())
+    assert in_broadcast is None, in_broadcast
+    assert after_exit == entry.DEFAULT_COMMAND_TIMEOUT, after_exit
+    assert len(sent) == 2, sent
+    print("  ✅ 广播模式下不设超时，退出后恢复")
+    return True
+
+
+def main():
+    tests = [test_broadcast_timeout]
+    success_count = sum(1 for test in tests if test())
+    print(f"\n=== 测试总结 ===")
+    print(f"成功: {success_count}/{len(tests)}")
+    return success_count == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
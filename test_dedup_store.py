@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+测试去重存储功能的脚本
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+from dedup_store import DedupStore, make_event_key
+
+
+def test_event_key():
+    """测试组合键生成"""
+    print("=== 测试组合键生成 ===")
+    assert make_event_key('cea', {'id': '123'}) == 'cea_123'
+    fallback = make_event_key('usgs', {'shockTime': '2026-01-01 00:00:00', 'latitude': 30, 'longitude': 103, 'magnitude': 5})
+    assert fallback == 'usgs_2026-01-01 00:00:00_30_103_5'
+    print("  ✅ 组合键生成正确")
+    return True
+
+
+def test_ttl_eviction():
+    """测试过期淘汰与容量上限"""
+    print("=== 测试过期淘汰 ===")
+    store = DedupStore(ttl_seconds=60, max_entries=3)
+    now = time.time()
+    store.load([('old', now - 120), ('mid', now - 30), ('new', now - 1)])
+    # 加载时已淘汰过期项，且保持时间顺序
+    assert 'old' not in store
+    assert list(store) == ['mid', 'new']
+
+    store.add('a')
+    store.add('b')
+    # 超出容量时淘汰最旧的
+    assert len(store) == 3
+    assert 'mid' not in store and 'b' in store
+
+    assert store.evict_expired(now=now + 3600) == 3
+    assert len(store) == 0
+    print("  ✅ 过期淘汰正确")
+    return True
+
+
+def test_stable_identity():
+    """测试清理后其他模块持有的引用仍然有效，初始数据的键与实时消息一致，其他数据源复用ID按独立事件入库"""
+    print("=== 测试引用稳定性 ===")
+    import db_pool
+    import ws_handler
+
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await ws_handler.init_db(os.path.join(tmp_dir, 'eqdata.db'))
+            try:
+                held = ws_handler.processed_ids
+                event = {'id': 'dedup_test_1', 'shockTime': '2026-01-01 00:00:00'}
+                await ws_handler.handle_initial_data({'Data': [{'source': 'cea', 'Data': event}]}, {})
+                assert make_event_key('cea', event) in held
+
+                await ws_handler.upsert_earthquake(event, 'cea')
+                held.load(await ws_handler.load_recent_ids_from_db())
+                await ws_handler.cleanup_processed_ids()
+                assert held is ws_handler.processed_ids
+                assert 'cea_dedup_test_1' in held
+                assert held.memory_usage() > 0
+
+                # 其他数据源复用同一ID时按独立事件入库，其后续修订照常检测
+                assert await ws_handler.upsert_earthquake(event, 'cwa') == ws_handler.UPSERT_NEW
+                assert await ws_handler.upsert_earthquake(event, 'cwa') == ws_handler.UPSERT_UNCHANGED
+                revised = dict(event, magnitude=5.0)
+                assert await ws_handler.upsert_earthquake(revised, 'cwa') == ws_handler.UPSERT_CHANGED
+                assert await ws_handler.get_stored_earthquake_data('dedup_test_1', 'cwa') == revised
+                assert await ws_handler.get_stored_earthquake_data('dedup_test_1', 'cea') == event
+            finally:
+                ws_handler.processed_ids.clear()
+                await db_pool.close_db_pool()
+
+    asyncio.run(run())
+    print("  ✅ 引用保持不变")
+    return True
+
+
+def test_primary_key_migration():
+    """测试旧版本以 id 为主键的地震表迁移为 (source, id) 主键，已有数据保留"""
+    print("=== 测试地震表主键迁移 ===")
+    import sqlite3
+    import db_pool
+    import ws_handler
+
+    async def run(db_path):
+        await ws_handler.init_db(db_path)
+        try:
+            event = {'id': 'old_1'}
+            assert await ws_handler.get_stored_earthquake_data('old_1', 'cea') == event
+            assert await ws_handler.upsert_earthquake(event, 'cwa') == ws_handler.UPSERT_NEW
+            rows = await db_pool.fetchall("SELECT source, revision FROM earthquakes WHERE id = 'old_1' ORDER BY source")
+            assert [tuple(row) for row in rows] == [('cea', 0), ('cwa', 0)], rows
+        finally:
+            await db_pool.close_db_pool()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'eqdata.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute('CREATE TABLE earthquakes (id TEXT PRIMARY KEY, source TEXT NOT NULL, shock_time TEXT, '
+                     'latitude REAL, longitude REAL, magnitude REAL, depth REAL, place_name TEXT, '
+                     'info_type_name TEXT, data_json TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+        conn.execute("INSERT INTO earthquakes (id, source, data_json) VALUES ('old_1', 'cea', '{\"id\": \"old_1\"}')")
+        conn.commit()
+        conn.close()
+        asyncio.run(run(db_path))
+    print("  ✅ 主键已迁移，旧数据保留")
+    return True
+
+
+def test_suppressed_revision():
+    """测试被判定为重复报告的事件，其后续修订同样不推送；无震级的索引事件不参与震级匹配"""
+    print("=== 测试重复报告的修订 ===")
+    import db_pool
+    import ws_handler
+    from event_index import EventIndex
+
+    class FakeConfig:
+        def get(self, key, default=None):
+            return {'earthquake.dedup.spatial': True, 'earthquake.coalesce.enabled': False}.get(key, default)
+
+    pushed = []
+
+    async def fake_push(event_data, source, config, target_group=None):
+        pushed.append((source, event_data['id'], event_data['magnitude']))
+
+    shock_time = time.strftime('%Y-%m-%d %H:%M:%S')
+    first = {'id': 'eq_a', 'shockTime': shock_time, 'latitude': 30.0, 'longitude': 103.0, 'magnitude': 5.0}
+    duplicate = dict(first, id='eq_b', latitude=30.1)
+
+    async def run():
+        original_push = ws_handler.process_text_message_only
+        ws_handler.process_text_message_only = fake_push
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await ws_handler.init_db(os.path.join(tmp_dir, 'eqdata.db'))
+            try:
+                for event in (first, duplicate, dict(duplicate, magnitude=5.2), dict(first, magnitude=5.1)):
+                    await ws_handler.process_fan_data({'type': 'update', 'source': 'cenc', 'Data': event},
+                                                      FakeConfig(), apply_rules=False)
+            finally:
+                ws_handler.process_text_message_only = original_push
+                ws_handler.processed_ids.clear()
+                ws_handler.suppressed_ids.clear()
+                ws_handler.event_index.clear()
+                await db_pool.close_db_pool()
+
+    asyncio.run(run())
+    assert pushed == [('cenc', 'eq_a', 5.0), ('cenc', 'eq_a', 5.1)], pushed
+
+    index = EventIndex()
+    index.add('cenc_none', 'cenc', 'none', 1000.0, 30.0, 103.0, None)
+    assert index.query(30.0, 103.0, 1000.0, magnitude=5.0) == []
+    assert len(index.query(30.0, 103.0, 1000.0)) == 1
+    print("  ✅ 重复报告的修订未推送")
+    return True
+
+
+def test_render_image_cache():
+    """测试绘图结果写入图片路径缓存，同一绘图键再次请求时复用图片"""
+    print("=== 测试绘图缓存 ===")
+    import ws_handler
+
+    calls = []
+
+    async def fake_draw(event_data, source):
+        calls.append(event_data['id'])
+        return img_path
+
+    async def run():
+        original_draw = ws_handler.draw_earthquake_async
+        ws_handler.draw_earthquake_async = fake_draw
+        try:
+            event = {'id': 'render_test_1', 'shockTime': '2026-01-01 00:00:00'}
+            render_key = ws_handler.get_render_key(event, 'cenc')
+            first = await ws_handler._render_earthquake_image(render_key, event, 'cenc', {})
+            second = await ws_handler._render_earthquake_image(render_key, event, 'cenc', {})
+            return first, second
+        finally:
+            ws_handler.draw_earthquake_async = original_draw
+            ws_handler.cached_image_paths.clear()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        img_path = os.path.join(tmp_dir, 'render_test_1.png')
+        open(img_path, 'wb').close()
+        first, second = asyncio.run(run())
+    assert first == second == img_path, (first, second)
+    assert calls == ['render_test_1'], calls
+    print("  ✅ 绘图结果已缓存并复用")
+    return True
+
+
+def main():
+    tests = [test_event_key, test_ttl_eviction, test_stable_identity, test_primary_key_migration,
+             test_suppressed_revision, test_render_image_cache]
+    success_count = sum(1 for test in tests if test())
+    print(f"\n=== 测试总结 ===")
+    print(f"成功: {success_count}/{len(tests)}")
+    return success_count == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
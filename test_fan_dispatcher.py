@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+测试 FAN 消息分发（同一事件保序、慢速消息不阻塞预警、升级为预警的键、队列溢出）的脚本
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+from fan_dispatcher import FanDispatcher
+
+
+def test_ordering_and_alert_latency():
+    """测试同一事件的消息按顺序处理，且慢速的普通消息不会拖住预警消息"""
+    print("=== 测试保序与预警优先 ===")
+    processed = []
+
+    async def handler(item):
+        source, seq = item
+        if source == 'usgs':
+            await asyncio.sleep(0.3)  # 模拟慢速绘图
+        processed.append((source, seq, time.perf_counter()))
+
+    async def run():
+        dispatcher = FanDispatcher(handler, workers=2, alert_workers=1)
+        dispatcher.start()
+        start = time.perf_counter()
+        for seq in range(3):
+            dispatcher.submit(('usgs', seq), 'usgs_1')
+            dispatcher.submit(('usgs2', seq), 'usgs_2')
+        for seq in range(3):
+            dispatcher.submit(('cea', seq), 'cea_1', alert=True)
+        while dispatcher.pending_count or dispatcher.get_stats()['active_keys']:
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        return start, dispatcher.get_stats()
+
+    start, stats = asyncio.run(run())
+    for source in ('usgs', 'usgs2', 'cea'):
+        assert [seq for s, seq, _ in processed if s == source] == [0, 1, 2]
+    cea_done = max(t for s, _, t in processed if s == 'cea') - start
+    assert cea_done < 0.1, cea_done
+    assert stats['processed'] == 9 and stats['lag']['alert']['max_ms'] < 100
+    print(f"  ✅ 预警消息 {cea_done * 1000:.1f} ms 内处理完毕")
+    return True
+
+
+def test_overflow():
+    """测试队列满时丢弃普通消息，预警消息仍被接收"""
+    print("=== 测试队列溢出 ===")
+
+    async def handler(item):
+        await asyncio.sleep(1)
+
+    async def run():
+        dispatcher = FanDispatcher(handler, workers=1, alert_workers=0, max_pending=2)
+        dispatcher.start()
+        accepted = [dispatcher.submit(i, f'key_{i}') for i in range(4)]
+        accepted.append(dispatcher.submit('alert', 'alert_key', alert=True))
+        await dispatcher.stop()
+        return accepted, dispatcher.stats
+
+    accepted, stats = asyncio.run(run())
+    assert accepted == [True, True, False, False, True]
+    assert stats['overflow'] == 2
+    print("  ✅ 溢出计数正确")
+    return True
+
+
+def test_promoted_key():
+    """测试已在普通队列中排队的键收到预警消息后，按预警优先处理"""
+    print("=== 测试升级为预警的键 ===")
+    processed = []
+
+    async def handler(item):
+        await asyncio.sleep(0.05)
+        processed.append(item)
+
+    async def run():
+        dispatcher = FanDispatcher(handler, workers=1, alert_workers=0)
+        dispatcher.start()
+        dispatcher.submit('normal0', 'key_0')
+        await asyncio.sleep(0.01)
+        for i in range(1, 4):
+            dispatcher.submit(f'normal{i}', f'key_{i}')
+        dispatcher.submit('promoted', 'key_3', alert=True)
+        while dispatcher.pending_count or dispatcher.get_stats()['active_keys']:
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+
+    asyncio.run(run())
+    # key_0 已开始处理；key_3 升级为预警后排在 key_1、key_2 之前，且同一键内保持顺序
+    assert processed == ['normal0', 'normal3', 'promoted', 'normal1', 'normal2'], processed
+    print(f"  ✅ 处理顺序: {processed}")
+    return True
+
+
+def main():
+    tests = [test_ordering_and_alert_latency, test_overflow, test_promoted_key]
+    success_count = sum(1 for test in tests if test())
+    print(f"\n=== 测试总结 ===")
+    print(f"成功: {success_count}/{len(tests)}")
+    return success_count == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+测试地区名称匹配器（重叠/包含的名称、增删名称）以及气象预警订阅者匹配的脚本
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import db_pool
+import region_matcher
+from region_matcher import RegionMatcher
+
+
+def test_matcher():
+    """测试重叠名称、增删名称（含节点回收），并与逐个子串判断的结果对比"""
+    print("=== 测试地区匹配器 ===")
+    matcher = RegionMatcher(["吉林", "吉林省吉林市", "林省", "四川", "四川省成都市"])
+    assert matcher.find_all("吉林省吉林市气象台发布暴雨蓝色预警") == {"吉林", "吉林省吉林市", "林省"}
+    assert matcher.find_all("四川省绵阳市气象台发布大风预警") == {"四川"}
+
+    matcher.discard("吉林")
+    matcher.add("成都")
+    assert "吉林" not in matcher and len(matcher) == 5
+    assert matcher.find_all("吉林省吉林市") == {"吉林省吉林市", "林省"}
+    assert matcher.find_all("四川省成都市") == {"四川", "四川省成都市", "成都"}
+
+    random.seed(1)
+    patterns = {''.join(random.choice("甲乙丙丁") for _ in range(random.randint(1, 4))) for _ in range(60)}
+    matcher = RegionMatcher(patterns)
+    for _ in range(200):
+        text = ''.join(random.choice("甲乙丙丁戊") for _ in range(random.randint(0, 12)))
+        assert matcher.find_all(text) == {p for p in patterns if p in text}, text
+
+    # 反复增删名称后结果仍一致，不再使用的节点会被回收
+    for _ in range(3000):
+        pattern = ''.join(random.choice("甲乙丙丁戊己") for _ in range(random.randint(1, 6)))
+        if random.random() < 0.5:
+            matcher.add(pattern)
+            patterns.add(pattern)
+        else:
+            for removed in random.sample(sorted(patterns), min(2, len(patterns))):
+                matcher.discard(removed)
+                patterns.discard(removed)
+        if random.random() < 0.05:
+            text = ''.join(random.choice("甲乙丙丁戊己") for _ in range(20))
+            assert matcher.find_all(text) == {p for p in patterns if p in text}, text
+    assert matcher._orphans <= max(region_matcher.COMPACT_MIN_ORPHANS, len(matcher._goto) // 2)
+    print("  ✅ 匹配结果与逐个子串判断一致")
+    return True
+
+
+def test_match_subscribers():
+    """测试订阅/退订/重启加载后按标题匹配订阅者"""
+    print("=== 测试订阅者匹配 ===")
+    import cma_weather_subscriber
+
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await db_pool.init_db_pool(os.path.join(tmp_dir, 'eqdata.db'))
+            try:
+                subscriber = cma_weather_subscriber.CMAWeatherSubscriber({})
+                await subscriber.init_db()
+                await subscriber.subscribe_province('四川', '1', 'a')
+                await subscriber.subscribe_province('全国', '1', 'b')
+                await subscriber.subscribe_location('四川省成都市', '2', 'c')
+                await subscriber.subscribe_location('吉林省吉林市', '2', 'd')
+                title = '四川省成都市气象台发布暴雨蓝色预警'
+                assert subscriber.match_subscribers(title) == [('1', 'a'), ('2', 'c'), ('1', 'b')]
+
+                await subscriber.unsubscribe_location('四川省成都市', '2', 'c')
+                assert '四川省成都市' not in subscriber.region_matcher
+                assert subscriber.match_subscribers(title) == [('1', 'a'), ('1', 'b')]
+
+                # 重启后地区订阅加载到 location_subscribers 并重新建立索引
+                restarted = cma_weather_subscriber.CMAWeatherSubscriber({})
+                await restarted.load_subscriptions()
+                assert list(restarted.location_subscribers) == ['吉林省吉林市']
+                assert restarted.match_subscribers('吉林省吉林市气象台发布大风预警') == [('2', 'd'), ('1', 'b')]
+            finally:
+                await db_pool.close_db_pool()
+
+    asyncio.run(run())
+    print("  ✅ 订阅者匹配正确")
+    return True
+
+
+def main():
+    tests = [test_matcher, test_match_subscribers]
+    success_count = sum(1 for test in tests if test())
+    print(f"\n=== 测试总结 ===")
+    print(f"成功: {success_count}/{len(tests)}")
+    return success_count == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
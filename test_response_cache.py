@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+测试接口响应缓存（LRU淘汰、按接口类别过期、相同请求合并）的脚本
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import db_pool
+import weather_api
+from response_cache import ResponseCache
+from weather_api import QWeatherAPI, get_endpoint_class
+
+
+def test_lru_and_ttl():
+    """测试条目上限按最近使用淘汰，过期条目不再命中"""
+    print("=== 测试LRU与过期 ===")
+    cache = ResponseCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # a 变为最近使用
+    cache.set('c', 3)
+    assert 'b' not in cache and cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats['evictions'] == 1
+
+    cache.set('short', 4, ttl=0)
+    assert cache.get('short') is None and cache.stats['expired'] == 1
+    assert cache.evict_expired(now=time.time() + 3600) == 2
+    print("  ✅ 淘汰与过期正确")
+    return True
+
+
+def test_endpoint_classes():
+    """测试接口路径到缓存类别的映射"""
+    print("=== 测试接口类别 ===")
+    assert get_endpoint_class('/v7/minutely/5m') == 'minutely'
+    assert get_endpoint_class('/v7/weather/now') == 'now'
+    assert get_endpoint_class('/v7/weather/72h') == 'hourly'
+    assert get_endpoint_class('/v7/weather/15d') == 'daily'
+    assert get_endpoint_class('/v7/grid-weather/3d') == 'daily'
+    assert get_endpoint_class('/airquality/v1/current/39.90/116.40') == 'air_now'
+    assert get_endpoint_class('/geo/v2/city/lookup') == 'geo'
+    print("  ✅ 接口类别正确")
+    return True
+
+
+def test_single_flight():
+    """测试相同请求并发时只请求一次，失败结果不缓存"""
+    print("=== 测试请求合并 ===")
+    cache = ResponseCache()
+    calls = {'ok': 0, 'fail': 0}
+
+    async def fetch_ok():
+        calls['ok'] += 1
+        await asyncio.sleep(0.05)
+        return {'code': '200'}
+
+    async def fetch_fail():
+        calls['fail'] += 1
+        await asyncio.sleep(0.01)
+        return None
+
+    async def run():
+        results = await asyncio.gather(*(cache.get_or_fetch('now?location=北京', fetch_ok) for _ in range(20)))
+        assert all(result == {'code': '200'} for result in results)
+        await cache.get_or_fetch('now?location=北京', fetch_ok)
+        await asyncio.gather(*(cache.get_or_fetch('bad', fetch_fail) for _ in range(3)))
+        await cache.get_or_fetch('bad', fetch_fail)
+
+    asyncio.run(run())
+    assert calls == {'ok': 1, 'fail': 2}
+    stats = cache.get_stats()
+    assert stats['coalesced'] == 21 and stats['hits'] == 1
+    print(f"  ✅ 21 次请求只发出 1 次，命中率 {stats['hit_rate']:.0%}")
+    return True
+
+
+def test_persistent_tier():
+    """测试天气缓存写入数据库，重启（清空内存）后无需请求即可命中，过期条目被清理"""
+    print("=== 测试持久缓存 ===")
+    import ws_handler
+    calls = []
+
+    async def fake_fetch(session, endpoint, params):
+        calls.append(endpoint)
+        return {'code': '200', 'location': params['location']}
+
+    async def run():
+        config = {'qweather.persistent_cache': True}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await ws_handler.init_db(os.path.join(tmp_dir, 'eqdata.db'))
+            try:
+                await weather_api.warm_weather_cache(config)
+                api = QWeatherAPI({'qweather': {'api_host': '127.0.0.1', 'api_key': 'test'}})
+                api._fetch = fake_fetch
+                await api._make_request(None, '/v7/weather/now', {'location': '101010100'})
+                await api._make_request(None, '/v7/minutely/5m', {'location': '101010100'})
+
+                # 模拟重启：内存层清空后从数据库加载
+                weather_api._weather_cache.clear()
+                assert await weather_api.warm_weather_cache(config) == 2
+                assert await api._make_request(None, '/v7/weather/now', {'location': '101010100'})
+
+                # 内存层被淘汰时直接读数据库
+                weather_api._weather_cache.clear()
+                assert await api._make_request(None, '/v7/minutely/5m', {'location': '101010100'})
+                assert len(calls) == 2 and weather_api.get_weather_cache_stats()['disk_hits'] == 1
+
+                await db_pool.execute('UPDATE weather_cache SET expires_at = 0 WHERE cache_key LIKE ?', ('/v7/minutely/%',))
+                assert await weather_api.compact_weather_cache() == 1
+            finally:
+                weather_api._weather_cache.clear()
+                weather_api._persist_enabled = False
+                await db_pool.close_db_pool()
+
+    asyncio.run(run())
+    print("  ✅ 重启后命中持久缓存")
+    return True
+
+
+def main():
+    tests = [test_lru_and_ttl, test_endpoint_classes, test_single_flight, test_persistent_tier]
+    success_count = sum(1 for test in tests if test())
+    print(f"\n=== 测试总结 ===")
+    print(f"成功: {success_count}/{len(tests)}")
+    return success_count == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+测试消息发送队列（通道优先级、预警保留名额、单群与全局限速、失败重试）的脚本
+使用本地 aiohttp 服务模拟 NapCat HTTP API
+"""
+
+import asyncio
+import os
+import sys
+
+from aiohttp import web
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import message_sender
+from message_sender import send_group_msg, send_priority, PRIORITY_ALERT, PRIORITY_BACKGROUND
+
+
+async def run_with_stub(queue_config: dict, scenario, fail_first: int = 0, delay: float = 0.0) -> list:
+    """启动模拟的 NapCat 服务并执行测试场景，返回服务端按到达顺序收到的消息文本"""
+    received = []
+    failures = {'left': fail_first}
+
+    async def handle(request):
+        payload = await request.json()
+        await asyncio.sleep(delay)
+        if failures['left'] > 0:
+            failures['left'] -= 1
+            return web.Response(status=503, text='busy')
+        received.append(payload['message'])
+        return web.json_response({'status': 'ok', 'retcode': 0})
+
+    app = web.Application()
+    app.router.add_post('/send_group_msg', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        await message_sender.init_sender(f'http://127.0.0.1:{port}', '', send_queue=queue_config)
+        await scenario()
+    finally:
+        await message_sender.close_sender()
+        await runner.cleanup()
+    return received
+
+
+def test_retry():
+    """测试 5xx 响应按退避重试后成功"""
+    print("=== 测试失败重试 ===")
+
+    async def scenario():
+        assert await send_group_msg('10001', 'retry')
+        stats = message_sender.get_send_queue_stats()
+        assert stats['retried'] == 2 and stats['sent'] == 1
+
+    received = asyncio.run(run_with_stub({'retry_base': 0.01}, scenario, fail_first=2))
+    assert received == ['retry']
+    print("  ✅ 重试后发送成功")
+    return True
+
+
+def test_priority_and_group_order():
+    """测试预警消息插队，且同一群内的消息保持先后顺序"""
+    print("=== 测试优先级与单群顺序 ===")
+
+    async def scenario():
+        with send_priority(PRIORITY_BACKGROUND):
+            low = [asyncio.create_task(send_group_msg('10001', f'low{i}')) for i in range(5)]
+        await asyncio.sleep(0.01)
+        with send_priority(PRIORITY_ALERT):
+            alert = asyncio.create_task(send_group_msg('10002', 'alert'))
+        assert all(await asyncio.gather(*low, alert))
+        stats = message_sender.get_send_queue_stats()
+        assert stats['deferred'] > 0
+        assert stats['lanes']['alert']['latency']['count'] == 1
+        assert stats['lanes']['background']['latency']['count'] == 5
+
+    config = {'concurrency': 1, 'group_rate': 10, 'group_burst': 2}
+    received = asyncio.run(run_with_stub(config, scenario, delay=0.02))
+    low_order = [text for text in received if text.startswith('low')]
+    assert low_order == [f'low{i}' for i in range(5)]
+    assert received.index('alert') < received.index('low4')
+    print(f"  ✅ 到达顺序: {received}")
+    return True
+
+
+def test_alert_reserved_capacity():
+    """测试大量后台消息占满非预警名额时，预警消息仍能立即发出"""
+    print("=== 测试预警保留名额 ===")
+
+    async def scenario():
+        with send_priority(PRIORITY_BACKGROUND):
+            background = [asyncio.create_task(send_group_msg(str(20000 + i), f'bg{i}')) for i in range(6)]
+        await asyncio.sleep(0.05)
+        with send_priority(PRIORITY_ALERT):
+            assert await send_group_msg('10001', 'alert')
+        lanes = message_sender.get_send_queue_stats()['lanes']
+        assert lanes['alert']['dispatch_delay']['max_ms'] < 100
+        assert lanes['background']['queued'] > 0
+        assert all(await asyncio.gather(*background))
+
+    config = {'concurrency': 2, 'alert_reserved': 1}
+    received = asyncio.run(run_with_stub(config, scenario, delay=0.2))
+    assert received.index('alert') <= 2
+    print(f"  ✅ 到达顺序: {received}")
+    return True
+
+
+def test_alert_jumps_group_backlog():
+    """测试等待全局令牌期间到达的预警消息先发，且预警不会排在该群普通消息的积压之后"""
+    print("=== 测试预警不被限速排队阻塞 ===")
+
+    async def scenario():
+        first = asyncio.create_task(send_group_msg('10001', 'n0'))
+        await asyncio.sleep(0.01)
+        backlogged = asyncio.create_task(send_group_msg('10001', 'n1'))
+        waiting = asyncio.create_task(send_group_msg('10002', 'm0'))
+        await asyncio.sleep(0.05)
+        with send_priority(PRIORITY_ALERT):
+            assert await send_group_msg('10001', 'alert')
+        assert all(await asyncio.gather(first, backlogged, waiting))
+
+    config = {'concurrency': 4, 'global_rate': 5, 'global_burst': 1, 'group_rate': 0.5, 'group_burst': 1}
+    received = asyncio.run(run_with_stub(config, scenario))
+    assert received == ['n0', 'alert', 'm0', 'n1'], received
+    print(f"  ✅ 到达顺序: {received}")
+    return True
+
+
+def test_alert_group_rate_limit():
+    """测试预警消息仍占用单群令牌：透支额度用完后排队等待，透支的令牌由之后的消息补上"""
+    print("=== 测试预警受单群限速 ===")
+
+    async def scenario():
+        with send_priority(PRIORITY_ALERT):
+            alerts = [asyncio.create_task(send_group_msg('10001', f'alert{i}')) for i in range(3)]
+        await asyncio.sleep(0.2)
+        # 1 个突发令牌 + 1 个透支令牌，第三条预警等待令牌补充
+        assert sum(task.done() for task in alerts) == 2
+        assert next(iter(message_sender._group_buckets.values())).tokens < 0
+        normal = asyncio.create_task(send_group_msg('10001', 'n0'))
+        assert all(await asyncio.gather(*alerts, normal))
+
+    config = {'concurrency': 4, 'group_rate': 2, 'group_burst': 1, 'group_alert_burst': 1}
+    received = asyncio.run(run_with_stub(config, scenario))
+    assert received == ['alert0', 'alert1', 'alert2', 'n0'], received
+    print(f"  ✅ 到达顺序: {received}")
+    return True
+
+
+def main():
+    tests = [test_retry, test_priority_and_group_order, test_alert_reserved_capacity, test_alert_jumps_group_backlog,
+             test_alert_group_rate_limit]
+    success_count = sum(1 for test in tests if test())
+    print(f"\n=== 测试总结 ===")
+    print(f"成功: {success_count}/{len(tests)}")
+    return success_count == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试UAPI客户端的共享会话与响应缓存（可缓存接口、请求合并、非200不缓存、按字节淘汰）的脚本
+使用本地 aiohttp 服务模拟 UAPI
+"""
+
+import asyncio
+import os
+import sys
+
+from aiohttp import web
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import uapi_client
+from response_cache import ResponseCache
+from uapi_client import UApiClient
+
+NEWS_IMAGE = b'\x89PNG' + b'\x00' * 4096
+
+
+async def run_with_stub(scenario) -> dict:
+    """启动模拟的 UAPI 服务并执行测试场景，返回各接口被请求的次数"""
+    hits = {}
+    hotboard_status = {'code': 500}
+
+    async def news_image(request):
+        hits['news'] = hits.get('news', 0) + 1
+        await asyncio.sleep(0.05)
+        return web.Response(body=NEWS_IMAGE, content_type='image/png')
+
+    async def hotboard(request):
+        hits['hotboard'] = hits.get('hotboard', 0) + 1
+        status = hotboard_status['code']
+        hotboard_status['code'] = 200
+        return web.json_response({'type': request.query['type'], 'list': []}, status=status)
+
+    async def saying(request):
+        hits['saying'] = hits.get('saying', 0) + 1
+        return web.json_response({'text': '一言'})
+
+    app = web.Application()
+    app.router.add_get('/api/v1/daily/news-image', news_image)
+    app.router.add_get('/api/v1/misc/hotboard', hotboard)
+    app.router.add_get('/api/v1/saying', saying)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        client = UApiClient({'uapi': {'base_url': f'http://127.0.0.1:{port}', 'timeout': 5}})
+        await scenario(client)
+    finally:
+        uapi_client._response_cache.clear()
+        await uapi_client.close_uapi_session()
+        await runner.cleanup()
+    return hits
+
+
+def test_cacheable_endpoints():
+    """测试每日新闻图并发请求只发出一次，热榜非200响应不缓存，一言不缓存"""
+    print("=== 测试接口缓存 ===")
+
+    async def scenario(client):
+        images = await asyncio.gather(*(client.get_daily_news_image() for _ in range(5)))
+        assert all(image == NEWS_IMAGE for image in images)
+        assert await client.get_daily_news_image() == NEWS_IMAGE
+
+        for _ in range(3):
+            assert (await client.get_hotboard('weibo'))['type'] == 'weibo'
+        await client.get_saying()
+        await client.get_saying()
+
+    hits = asyncio.run(run_with_stub(scenario))
+    # 热榜第一次返回500不缓存，第二次200后命中缓存
+    assert hits == {'news': 1, 'hotboard': 2, 'saying': 2}, hits
+    print(f"  ✅ 接口请求次数: {hits}")
+    return True
+
+
+def test_byte_limit():
+    """测试按总字节数淘汰最久未使用的条目，超过上限的单个值不缓存"""
+    print("=== 测试字节上限 ===")
+    cache = ResponseCache(max_entries=10, max_bytes=10000)
+    cache.set('a', b'0' * 4000)
+    cache.set('b', b'0' * 4000)
+    cache.get('a')
+    cache.set('c', b'0' * 4000)
+    assert 'a' in cache and 'b' not in cache and 'c' in cache
+    cache.set('huge', b'0' * 20000)
+    assert 'huge' not in cache
+    assert cache.get_stats()['bytes'] == 8000
+    print("  ✅ 字节上限生效")
+    return True
+
+
+def main():
+    tests = [test_cacheable_endpoints, test_byte_limit]
+    success_count = sum(1 for test in tests if test())
+    print(f"\n=== 测试总结 ===")
+    print(f"成功: {success_count}/{len(tests)}")
+    return success_count == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
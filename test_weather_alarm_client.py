@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+测试CMA气象预警异步客户端的脚本
+使用本地 aiohttp 服务模拟 nmc.cn（列表接口和较慢的详情页），
+验证一次完整的预警检查期间事件循环仍能及时响应，详情页是并发获取并按预警ID缓存的，
+以及没有新预警时的增量轮询只需一次条件请求
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(__file__))
+
+import db_pool
+import message_sender
+from weather_alarm_client import CMWeatherAlarmClient
+
+DETAIL_DELAY = 0.3
+ALARMS = [
+    {'alertid': f'test_alarm_{i}', 'title': f'四川省测试{i}市气象台发布暴雨蓝色预警', 'issuetime': '2026/02/16 10:00',
+     'url': f'/publish/alarm/test_alarm_{i}.html', 'pic': ''}
+    for i in range(4)
+]
+
+
+async def start_stub(hits: dict = None):
+    """启动模拟的 nmc.cn 服务（列表接口支持 ETag 条件请求），返回 (runner, base_url)"""
+    hits = {} if hits is None else hits
+    etag = f'"{len(ALARMS)}"'
+
+    async def find_alarm(request):
+        hits['list'] = hits.get('list', 0) + 1
+        if request.headers.get('If-None-Match') == etag:
+            hits['not_modified'] = hits.get('not_modified', 0) + 1
+            return web.Response(status=304)
+        return web.json_response({'data': {'page': {'list': ALARMS, 'totalPage': 1}}}, headers={'ETag': etag})
+
+    async def detail(request):
+        hits['detail'] = hits.get('detail', 0) + 1
+        await asyncio.sleep(DETAIL_DELAY)
+        alertid = request.match_info['alertid']
+        html = f'<html><head><title>{alertid}</title></head><body><div id="alarmtext"><p>{alertid} 请注意防御</p></div></body></html>'
+        return web.Response(text=html, content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/rest/findAlarm', find_alarm)
+    app.router.add_get('/publish/alarm/{alertid}.html', detail)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+
+
+async def measure_loop_lag(stop: asyncio.Event) -> float:
+    """每10ms醒来一次，返回期间事件循环的最大延迟（毫秒）"""
+    max_lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        max_lag = max(max_lag, (time.perf_counter() - start - 0.01) * 1000)
+    return max_lag
+
+
+def test_client_concurrent_details():
+    """测试客户端获取列表与并发获取详情页"""
+    print("=== 测试并发获取详情 ===")
+
+    async def run():
+        runner, base_url = await start_stub()
+        client = CMWeatherAlarmClient(timeout=5, detail_concurrency=4, base_url=base_url)
+        try:
+            alarms = await client.get_latest_alarms(count=20)
+            start = time.perf_counter()
+            details = await client.get_alarm_details([alarm['url'] for alarm in alarms])
+            elapsed = time.perf_counter() - start
+        finally:
+            await client.close()
+            await runner.cleanup()
+        return alarms, details, elapsed
+
+    alarms, details, elapsed = asyncio.run(run())
+    assert len(alarms) == 4
+    assert [detail['content'] for detail in details] == [f'test_alarm_{i} 请注意防御' for i in range(4)]
+    # 4个详情页并发获取，总耗时接近单个页面的耗时
+    assert elapsed < DETAIL_DELAY * 2, elapsed
+    print(f"  ✅ 4 个详情页耗时 {elapsed * 1000:.0f} ms")
+    return True
+
+
+def test_poll_keeps_loop_responsive():
+    """测试一次完整的预警检查（列表+详情+按群合并推送）期间事件循环不被阻塞"""
+    print("=== 测试检查期间事件循环响应 ===")
+    import cma_weather_subscriber
+    sent = []
+
+    async def fake_send(group_id, message, icon_path=None, user_id=None, user_ids=None):
+        sent.append((group_id, tuple(user_ids)))
+        return True
+
+    async def run():
+        runner, base_url = await start_stub()
+        original_send = message_sender.send_group_msg_with_text_and_image
+        message_sender.send_group_msg_with_text_and_image = fake_send
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await db_pool.init_db_pool(os.path.join(tmp_dir, 'eqdata.db'))
+            subscriber = cma_weather_subscriber.CMAWeatherSubscriber({})
+            subscriber.client = CMWeatherAlarmClient(timeout=5, base_url=base_url)
+            try:
+                await subscriber.init_db()
+                await subscriber.subscribe_province('四川', '10001', '20001')
+                await subscriber.subscribe_province('四川', '10001', '20002')
+                await subscriber.subscribe_location('四川省测试1市', '10002', '20003')
+                stop = asyncio.Event()
+                lag_task = asyncio.create_task(measure_loop_lag(stop))
+                start = time.perf_counter()
+                await subscriber.check_and_send_alarms()
+                elapsed = time.perf_counter() - start
+                stop.set()
+                max_lag = await lag_task
+            finally:
+                message_sender.send_group_msg_with_text_and_image = original_send
+                await subscriber.client.close()
+                await db_pool.close_db_pool()
+                await runner.cleanup()
+        return elapsed, max_lag
+
+    elapsed, max_lag = asyncio.run(run())
+    # 同一群的订阅者合并为一条消息
+    assert sorted(sent) == sorted([('10001', ('20001', '20002'))] * 4 + [('10002', ('20003',))]), sent
+    assert max_lag < 50, max_lag
+    print(f"  ✅ 检查耗时 {elapsed * 1000:.0f} ms，事件循环最大延迟 {max_lag:.1f} ms")
+    return True
+
+
+def test_quiet_poll():
+    """测试没有新预警时，一次轮询只发一次条件请求且不查询数据库"""
+    print("=== 测试无新预警的轮询 ===")
+    import cma_weather_subscriber
+    hits = {}
+    db_calls = []
+
+    async def fake_send(group_id, message, icon_path=None, user_id=None, user_ids=None):
+        return True
+
+    async def run():
+        runner, base_url = await start_stub(hits)
+        original_send = message_sender.send_group_msg_with_text_and_image
+        message_sender.send_group_msg_with_text_and_image = fake_send
+        originals = {name: getattr(db_pool, name) for name in ('fetchone', 'fetchall', 'execute')}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await db_pool.init_db_pool(os.path.join(tmp_dir, 'eqdata.db'))
+            subscriber = cma_weather_subscriber.CMAWeatherSubscriber({})
+            subscriber.client = CMWeatherAlarmClient(timeout=5, base_url=base_url)
+            try:
+                await subscriber.init_db()
+                await subscriber.subscribe_province('四川', '10001', '20001')
+                await subscriber.check_and_send_alarms()
+
+                # 模拟重启：从数据库恢复已处理的预警和水位线
+                restarted = cma_weather_subscriber.CMAWeatherSubscriber({})
+                await restarted.load_processed_alarms()
+                assert len(restarted.processed_alarms) == 4 and restarted.watermark == '2026/02/16 10:00'
+
+                for name, func in originals.items():
+                    def counting(*args, _func=func, _name=name):
+                        db_calls.append(_name)
+                        return _func(*args)
+                    setattr(db_pool, name, counting)
+                subscriber.last_checked_time = 0
+                await subscriber.check_and_send_alarms()
+            finally:
+                for name, func in originals.items():
+                    setattr(db_pool, name, func)
+                message_sender.send_group_msg_with_text_and_image = original_send
+                await subscriber.client.close()
+                await db_pool.close_db_pool()
+                await runner.cleanup()
+
+    asyncio.run(run())
+    assert hits == {'list': 2, 'not_modified': 1, 'detail': 4}, hits
+    assert db_calls == []
+    print("  ✅ 第二次轮询收到304，未查询数据库")
+    return True
+
+
+def test_late_alarm_and_retry():
+    """测试晚发布（早于水位线）的新预警仍会推送，推送失败的群在下次轮询重试且不重复推送已成功的群"""
+    print("=== 测试晚发布预警与推送重试 ===")
+    import cma_weather_subscriber
+    page = [
+        {'alertid': 'new', 'title': '四川省新市气象台发布大风蓝色预警', 'issuetime': '2026/02/16 11:00', 'url': '/a/new.html', 'pic': ''},
+        {'alertid': 'late', 'title': '四川省晚市气象台发布大风蓝色预警', 'issuetime': '2026/02/16 09:00', 'url': '/a/late.html', 'pic': ''},
+        {'alertid': 'known', 'title': '四川省旧市气象台发布大风蓝色预警', 'issuetime': '2026/02/16 10:00', 'url': '/a/known.html', 'pic': ''},
+        {'alertid': 'other', 'title': '西藏自治区气象台发布大风蓝色预警', 'issuetime': '2026/02/16 11:00', 'url': '/a/other.html', 'pic': ''},
+    ]
+    sent = []
+    failing_groups = {'10002'}
+
+    async def fake_send(group_id, message, icon_path=None, user_id=None, user_ids=None):
+        sent.append((group_id, message.split('\n')[1]))
+        return group_id not in failing_groups
+
+    async def fake_list(page_no=1, page_size=10):
+        return {'data': {'page': {'list': page, 'totalPage': 1}}}
+
+    async def fake_details(urls, alertids=None):
+        return [{'content': '请注意防御'} for _ in urls]
+
+    async def run():
+        original_send = message_sender.send_group_msg_with_text_and_image
+        message_sender.send_group_msg_with_text_and_image = fake_send
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await db_pool.init_db_pool(os.path.join(tmp_dir, 'eqdata.db'))
+            subscriber = cma_weather_subscriber.CMAWeatherSubscriber({})
+            subscriber.client.get_weather_alarms = fake_list
+            subscriber.client.get_alarm_details = fake_details
+            try:
+                await subscriber.init_db()
+                await subscriber.subscribe_province('四川', '10001', '20001')
+                await subscriber.subscribe_province('四川', '10002', '20002')
+                subscriber.processed_alarms.add('known')
+                subscriber.watermark = '2026/02/16 10:00'
+
+                await subscriber.check_and_send_alarms()
+                first_round = list(sent)
+                assert 'new' not in subscriber.processed_alarms and 'late' not in subscriber.processed_alarms
+                assert 'other' in subscriber.processed_alarms and subscriber.watermark == '2026/02/16 11:00'
+
+                sent.clear()
+                failing_groups.clear()
+                subscriber.last_checked_time = 0
+                await subscriber.check_and_send_alarms()
+                second_round = list(sent)
+                assert 'new' in subscriber.processed_alarms and 'late' in subscriber.processed_alarms
+
+                # 未匹配的预警也写入数据库，重启后恢复的水位线包含它
+                restarted = cma_weather_subscriber.CMAWeatherSubscriber({})
+                await restarted.load_processed_alarms()
+                assert 'other' in restarted.processed_alarms and len(restarted.processed_alarms) == 3
+            finally:
+                message_sender.send_group_msg_with_text_and_image = original_send
+                await subscriber.client.close()
+                await db_pool.close_db_pool()
+        return first_round, second_round
+
+    first_round, second_round = asyncio.run(run())
+    titles = [f'| 预警标题: {page[i]["title"]}' for i in range(2)]
+    assert sorted(first_round) == sorted((group, title) for group in ('10001', '10002') for title in titles), first_round
+    assert sorted(second_round) == sorted(('10002', title) for title in titles), second_round
+    print("  ✅ 晚发布预警已推送，失败的群重试一次")
+    return True
+
+
+def test_detail_cache_and_parse():
+    """测试详情按预警ID缓存（并发的相同请求只下载一次），以及无alarmtext时按段落提取内容"""
+    print("=== 测试详情缓存与解析 ===")
+    hits = {}
+
+    async def run():
+        runner, base_url = await start_stub(hits)
+        client = CMWeatherAlarmClient(timeout=5, base_url=base_url)
+        try:
+            urls = [alarm['url'] for alarm in ALARMS[:2]]
+            alertids = [alarm['alertid'] for alarm in ALARMS[:2]]
+            first = await asyncio.gather(client.get_alarm_details(urls, alertids), client.get_alarm_details(urls, alertids))
+            by_id = await client.get_alarm_detail_by_id(alertids[0])
+            again = await client.get_alarm_detail(urls[0], alertids[0])
+        finally:
+            await client.close()
+            await runner.cleanup()
+        return first, by_id, again
+
+    first, by_id, again = asyncio.run(run())
+    assert first[0] == first[1] and first[0][0]['content'] == 'test_alarm_0 请注意防御'
+    # 修改返回的详情不影响缓存
+    assert by_id['alertid'] == 'test_alarm_0' and 'alertid' not in again
+    assert hits == {'detail': 2}, hits
+
+    from weather_alarm_client import parse_alarm_detail
+    detail = parse_alarm_detail('<html><head><title>标题</title></head><body><div class="c"><p>无关</p>'
+                                '<p>请注意<b>防御</b>大风</p></div></body></html>')
+    assert detail == {'title': '标题', 'content': '请注意防御大风', 'raw_html': ''}, detail
+    print("  ✅ 2 个预警详情只下载一次，段落回退正确")
+    return True
+
+
+def test_multi_at_message():
+    """测试一条消息@多个用户的消息段（重复的用户只@一次）"""
+    print("=== 测试一条消息@多个用户 ===")
+    payloads = []
+
+    async def fake_post(endpoint, payload):
+        payloads.append(payload)
+        return 200, '{}'
+
+    async def run():
+        original_session, original_post = message_sender.SESSION, message_sender._post
+        message_sender.SESSION, message_sender._post = object(), fake_post
+        try:
+            return await message_sender.send_group_msg_with_text_and_image('10001', '预警', None,
+                                                                           user_ids=['20001', '20002', '20001'])
+        finally:
+            message_sender.SESSION, message_sender._post = original_session, original_post
+
+    assert asyncio.run(run())
+    segments = [(seg['type'], seg['data'].get('qq') or seg['data'].get('text')) for seg in payloads[0]['message']]
+    assert segments == [('at', '20001'), ('text', ' '), ('at', '20002'), ('text', '\n'), ('text', '预警')], segments
+    print("  ✅ 消息段正确")
+    return True
+
+
+def main():
+    tests = [test_client_concurrent_details, test_poll_keeps_loop_responsive, test_quiet_poll, test_late_alarm_and_retry,
+             test_detail_cache_and_parse,
+             test_multi_at_message]
+    success_count = sum(1 for test in tests if test())
+    print(f"\n=== 测试总结 ===")
+    print(f"成功: {success_count}/{len(tests)}")
+    return success_count == len(tests)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -6,11 +6,72 @@ Bydbot - UAPI客户端
 import aiohttp
 import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
 import asyncio
 from datetime import datetime, timedelta
 from aiohttp import FormData
 
+from response_cache import ResponseCache
+
+# 共享的HTTP会话：所有 UApiClient 实例复用同一个连接池
+_session: Optional[aiohttp.ClientSession] = None
+
+# 连接池默认值（可通过 uapi.session.* 配置）
+DEFAULT_SESSION_CONFIG = {
+    'limit': 20,            # 连接池总连接数
+    'limit_per_host': 8,    # 单个主机的并发连接数
+    'dns_ttl': 300,         # DNS 缓存时间（秒）
+    'keepalive': 60,        # 空闲连接保持时间（秒）
+}
+
+# 响应缓存：按条目数和总字节数（图片等二进制数据）做LRU淘汰，相同请求并发时只请求一次
+DEFAULT_CACHE_MAX_ENTRIES = 256
+DEFAULT_CACHE_MAX_MB = 32
+_response_cache = ResponseCache(max_entries=DEFAULT_CACHE_MAX_ENTRIES, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024)
+
+# 可缓存的接口及默认缓存时间（秒），可通过 uapi.cache_ttls 覆盖或增加；值为None时使用 uapi.cache_ttl
+# 其余接口（随机类、查询类、POST 等）的结果每次都不同或与参数强相关，不缓存
+DEFAULT_CACHE_TTLS = {
+    '/misc/hotboard': None,         # 热榜
+    '/game/epic-free': 3600,        # Epic 免费游戏
+    '/image/bing-daily': 3600,      # 必应每日壁纸
+    '/daily/news-image': 1800,      # 每日新闻图
+}
+
+
+def get_session(timeout: float, session_config: Optional[Dict[str, Any]] = None) -> aiohttp.ClientSession:
+    """获取共享的HTTP会话，不存在或已关闭时按配置创建（需在事件循环中调用）"""
+    global _session
+    if _session is None or _session.closed:
+        options = dict(DEFAULT_SESSION_CONFIG, **(session_config or {}))
+        connector = aiohttp.TCPConnector(
+            limit=options['limit'],
+            limit_per_host=options['limit_per_host'],
+            ttl_dns_cache=options['dns_ttl'],
+            keepalive_timeout=options['keepalive'],
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout))
+    return _session
+
+
+async def close_uapi_session() -> None:
+    """关闭共享的HTTP会话"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def configure_uapi_cache(config: Dict[str, Any]) -> None:
+    """按配置设置共享响应缓存的条目数和字节数上限（启动时调用一次）"""
+    _response_cache.resize(config.get('uapi.cache_max_entries', DEFAULT_CACHE_MAX_ENTRIES),
+                           int(config.get('uapi.cache_max_mb', DEFAULT_CACHE_MAX_MB) * 1024 * 1024))
+
+
+def get_uapi_cache_stats() -> Dict[str, Any]:
+    """获取UAPI响应缓存的统计信息"""
+    return _response_cache.get_stats()
+
 
 class UApiClient:
     def __init__(self, config: Dict[str, Any]):
@@ -18,6 +79,10 @@ class UApiClient:
         self.base_url = self.config.get('base_url', 'https://uapis.cn')
         self.api_key = self.config.get('api_key', '')
         self.timeout = self.config.get('timeout', 30)
+        self.session_config = self.config.get('session', {})
+        self.cache_enabled = self.config.get('cache_enabled', True)
+        self.cache_ttl = self.config.get('cache_ttl', 600)
+        self.cache_ttls = dict(DEFAULT_CACHE_TTLS, **self.config.get('cache_ttls', {}))
         
         if not self.base_url:
             logging.warning("UAPI配置不完整，请在config.json中配置base_url")
@@ -29,78 +94,114 @@ class UApiClient:
             headers['Authorization'] = f'Bearer {self.api_key}'
         return headers
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享的HTTP会话"""
+        return get_session(self.timeout, self.session_config)
+
+    def _get_cache_ttl(self, endpoint: str) -> Optional[float]:
+        """获取接口的缓存时间，不可缓存时返回None"""
+        if not self.cache_enabled or endpoint not in self.cache_ttls:
+            return None
+        ttl = self.cache_ttls[endpoint]
+        return self.cache_ttl if ttl is None else ttl
+
+    def _get_cache_key(self, endpoint: str, params: Optional[Dict[str, Any]]) -> str:
+        """生成缓存键"""
+        param_str = '&'.join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        return f"{endpoint}?{param_str}"
+
+    async def _cached_binary(self, endpoint: str, fetch: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """读取可缓存的二进制接口（图片），未命中或不可缓存时调用 fetch 获取"""
+        ttl = self._get_cache_ttl(endpoint)
+        if ttl is None:
+            return await fetch()
+        return await _response_cache.get_or_fetch(self._get_cache_key(endpoint, None), fetch, ttl)
+
     async def _make_request(self, method: str, endpoint: str, params: Optional[Dict[str, Any]] = None, 
                            json_data: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
-        """发送API请求"""
+        """发送API请求（可缓存的GET接口先查缓存，相同请求并发时只请求一次）"""
+        ttl = self._get_cache_ttl(endpoint) if method.upper() == 'GET' else None
+        if ttl is None:
+            response = await self._request(method, endpoint, params, json_data)
+        else:
+            # 只缓存200响应，其余响应照常返回给调用方
+            response = await _response_cache.get_or_fetch(
+                self._get_cache_key(endpoint, params), lambda: self._request(method, endpoint, params, json_data),
+                ttl, cacheable=lambda r: r[0] == 200)
+        return response[1] if response else None
+
+    async def _request(self, method: str, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                       json_data: Optional[Dict[str, Any]] = None) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """发送API请求，返回 (状态码, 响应JSON)，失败时返回None"""
         try:
             url = f"{self.base_url}/api/v1{endpoint}"
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                if method.upper() == 'GET':
-                    logging.info(f"UAPI GET请求: {url} with params {params}")
-                    async with session.get(url, params=params, headers=headers) as response:
-                        # 检查响应内容长度，防止响应过大
-                        content_length = response.headers.get('Content-Length')
-                        if content_length:
-                            size_mb = int(content_length) / (1024 * 1024)
-                            if size_mb > 10:  # 限制10MB
-                                logging.warning(f"UAPI响应过大 {endpoint}: {size_mb:.2f}MB")
-                                return None
+            session = self._get_session()
+            if method.upper() == 'GET':
+                logging.info(f"UAPI GET请求: {url} with params {params}")
+                async with session.get(url, params=params, headers=headers) as response:
+                    # 检查响应内容长度，防止响应过大
+                    content_length = response.headers.get('Content-Length')
+                    if content_length:
+                        size_mb = int(content_length) / (1024 * 1024)
+                        if size_mb > 10:  # 限制10MB
+                            logging.warning(f"UAPI响应过大 {endpoint}: {size_mb:.2f}MB")
+                            return None
                         
-                        # 对于B站等API，即使是错误状态码也可能包含有用信息，尝试解析响应
-                        try:
-                            result = await response.json()
+                    # 对于B站等API，即使是错误状态码也可能包含有用信息，尝试解析响应
+                    try:
+                        result = await response.json()
                             
-                            # 对B站API添加额外日志记录
-                            if '/social/bilibili/' in endpoint:
-                                logging.info(f"B站API {endpoint} 响应: 状态码={response.status}, 数据={result}")
+                        # 对B站API添加额外日志记录
+                        if '/social/bilibili/' in endpoint:
+                            logging.info(f"B站API {endpoint} 响应: 状态码={response.status}, 数据={result}")
                             
-                            # 对于200状态码，直接返回结果
-                            if response.status == 200:
-                                logging.info(f"UAPI GET请求成功: {endpoint}, 返回数据长度: {len(str(result)) if result else 0}")
-                                return result
-                            else:
-                                # 对于非200状态码，仍然返回解析后的JSON内容，让上层处理
-                                logging.warning(f"UAPI GET请求收到非200响应 {url}: {response.status}, 响应内容: {result}")
-                                return result
-                        except aiohttp.ContentTypeError:
-                            # 如果响应不是JSON格式，记录错误并返回None
-                            error_text = await response.text()
-                            logging.error(f"UAPI GET请求失败 {url}: {response.status} - 非JSON响应: {error_text[:200]}...")
+                        # 对于200状态码，直接返回结果
+                        if response.status == 200:
+                            logging.info(f"UAPI GET请求成功: {endpoint}, 返回数据长度: {len(str(result)) if result else 0}")
+                            return response.status, result
+                        else:
+                            # 对于非200状态码，仍然返回解析后的JSON内容，让上层处理
+                            logging.warning(f"UAPI GET请求收到非200响应 {url}: {response.status}, 响应内容: {result}")
+                            return response.status, result
+                    except aiohttp.ContentTypeError:
+                        # 如果响应不是JSON格式，记录错误并返回None
+                        error_text = await response.text()
+                        logging.error(f"UAPI GET请求失败 {url}: {response.status} - 非JSON响应: {error_text[:200]}...")
+                        return None
+            elif method.upper() == 'POST':
+                logging.info(f"UAPI POST请求: {url} with json_data keys: {list(json_data.keys()) if json_data else 'None'}")
+                async with session.post(url, params=params, json=json_data, headers=headers) as response:
+                    # 检查响应内容长度，防止响应过大
+                    content_length = response.headers.get('Content-Length')
+                    if content_length:
+                        size_mb = int(content_length) / (1024 * 1024)
+                        if size_mb > 10:  # 限制10MB
+                            logging.warning(f"UAPI响应过大 {endpoint}: {size_mb:.2f}MB")
                             return None
-                elif method.upper() == 'POST':
-                    logging.info(f"UAPI POST请求: {url} with json_data keys: {list(json_data.keys()) if json_data else 'None'}")
-                    async with session.post(url, params=params, json=json_data, headers=headers) as response:
-                        # 检查响应内容长度，防止响应过大
-                        content_length = response.headers.get('Content-Length')
-                        if content_length:
-                            size_mb = int(content_length) / (1024 * 1024)
-                            if size_mb > 10:  # 限制10MB
-                                logging.warning(f"UAPI响应过大 {endpoint}: {size_mb:.2f}MB")
-                                return None
                         
-                        # 对于B站等API，即使是错误状态码也可能包含有用信息，尝试解析响应
-                        try:
-                            result = await response.json()
+                    # 对于B站等API，即使是错误状态码也可能包含有用信息，尝试解析响应
+                    try:
+                        result = await response.json()
                             
-                            # 对B站API添加额外日志记录
-                            if '/social/bilibili/' in endpoint:
-                                logging.info(f"B站API {endpoint} 响应: 状态码={response.status}, 数据={result}")
+                        # 对B站API添加额外日志记录
+                        if '/social/bilibili/' in endpoint:
+                            logging.info(f"B站API {endpoint} 响应: 状态码={response.status}, 数据={result}")
                             
-                            # 对于200状态码，直接返回结果
-                            if response.status == 200:
-                                logging.info(f"UAPI POST请求成功: {endpoint}, 返回数据长度: {len(str(result)) if result else 0}")
-                                return result
-                            else:
-                                # 对于非200状态码，仍然返回解析后的JSON内容，让上层处理
-                                logging.warning(f"UAPI POST请求收到非200响应 {url}: {response.status}, 响应内容: {result}")
-                                return result
-                        except aiohttp.ContentTypeError:
-                            # 如果响应不是JSON格式，记录错误并返回None
-                            error_text = await response.text()
-                            logging.error(f"UAPI POST请求失败 {url}: {response.status} - 非JSON响应: {error_text[:200]}...")
-                            return None
+                        # 对于200状态码，直接返回结果
+                        if response.status == 200:
+                            logging.info(f"UAPI POST请求成功: {endpoint}, 返回数据长度: {len(str(result)) if result else 0}")
+                            return response.status, result
+                        else:
+                            # 对于非200状态码，仍然返回解析后的JSON内容，让上层处理
+                            logging.warning(f"UAPI POST请求收到非200响应 {url}: {response.status}, 响应内容: {result}")
+                            return response.status, result
+                    except aiohttp.ContentTypeError:
+                        # 如果响应不是JSON格式，记录错误并返回None
+                        error_text = await response.text()
+                        logging.error(f"UAPI POST请求失败 {url}: {response.status} - 非JSON响应: {error_text[:200]}...")
+                        return None
         except aiohttp.ClientConnectorError as e:
             logging.error(f"UAPI网络连接错误 {endpoint}: {e}")
             return None
@@ -391,29 +492,29 @@ class UApiClient:
                 
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.get(url, headers=headers) as response:
-                    # 检查响应内容长度，防止响应过大
-                    content_length = response.headers.get('Content-Length')
-                    if content_length:
-                        size_mb = int(content_length) / (1024 * 1024)
-                        if size_mb > 10:  # 限制10MB
-                            logging.warning(f"UAPI图片响应过大 {url}: {size_mb:.2f}MB")
-                            return None
+            session = self._get_session()
+            async with session.get(url, headers=headers) as response:
+                # 检查响应内容长度，防止响应过大
+                content_length = response.headers.get('Content-Length')
+                if content_length:
+                    size_mb = int(content_length) / (1024 * 1024)
+                    if size_mb > 10:  # 限制10MB
+                        logging.warning(f"UAPI图片响应过大 {url}: {size_mb:.2f}MB")
+                        return None
                     
-                    if response.status == 200:
-                        # 读取响应内容，但限制大小
-                        content = await response.read()
-                        size_mb = len(content) / (1024 * 1024)
-                        if size_mb > 10:  # 限制10MB
-                            logging.warning(f"UAPI图片响应过大 (通过内容长度): {size_mb:.2f}MB")
-                            return None
-                        
-                        return content  # 返回二进制图片数据
-                    else:
-                        error_text = await response.text()
-                        logging.error(f"UAPI随机图片请求失败 {url}: {response.status} - {error_text}")
+                if response.status == 200:
+                    # 读取响应内容，但限制大小
+                    content = await response.read()
+                    size_mb = len(content) / (1024 * 1024)
+                    if size_mb > 10:  # 限制10MB
+                        logging.warning(f"UAPI图片响应过大 (通过内容长度): {size_mb:.2f}MB")
                         return None
+                        
+                    return content  # 返回二进制图片数据
+                else:
+                    error_text = await response.text()
+                    logging.error(f"UAPI随机图片请求失败 {url}: {response.status} - {error_text}")
+                    return None
         except Exception as e:
             logging.error(f"UAPI随机图片请求异常: {e}")
             return None
@@ -432,33 +533,37 @@ class UApiClient:
     # 图像类 API
     async def get_bing_daily(self) -> Optional[bytes]:
         """必应壁纸"""
+        return await self._cached_binary('/image/bing-daily', self._fetch_bing_daily)
+
+    async def _fetch_bing_daily(self) -> Optional[bytes]:
+        """请求必应壁纸"""
         try:
             url = f"{self.base_url}/api/v1/image/bing-daily"
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.get(url, headers=headers) as response:
-                    # 检查响应内容长度，防止响应过大
-                    content_length = response.headers.get('Content-Length')
-                    if content_length:
-                        size_mb = int(content_length) / (1024 * 1024)
-                        if size_mb > 10:  # 限制10MB
-                            logging.warning(f"UAPI图片响应过大 {url}: {size_mb:.2f}MB")
-                            return None
+            session = self._get_session()
+            async with session.get(url, headers=headers) as response:
+                # 检查响应内容长度，防止响应过大
+                content_length = response.headers.get('Content-Length')
+                if content_length:
+                    size_mb = int(content_length) / (1024 * 1024)
+                    if size_mb > 10:  # 限制10MB
+                        logging.warning(f"UAPI图片响应过大 {url}: {size_mb:.2f}MB")
+                        return None
                     
-                    if response.status == 200:
-                        # 读取响应内容，但限制大小
-                        content = await response.read()
-                        size_mb = len(content) / (1024 * 1024)
-                        if size_mb > 10:  # 限制10MB
-                            logging.warning(f"UAPI图片响应过大 (通过内容长度): {size_mb:.2f}MB")
-                            return None
-                        
-                        return content  # 返回二进制图片数据
-                    else:
-                        error_text = await response.text()
-                        logging.error(f"UAPI必应壁纸请求失败 {url}: {response.status} - {error_text}")
+                if response.status == 200:
+                    # 读取响应内容，但限制大小
+                    content = await response.read()
+                    size_mb = len(content) / (1024 * 1024)
+                    if size_mb > 10:  # 限制10MB
+                        logging.warning(f"UAPI图片响应过大 (通过内容长度): {size_mb:.2f}MB")
                         return None
+                        
+                    return content  # 返回二进制图片数据
+                else:
+                    error_text = await response.text()
+                    logging.error(f"UAPI必应壁纸请求失败 {url}: {response.status} - {error_text}")
+                    return None
         except Exception as e:
             logging.error(f"UAPI必应壁纸请求异常: {e}")
             return None
@@ -494,29 +599,29 @@ class UApiClient:
             
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.get(url, headers=headers) as response:
-                    # 检查响应内容长度，防止响应过大
-                    content_length = response.headers.get('Content-Length')
-                    if content_length:
-                        size_mb = int(content_length) / (1024 * 1024)
-                        if size_mb > 10:  # 限制10MB
-                            logging.warning(f"UAPI图片响应过大 {url}: {size_mb:.2f}MB")
-                            return None
+            session = self._get_session()
+            async with session.get(url, headers=headers) as response:
+                # 检查响应内容长度，防止响应过大
+                content_length = response.headers.get('Content-Length')
+                if content_length:
+                    size_mb = int(content_length) / (1024 * 1024)
+                    if size_mb > 10:  # 限制10MB
+                        logging.warning(f"UAPI图片响应过大 {url}: {size_mb:.2f}MB")
+                        return None
                     
-                    if response.status == 200:
-                        # 读取响应内容，但限制大小
-                        content = await response.read()
-                        size_mb = len(content) / (1024 * 1024)
-                        if size_mb > 10:  # 限制10MB
-                            logging.warning(f"UAPI图片响应过大 (通过内容长度): {size_mb:.2f}MB")
-                            return None
-                        
-                        return content  # 返回二进制图片数据
-                    else:
-                        error_text = await response.text()
-                        logging.error(f"UAPI二维码请求失败 {url}: {response.status} - {error_text}")
+                if response.status == 200:
+                    # 读取响应内容，但限制大小
+                    content = await response.read()
+                    size_mb = len(content) / (1024 * 1024)
+                    if size_mb > 10:  # 限制10MB
+                        logging.warning(f"UAPI图片响应过大 (通过内容长度): {size_mb:.2f}MB")
                         return None
+                        
+                    return content  # 返回二进制图片数据
+                else:
+                    error_text = await response.text()
+                    logging.error(f"UAPI二维码请求失败 {url}: {response.status} - {error_text}")
+                    return None
         except Exception as e:
             logging.error(f"UAPI二维码请求异常: {e}")
             return None
@@ -538,29 +643,29 @@ class UApiClient:
             
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.get(url, headers=headers) as response:
-                    # 检查响应内容长度，防止响应过大
-                    content_length = response.headers.get('Content-Length')
-                    if content_length:
-                        size_mb = int(content_length) / (1024 * 1024)
-                        if size_mb > 10:  # 限制10MB
-                            logging.warning(f"UAPI图片响应过大 {url}: {size_mb:.2f}MB")
-                            return None
+            session = self._get_session()
+            async with session.get(url, headers=headers) as response:
+                # 检查响应内容长度，防止响应过大
+                content_length = response.headers.get('Content-Length')
+                if content_length:
+                    size_mb = int(content_length) / (1024 * 1024)
+                    if size_mb > 10:  # 限制10MB
+                        logging.warning(f"UAPI图片响应过大 {url}: {size_mb:.2f}MB")
+                        return None
                     
-                    if response.status == 200:
-                        # 读取响应内容，但限制大小
-                        content = await response.read()
-                        size_mb = len(content) / (1024 * 1024)
-                        if size_mb > 10:  # 限制10MB
-                            logging.warning(f"UAPI图片响应过大 (通过内容长度): {size_mb:.2f}MB")
-                            return None
-                        
-                        return content  # 返回二进制图片数据
-                    else:
-                        error_text = await response.text()
-                        logging.error(f"UAPI GrAvatar请求失败 {url}: {response.status} - {error_text}")
+                if response.status == 200:
+                    # 读取响应内容，但限制大小
+                    content = await response.read()
+                    size_mb = len(content) / (1024 * 1024)
+                    if size_mb > 10:  # 限制10MB
+                        logging.warning(f"UAPI图片响应过大 (通过内容长度): {size_mb:.2f}MB")
                         return None
+                        
+                    return content  # 返回二进制图片数据
+                else:
+                    error_text = await response.text()
+                    logging.error(f"UAPI GrAvatar请求失败 {url}: {response.status} - {error_text}")
+                    return None
         except Exception as e:
             logging.error(f"UAPI GrAvatar请求异常: {e}")
             return None
@@ -578,54 +683,58 @@ class UApiClient:
                 
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        content_type = response.headers.get('Content-Type', '')
-                        if 'image' in content_type:
-                            return await response.read()
-                        else:
-                            # 如果不是图片，尝试解析JSON错误
-                            try:
-                                error_data = await response.json()
-                                logging.error(f"摸摸头GIF生成失败: {error_data}")
-                            except:
-                                error_text = await response.text()
-                                logging.error(f"摸摸头GIF生成失败: {error_text[:200]}...")
-                            return None
+            session = self._get_session()
+            async with session.get(url, headers=headers) as response:
+                if response.status == 200:
+                    content_type = response.headers.get('Content-Type', '')
+                    if 'image' in content_type:
+                        return await response.read()
                     else:
-                        error_text = await response.text()
-                        logging.error(f"摸摸头GIF生成失败，状态码: {response.status}, 错误: {error_text[:200]}...")
+                        # 如果不是图片，尝试解析JSON错误
+                        try:
+                            error_data = await response.json()
+                            logging.error(f"摸摸头GIF生成失败: {error_data}")
+                        except:
+                            error_text = await response.text()
+                            logging.error(f"摸摸头GIF生成失败: {error_text[:200]}...")
                         return None
+                else:
+                    error_text = await response.text()
+                    logging.error(f"摸摸头GIF生成失败，状态码: {response.status}, 错误: {error_text[:200]}...")
+                    return None
         except Exception as e:
             logging.error(f"摸摸头GIF生成异常: {e}")
             return None
 
     async def get_image_bing_daily(self) -> Optional[bytes]:
         """必应壁纸"""
+        return await self._cached_binary('/image/bing-daily', self._fetch_image_bing_daily)
+
+    async def _fetch_image_bing_daily(self) -> Optional[bytes]:
+        """请求必应壁纸"""
         try:
             url = f"{self.base_url}/api/v1/image/bing-daily"
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        content_type = response.headers.get('Content-Type', '')
-                        if 'image' in content_type:
-                            return await response.read()
-                        else:
-                            # 如果不是图片，尝试解析JSON错误
-                            try:
-                                error_data = await response.json()
-                                logging.error(f"必应壁纸获取失败: {error_data}")
-                            except:
-                                error_text = await response.text()
-                                logging.error(f"必应壁纸获取失败: {error_text[:200]}...")
-                            return None
+            session = self._get_session()
+            async with session.get(url, headers=headers) as response:
+                if response.status == 200:
+                    content_type = response.headers.get('Content-Type', '')
+                    if 'image' in content_type:
+                        return await response.read()
                     else:
-                        error_text = await response.text()
-                        logging.error(f"必应壁纸获取失败，状态码: {response.status}, 错误: {error_text[:200]}...")
+                        # 如果不是图片，尝试解析JSON错误
+                        try:
+                            error_data = await response.json()
+                            logging.error(f"必应壁纸获取失败: {error_data}")
+                        except:
+                            error_text = await response.text()
+                            logging.error(f"必应壁纸获取失败: {error_text[:200]}...")
                         return None
+                else:
+                    error_text = await response.text()
+                    logging.error(f"必应壁纸获取失败，状态码: {response.status}, 错误: {error_text[:200]}...")
+                    return None
         except Exception as e:
             logging.error(f"必应壁纸获取异常: {e}")
             return None
@@ -663,33 +772,37 @@ class UApiClient:
     # 日常类 API
     async def get_daily_news_image(self) -> Optional[bytes]:
         """每日新闻图"""
+        return await self._cached_binary('/daily/news-image', self._fetch_daily_news_image)
+
+    async def _fetch_daily_news_image(self) -> Optional[bytes]:
+        """请求每日新闻图"""
         try:
             url = f"{self.base_url}/api/v1/daily/news-image"
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.get(url, headers=headers) as response:
-                    # 检查响应内容长度，防止响应过大
-                    content_length = response.headers.get('Content-Length')
-                    if content_length:
-                        size_mb = int(content_length) / (1024 * 1024)
-                        if size_mb > 10:  # 限制10MB
-                            logging.warning(f"UAPI图片响应过大 {url}: {size_mb:.2f}MB")
-                            return None
+            session = self._get_session()
+            async with session.get(url, headers=headers) as response:
+                # 检查响应内容长度，防止响应过大
+                content_length = response.headers.get('Content-Length')
+                if content_length:
+                    size_mb = int(content_length) / (1024 * 1024)
+                    if size_mb > 10:  # 限制10MB
+                        logging.warning(f"UAPI图片响应过大 {url}: {size_mb:.2f}MB")
+                        return None
                     
-                    if response.status == 200:
-                        # 读取响应内容，但限制大小
-                        content = await response.read()
-                        size_mb = len(content) / (1024 * 1024)
-                        if size_mb > 10:  # 限制10MB
-                            logging.warning(f"UAPI图片响应过大 (通过内容长度): {size_mb:.2f}MB")
-                            return None
-                        
-                        return content  # 返回二进制图片数据
-                    else:
-                        error_text = await response.text()
-                        logging.error(f"UAPI每日新闻图请求失败 {url}: {response.status} - {error_text}")
+                if response.status == 200:
+                    # 读取响应内容，但限制大小
+                    content = await response.read()
+                    size_mb = len(content) / (1024 * 1024)
+                    if size_mb > 10:  # 限制10MB
+                        logging.warning(f"UAPI图片响应过大 (通过内容长度): {size_mb:.2f}MB")
                         return None
+                        
+                    return content  # 返回二进制图片数据
+                else:
+                    error_text = await response.text()
+                    logging.error(f"UAPI每日新闻图请求失败 {url}: {response.status} - {error_text}")
+                    return None
         except Exception as e:
             logging.error(f"UAPI每日新闻图请求异常: {e}")
             return None
@@ -707,14 +820,14 @@ class UApiClient:
                 'bottom_text': bottom_text
             }
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.post(url, json=json_data, headers=headers) as response:
-                    if response.status == 200:
-                        return await response.read()  # 返回二进制图片数据
-                    else:
-                        error_text = await response.text()
-                        logging.error(f"UAPI表情包生成请求失败 {url}: {response.status} - {error_text}")
-                        return None
+            session = self._get_session()
+            async with session.post(url, json=json_data, headers=headers) as response:
+                if response.status == 200:
+                    return await response.read()  # 返回二进制图片数据
+                else:
+                    error_text = await response.text()
+                    logging.error(f"UAPI表情包生成请求失败 {url}: {response.status} - {error_text}")
+                    return None
         except Exception as e:
             logging.error(f"UAPI表情包生成请求异常: {e}")
             return None
@@ -1,39 +1,119 @@
-import requests
+import aiohttp
+import asyncio
 import json
+import logging
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Callable, Optional, Dict, List, Tuple
 import re
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+
+from response_cache import ResponseCache
+
+# 有 lxml 时用其C实现的解析器，否则退回纯Python的 html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# 默认请求超时（秒）与并发获取详情页的数量
+DEFAULT_TIMEOUT = 15
+DEFAULT_DETAIL_CONCURRENCY = 4
+# 预警详情按预警ID缓存（同一预警的内容不会变化），条目数上限与有效期（秒）
+DETAIL_CACHE_MAX_ENTRIES = 256
+DEFAULT_DETAIL_CACHE_TTL = 24 * 3600
+
+# 只解析需要的元素，不构建整个页面的文档树
+_ALARM_TEXT_STRAINER = SoupStrainer(id='alarmtext')
+_TITLE_STRAINER = SoupStrainer('title')
+_PARAGRAPH_STRAINER = SoupStrainer('p')
+
+
+def parse_alarm_detail(html: str) -> Dict:
+    """
+    从预警详情页HTML中提取标题和预警内容（CPU密集，由 get_alarm_detail 放到工作线程中执行）
+
+    Returns:
+        {'title': 页面标题, 'content': 预警内容, 'raw_html': id为alarmtext的div的HTML}
+    """
+    # 预警详情在id为alarmtext的div中
+    alarm_text_div = BeautifulSoup(html, HTML_PARSER, parse_only=_ALARM_TEXT_STRAINER).find(id='alarmtext')
+
+    detail_content = ""
+    if alarm_text_div:
+        detail_content = alarm_text_div.get_text(strip=True)
+    else:
+        # 没找到时查找包含预警相关内容的段落
+        for p in BeautifulSoup(html, HTML_PARSER, parse_only=_PARAGRAPH_STRAINER).find_all('p'):
+            text = p.get_text(strip=True)
+            if '防御' in text or '预警' in text or '影响' in text:
+                detail_content = text
+                break
+
+    # 标题在<head>中，只解析页面头部
+    head_end = html.find('</head>')
+    title_tag = BeautifulSoup(html[:head_end] if head_end >= 0 else html, HTML_PARSER,
+                              parse_only=_TITLE_STRAINER).find('title')
+
+    return {
+        'title': title_tag.get_text().strip() if title_tag else "",
+        'content': detail_content,
+        'raw_html': str(alarm_text_div) if alarm_text_div else ""  # 保留原始HTML（如果找到的话）
+    }
+
 
 class CMWeatherAlarmClient:
     """
     用于从中国气象局获取气象预警数据的客户端
+    所有请求都是异步的，共用一个带超时的 aiohttp 会话，不会阻塞事件循环
     """
 
-    def __init__(self):
-        self.base_url = "https://www.nmc.cn/rest/findAlarm"
-        self.detail_base_url = "https://www.nmc.cn"
-        self.session = requests.Session()
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, detail_concurrency: int = DEFAULT_DETAIL_CONCURRENCY,
+                 base_url: str = "https://www.nmc.cn", detail_cache_ttl: float = DEFAULT_DETAIL_CACHE_TTL):
+        self.base_url = f"{base_url}/rest/findAlarm"
+        self.detail_base_url = base_url
+        self.timeout = timeout
+        self.detail_concurrency = max(1, detail_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # 列表接口的条件请求缓存：(页码, 每页数量) -> (ETag/Last-Modified 请求头, 上次的响应)
+        self._list_cache: Dict[Tuple[int, int], Tuple[Dict[str, str], Dict]] = {}
+        # 预警ID -> 预警详情，重复推送和测试命令不再重新下载解析
+        self._detail_cache = ResponseCache(DETAIL_CACHE_MAX_ENTRIES, default_ttl=detail_cache_ttl)
+        self.stats = {'list_requests': 0, 'not_modified': 0, 'detail_requests': 0}
         # 设置模拟浏览器请求的头部
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'application/json, text/plain, */*',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
             'Referer': 'https://www.nmc.cn/publish/alarm.html'
-        })
-    
-    def get_weather_alarms(
-        self, 
-        page_no: int = 1, 
+        }
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享的HTTP会话，不存在或已关闭时创建（需在事件循环中调用）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.detail_concurrency + 1, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self) -> None:
+        """关闭HTTP会话"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get_weather_alarms(
+        self,
+        page_no: int = 1,
         page_size: int = 10
     ) -> Dict:
         """
         获取气象预警数据
-        
+
         Args:
             page_no: 页码（从1开始）
             page_size: 每页记录数（默认10）
-        
+
         Returns:
             包含预警数据的字典
         """
@@ -41,66 +121,131 @@ class CMWeatherAlarmClient:
             'pageNo': page_no,
             'pageSize': page_size
         }
-        
+
+        # 带上次响应的 ETag/Last-Modified 发送条件请求，未变化时服务器返回304
+        cached = self._list_cache.get((page_no, page_size))
+        headers = cached[0] if cached else {}
+
         try:
-            response = self.session.get(self.base_url, params=params)
-            response.raise_for_status()  # 为错误状态码引发异常
-            
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"获取数据时出错: {e}")
+            self.stats['list_requests'] += 1
+            async with self._get_session().get(self.base_url, params=params, headers=headers) as response:
+                if response.status == 304 and cached:
+                    self.stats['not_modified'] += 1
+                    return cached[1]
+                response.raise_for_status()  # 为错误状态码引发异常
+                data = await response.json(content_type=None)
+
+                validators = {}
+                if response.headers.get('ETag'):
+                    validators['If-None-Match'] = response.headers['ETag']
+                if response.headers.get('Last-Modified'):
+                    validators['If-Modified-Since'] = response.headers['Last-Modified']
+                if validators:
+                    self._list_cache[(page_no, page_size)] = (validators, data)
+                return data
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"获取气象预警数据时出错: {type(e).__name__} {e}")
             return {}
         except json.JSONDecodeError as e:
-            print(f"解码JSON响应时出错: {e}")
+            logging.error(f"解码气象预警JSON响应时出错: {e}")
             return {}
-    
-    def get_latest_alarms(self, count: int = 10) -> List[Dict]:
+
+    async def get_latest_alarms(self, count: int = 10) -> List[Dict]:
         """
         Get the latest weather alarms
-        
+
         Args:
             count: Number of latest alarms to retrieve
-        
+
         Returns:
             List of alarm dictionaries
         """
         # Calculate page size and number of pages needed
         page_size = min(count, 30)  # Max page size is typically 30
         result = []
-        
+
         page_no = 1
         while len(result) < count:
-            data = self.get_weather_alarms(page_no=page_no, page_size=page_size)
-            
+            data = await self.get_weather_alarms(page_no=page_no, page_size=page_size)
+
             if 'data' in data and 'page' in data['data']:
                 alarms = data['data']['page']['list']
-                
+
                 for alarm in alarms:
                     if len(result) >= count:
                         break
                     result.append(alarm)
-                
+
                 # Check if we need more pages
                 total_pages = data['data']['page'].get('totalPage', 1)
                 if page_no >= total_pages:
                     break
-                
+
                 page_no += 1
             else:
                 break  # No more data
-        
+
         return result[:count]  # Return only the requested count
 
-    def get_alarm_detail(self, alarm_url: str) -> Dict:
+    async def get_new_alarms(self, is_known: Callable[[str], bool], watermark: str = "",
+                             max_count: int = 20, page_size: int = 10) -> List[Dict]:
+        """
+        增量获取新预警：从第一页开始按发布时间倒序翻页，返回已获取页面中所有未处理过的预警；
+        某一页出现已知预警或早于水位线的预警时不再继续翻页
+        （水位线只用于决定何时停止翻页：晚发布、或与已处理预警发布时间相同的新预警仍会返回）
+
+        Args:
+            is_known: 判断预警ID是否已处理过
+            watermark: 已处理预警中最新的发布时间（issuetime），为空时不按时间截止
+            max_count: 最多返回的新预警数量
+            page_size: 每页记录数，没有新预警时只需请求一页
+
+        Returns:
+            新预警列表（按接口返回顺序）
+        """
+        new_alarms = []
+        page_no = 1
+        while len(new_alarms) < max_count:
+            data = await self.get_weather_alarms(page_no=page_no, page_size=page_size)
+            if 'data' not in data or 'page' not in data['data']:
+                break
+
+            reached_known = False
+            for alarm in data['data']['page']['list']:
+                if watermark and alarm.get('issuetime', '') < watermark:
+                    reached_known = True
+                if is_known(alarm.get('alertid', '')):
+                    reached_known = True
+                    continue
+                if len(new_alarms) < max_count:
+                    new_alarms.append(alarm)
+
+            total_pages = data['data']['page'].get('totalPage', 1)
+            if reached_known or page_no >= total_pages:
+                break
+            page_no += 1
+
+        return new_alarms
+
+    async def get_alarm_detail(self, alarm_url: str, alertid: str = "") -> Dict:
         """
         获取单个预警的详细内容
 
         Args:
             alarm_url: 预警详情页面的URL（可以是相对路径或完整URL）
+            alertid: 预警ID（可选），提供时按预警ID缓存详情，同一预警只下载解析一次
 
         Returns:
-            包含预警详细信息的字典
+            包含预警详细信息的字典，获取失败时为空字典
         """
+        if not alertid:
+            return await self._fetch_alarm_detail(alarm_url)
+        detail = await self._detail_cache.get_or_fetch(alertid, lambda: self._fetch_alarm_detail(alarm_url),
+                                                       cacheable=bool)
+        return dict(detail)
+
+    async def _fetch_alarm_detail(self, alarm_url: str) -> Dict:
+        """下载预警详情页，在工作线程中解析"""
         # 如果是相对路径，拼接完整URL
         if alarm_url.startswith('/'):
             full_url = self.detail_base_url + alarm_url
@@ -108,110 +253,101 @@ class CMWeatherAlarmClient:
             full_url = alarm_url
 
         headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Referer': 'https://www.nmc.cn/publish/alarm.html'
         }
 
         try:
-            response = self.session.get(full_url, headers=headers)
-            response.raise_for_status()
-            response.encoding = 'utf-8'
-
-            # 使用BeautifulSoup解析HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # 查找包含预警详情的元素
-            # 根据之前的分析，预警详情通常在id为alarmtext的div中
-            alarm_text_div = soup.find('div', id='alarmtext')
-            
-            detail_content = ""
-            if alarm_text_div:
-                # 提取预警详情内容
-                detail_content = alarm_text_div.get_text(strip=True)
-            else:
-                # 如果没找到id为alarmtext的div，尝试其他可能的选择器
-                # 查找包含预警相关内容的段落
-                paragraphs = soup.find_all('p')
-                for p in paragraphs:
-                    text = p.get_text(strip=True)
-                    if '防御' in text or '预警' in text or '影响' in text:
-                        detail_content = text
-                        break
+            self.stats['detail_requests'] += 1
+            async with self._get_session().get(full_url, headers=headers) as response:
+                response.raise_for_status()
+                html = await response.text(encoding='utf-8', errors='replace')
+
+            # 解析放到工作线程，不阻塞事件循环
+            detail = await asyncio.to_thread(parse_alarm_detail, html)
+            detail['url'] = full_url
+            return detail
 
-            # 尝试提取标题（如果页面标题不同于预警标题）
-            page_title = ""
-            title_tag = soup.find('title')
-            if title_tag:
-                page_title = title_tag.get_text().strip()
-
-            return {
-                'url': full_url,
-                'title': page_title,
-                'content': detail_content,
-                'raw_html': str(alarm_text_div) if alarm_text_div else ""  # 保留原始HTML（如果找到的话）
-            }
-
-        except requests.exceptions.RequestException as e:
-            print(f"获取预警详情时出错: {e}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"获取预警详情时出错 {full_url}: {type(e).__name__} {e}")
             return {}
         except Exception as e:
-            print(f"解析预警详情页面时出错: {e}")
+            logging.error(f"解析预警详情页面时出错 {full_url}: {e}")
             return {}
 
-    def get_alarm_detail_by_id(self, alertid: str, title: str = "", url: str = "") -> Dict:
+    async def get_alarm_details(self, alarm_urls: List[str], alertids: Optional[List[str]] = None) -> List[Dict]:
+        """
+        并发获取多个预警的详细内容（同时进行的请求数不超过 detail_concurrency）
+
+        Args:
+            alarm_urls: 预警详情页面的URL列表
+            alertids: 与 alarm_urls 对应的预警ID列表（可选），提供时按预警ID缓存
+
+        Returns:
+            与 alarm_urls 顺序一致的详情列表，获取失败的为空字典
+        """
+        semaphore = asyncio.Semaphore(self.detail_concurrency)
+        alertids = alertids or [""] * len(alarm_urls)
+
+        async def fetch(url: str, alertid: str) -> Dict:
+            async with semaphore:
+                return await self.get_alarm_detail(url, alertid)
+
+        return list(await asyncio.gather(*(fetch(url, alertid) for url, alertid in zip(alarm_urls, alertids))))
+
+    def get_detail_cache_stats(self) -> Dict:
+        """获取预警详情缓存的统计信息"""
+        return self._detail_cache.get_stats()
+
+    async def get_alarm_detail_by_id(self, alertid: str, title: str = "", url: str = "") -> Dict:
         """
         通过预警ID获取预警详细内容
-        
+
         Args:
             alertid: 预警ID
             title: 预警标题（可选）
             url: 预警URL（可选，如果不提供则根据ID构造）
-            
+
         Returns:
             包含预警详细信息的字典
         """
         if not url:
             # 根据预警ID构造URL
             url = f"/publish/alarm/{alertid}.html"
-        
-        detail = self.get_alarm_detail(url)
+
+        detail = await self.get_alarm_detail(url, alertid)
         detail['alertid'] = alertid
         detail['original_title'] = title
-        
+
         return detail
 
 
-def main():
+async def main():
     """
     演示CMWeatherAlarmClient用法的主函数
     """
     client = CMWeatherAlarmClient()
 
-    print("=== 获取最新气象预警 ===")
-    latest_alarms = client.get_latest_alarms(count=5)
-
-    if latest_alarms:
-        print(f"找到 {len(latest_alarms)} 条最新预警:\n")
-        for i, alarm in enumerate(latest_alarms, 1):
-            print(f"{i}. 标题: {alarm['title']}")
-            print(f"   发布时间: {alarm['issuetime']}")
-            print(f"   预警ID: {alarm['alertid']}")
-            print(f"   URL: https://www.nmc.cn{alarm['url']}")
-            print(f"   图片: {alarm['pic']}")
-            
-            # 获取第一条预警的详细内容作为演示
-            if i == 1:
-                print("   正在获取详细内容...")
-                detail = client.get_alarm_detail(alarm['url'])
+    try:
+        print("=== 获取最新气象预警 ===")
+        latest_alarms = await client.get_latest_alarms(count=5)
+
+        if latest_alarms:
+            print(f"找到 {len(latest_alarms)} 条最新预警:\n")
+            details = await client.get_alarm_details([alarm['url'] for alarm in latest_alarms])
+            for i, (alarm, detail) in enumerate(zip(latest_alarms, details), 1):
+                print(f"{i}. 标题: {alarm['title']}")
+                print(f"   发布时间: {alarm['issuetime']}")
+                print(f"   预警ID: {alarm['alertid']}")
+                print(f"   URL: https://www.nmc.cn{alarm['url']}")
+                print(f"   图片: {alarm['pic']}")
                 if detail and detail.get('content'):
                     print(f"   详情: {detail['content'][:100]}...")
-            
-            print("-" * 80)
-    else:
-        print("未找到预警或发生错误。")
+                print("-" * 80)
+        else:
+            print("未找到预警或发生错误。")
+    finally:
+        await client.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
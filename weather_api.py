@@ -8,10 +8,178 @@ import json
 import logging
 from typing import Dict, Any, Optional
 import asyncio
-from datetime import datetime, timedelta
+import time
+
+import db_pool
+from response_cache import ResponseCache
+
+# 响应缓存：有条目上限的LRU，按接口类别设置过期时间，相同请求并发时只请求一次
+DEFAULT_CACHE_MAX_ENTRIES = 512
+_weather_cache = ResponseCache(max_entries=DEFAULT_CACHE_MAX_ENTRIES)
+
+# 各类接口的默认缓存时间（秒），可通过 qweather.cache_ttls 按类别覆盖，未列出的接口使用 qweather.cache_ttl
+DEFAULT_CACHE_TTLS = {
+    'minutely': 120,        # 分钟级降水，5分钟更新一次
+    'now': 600,             # 实时天气
+    'alert': 300,           # 天气预警
+    'air_now': 600,         # 实时空气质量
+    'hourly': 1800,         # 逐小时预报、空气质量小时/每日预报
+    'daily': 3600,          # 每日预报
+    'indices': 3600,        # 天气指数
+    'geo': 86400,           # 城市/POI 搜索、热门城市
+}
+
+# 接口路径前缀 -> 类别（按顺序匹配）
+ENDPOINT_CLASSES = (
+    ('/v7/minutely/', 'minutely'),
+    ('/v7/weather/now', 'now'),
+    ('/v7/grid-weather/now', 'now'),
+    ('/weatheralert/', 'alert'),
+    ('/airquality/v1/current/', 'air_now'),
+    ('/airquality/v1/', 'hourly'),
+    ('/v7/indices/', 'indices'),
+    ('/geo/', 'geo'),
+)
+
+
+def get_endpoint_class(endpoint: str) -> str:
+    """获取接口的缓存类别"""
+    for prefix, endpoint_class in ENDPOINT_CLASSES:
+        if endpoint.startswith(prefix):
+            return endpoint_class
+    # /v7/weather/24h、/v7/grid-weather/72h 等为逐小时预报，其余为每日预报
+    if endpoint.endswith('h'):
+        return 'hourly'
+    if endpoint.startswith(('/v7/weather/', '/v7/grid-weather/')):
+        return 'daily'
+    return 'default'
+
+
+# 持久缓存层：内存未命中时先查 eqdata.db 的 weather_cache 表，重启后未过期的缓存仍然有效
+# 由 warm_weather_cache() 在数据库初始化后启用
+DEFAULT_PERSISTENT_MAX_ENTRIES = 5000
+_persist_enabled = False
+_persist_max_entries = DEFAULT_PERSISTENT_MAX_ENTRIES
+_persist_stats = {'disk_hits': 0, 'writes': 0, 'warmed': 0, 'compacted': 0}
+
+
+def get_weather_cache_stats() -> Dict[str, Any]:
+    """获取天气响应缓存的统计信息（含持久缓存层）"""
+    return dict(_weather_cache.get_stats(), persistent=_persist_enabled, **_persist_stats)
+
+
+async def warm_weather_cache(config: Dict[str, Any]) -> int:
+    """
+    按配置设置共享的内存缓存上限，启用持久缓存层，并把未过期的缓存加载到内存
+    （启动时在数据库初始化后调用一次）
+    :return: 加载的条目数
+    """
+    global _persist_enabled, _persist_max_entries
+    _weather_cache.resize(config.get('qweather.cache_max_entries', DEFAULT_CACHE_MAX_ENTRIES))
+    _persist_enabled = config.get('qweather.cache_enabled', True) and config.get('qweather.persistent_cache', True)
+    if not _persist_enabled:
+        return 0
+    _persist_max_entries = config.get('qweather.persistent_max_entries', DEFAULT_PERSISTENT_MAX_ENTRIES)
+
+    now = time.time()
+    # 最近写入的优先，只加载内存层放得下的数量
+    rows = await db_pool.fetchall(
+        'SELECT cache_key, data_json, expires_at FROM weather_cache WHERE expires_at > ? ORDER BY updated_at DESC LIMIT ?',
+        (now, _weather_cache.max_entries))
+    for cache_key, data_json, expires_at in reversed(rows):
+        try:
+            _weather_cache.set(cache_key, json.loads(data_json), expires_at - now)
+        except ValueError:
+            continue
+    _persist_stats['warmed'] = len(rows)
+    logging.info(f"已从数据库加载 {len(rows)} 条天气缓存")
+    return len(rows)
+
+
+async def _load_persisted(cache_key: str) -> Optional[Dict[str, Any]]:
+    """从持久缓存层读取未过期的响应"""
+    try:
+        row = await db_pool.fetchone('SELECT data_json, expires_at FROM weather_cache WHERE cache_key = ? AND expires_at > ?',
+                                     (cache_key, time.time()))
+        if row is None:
+            return None
+        _persist_stats['disk_hits'] += 1
+        return json.loads(row[0]), row[1]
+    except Exception as e:
+        logging.warning(f"读取天气持久缓存失败: {e}")
+        return None
+
+
+async def _store_persisted(cache_key: str, data: Dict[str, Any], ttl: float) -> None:
+    """写入持久缓存层"""
+    now = time.time()
+    try:
+        await db_pool.execute(
+            'INSERT OR REPLACE INTO weather_cache (cache_key, data_json, expires_at, updated_at) VALUES (?, ?, ?, ?)',
+            (cache_key, json.dumps(data, ensure_ascii=False), now + ttl, now))
+        _persist_stats['writes'] += 1
+    except Exception as e:
+        logging.warning(f"写入天气持久缓存失败: {e}")
+
+
+async def compact_weather_cache() -> int:
+    """清理内存和数据库中过期的天气缓存，数据库条目超出上限时删除最旧的，返回删除的数据库条目数"""
+    _weather_cache.evict_expired()
+    if not _persist_enabled:
+        return 0
+    async with db_pool.transaction() as db:
+        cursor = await db.execute('DELETE FROM weather_cache WHERE expires_at <= ?', (time.time(),))
+        removed = cursor.rowcount
+        await cursor.close()
+        cursor = await db.execute(
+            'DELETE FROM weather_cache WHERE cache_key IN '
+            '(SELECT cache_key FROM weather_cache ORDER BY updated_at DESC LIMIT -1 OFFSET ?)',
+            (_persist_max_entries,))
+        removed += cursor.rowcount
+        await cursor.close()
+    _persist_stats['compacted'] += removed
+    if removed:
+        logging.info(f"已清理 {removed} 条过期天气缓存")
+    return removed
+
+
+# 共享的HTTP会话：所有 QWeatherAPI 实例复用同一个连接池，避免每次命令都重新做 DNS/TCP/TLS 握手
+_session: Optional[aiohttp.ClientSession] = None
+
+# 连接池默认值（可通过 qweather.session.* 配置）
+DEFAULT_SESSION_CONFIG = {
+    'limit': 20,            # 连接池总连接数
+    'limit_per_host': 8,    # 单个主机的并发连接数
+    'dns_ttl': 300,         # DNS 缓存时间（秒）
+    'keepalive': 60,        # 空闲连接保持时间（秒）
+    'timeout': 15,          # 单次请求总超时（秒）
+}
+
+
+def get_session(session_config: Optional[Dict[str, Any]] = None) -> aiohttp.ClientSession:
+    """获取共享的HTTP会话，不存在或已关闭时按配置创建（需在事件循环中调用）"""
+    global _session
+    if _session is None or _session.closed:
+        options = dict(DEFAULT_SESSION_CONFIG, **(session_config or {}))
+        connector = aiohttp.TCPConnector(
+            limit=options['limit'],
+            limit_per_host=options['limit_per_host'],
+            ttl_dns_cache=options['dns_ttl'],
+            keepalive_timeout=options['keepalive'],
+        )
+        _session = aiohttp.ClientSession(connector=connector,
+                                         timeout=aiohttp.ClientTimeout(total=options['timeout']))
+        logging.info(f"已创建和风天气共享会话: 连接上限 {options['limit']}，单主机 {options['limit_per_host']}")
+    return _session
+
+
+async def close_weather_session() -> None:
+    """关闭共享的HTTP会话"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
 
-# 缓存字典
-_weather_cache = {}
 
 class QWeatherAPI:
     def __init__(self, config: Dict[str, Any]):
@@ -22,6 +190,8 @@ class QWeatherAPI:
         self.use_jwt = self.config.get('use_jwt', False)
         self.cache_enabled = self.config.get('cache_enabled', True)
         self.cache_ttl = self.config.get('cache_ttl', 600)  # 默认10分钟
+        self.session_config = self.config.get('session', {})
+        self.cache_ttls = dict(DEFAULT_CACHE_TTLS, **self.config.get('cache_ttls', {}))
         
         if not self.api_host or not (self.api_key or (self.use_jwt and self.jwt_token)):
             logging.warning("和风天气API配置不完整，请在config.json中配置api_host和api_key或jwt_token")
@@ -34,39 +204,59 @@ class QWeatherAPI:
         else:
             headers['X-QW-Api-Key'] = self.api_key
         return headers
-    
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享的HTTP会话"""
+        return get_session(self.session_config)
+
+    def _get_base_url(self) -> str:
+        """获取API地址，api_host 未写协议时默认使用 https"""
+        if self.api_host.startswith(('http://', 'https://')):
+            return self.api_host.rstrip('/')
+        return f"https://{self.api_host}"
+
     def _get_cache_key(self, endpoint: str, params: Dict[str, Any]) -> str:
         """生成缓存键"""
         param_str = '&'.join([f"{k}={v}" for k, v in sorted(params.items())])
         return f"{endpoint}?{param_str}"
     
-    def _is_cache_valid(self, cache_time: datetime) -> bool:
-        """检查缓存是否有效"""
-        return datetime.now() - cache_time < timedelta(seconds=self.cache_ttl)
-    
+    def _get_cache_ttl(self, endpoint: str) -> float:
+        """获取接口的缓存时间"""
+        return self.cache_ttls.get(get_endpoint_class(endpoint), self.cache_ttl)
+
     async def _make_request(self, session: aiohttp.ClientSession, endpoint: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """发送API请求"""
+        """发送API请求（启用缓存时先查缓存，相同请求并发时只请求一次）"""
+        if not self.cache_enabled:
+            return await self._fetch(session, endpoint, params)
+
+        cache_key = self._get_cache_key(endpoint, params)
+        ttl = self._get_cache_ttl(endpoint)
+        if not _persist_enabled:
+            return await _weather_cache.get_or_fetch(cache_key, lambda: self._fetch(session, endpoint, params), ttl)
+
+        async def fetch_through_store():
+            persisted = await _load_persisted(cache_key)
+            if persisted is not None:
+                data, expires_at = persisted
+                # 内存层沿用数据库中的剩余有效期
+                _weather_cache.set(cache_key, data, expires_at - time.time())
+                return data
+            data = await self._fetch(session, endpoint, params)
+            if data is not None:
+                await _store_persisted(cache_key, data, ttl)
+            return data
+
+        return await _weather_cache.get_or_fetch(cache_key, fetch_through_store, ttl)
+
+    async def _fetch(self, session: aiohttp.ClientSession, endpoint: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """请求API，失败时返回None"""
         try:
-            url = f"https://{self.api_host}{endpoint}"
+            url = f"{self._get_base_url()}{endpoint}"
             headers = self._get_headers()
             
-            # 检查缓存
-            if self.cache_enabled:
-                cache_key = self._get_cache_key(endpoint, params)
-                if cache_key in _weather_cache:
-                    cached_data, cache_time = _weather_cache[cache_key]
-                    if self._is_cache_valid(cache_time):
-                        logging.info(f"使用缓存数据: {cache_key}")
-                        return cached_data
-            
             async with session.get(url, params=params, headers=headers) as response:
                 if response.status == 200:
-                    data = await response.json()
-                    # 存储到缓存
-                    if self.cache_enabled:
-                        cache_key = self._get_cache_key(endpoint, params)
-                        _weather_cache[cache_key] = (data, datetime.now())
-                    return data
+                    return await response.json()
                 else:
                     error_text = await response.text()
                     logging.error(f"API请求失败 {url}: {response.status} - {error_text}")
@@ -83,8 +273,7 @@ class QWeatherAPI:
         if range_type:
             params["range"] = range_type
 
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, "/geo/v2/city/lookup", params)
+        return await self._make_request(self._get_session(), "/geo/v2/city/lookup", params)
 
     async def poi_lookup(self, location: str, type_param: str = "scenic", city: str = None, number: int = 10, lang: str = "zh") -> Optional[Dict[str, Any]]:
         """POI搜索"""
@@ -92,8 +281,7 @@ class QWeatherAPI:
         if city:
             params["city"] = city
 
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, "/geo/v2/poi/lookup", params)
+        return await self._make_request(self._get_session(), "/geo/v2/poi/lookup", params)
     
     async def geo_top(self, range_type: str = None, number: int = 10, lang: str = "zh") -> Optional[Dict[str, Any]]:
         """热门城市查询"""
@@ -101,15 +289,13 @@ class QWeatherAPI:
         if range_type:
             params["range"] = range_type
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, "/geo/v2/city/top", params)
+        return await self._make_request(self._get_session(), "/geo/v2/city/top", params)
     
     async def weather_now(self, location: str, lang: str = "zh", unit: str = "m") -> Optional[Dict[str, Any]]:
         """实时天气"""
         params = {"location": location, "lang": lang, "unit": unit}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, "/v7/weather/now", params)
+        return await self._make_request(self._get_session(), "/v7/weather/now", params)
     
     async def weather_forecast(self, days: str, location: str, lang: str = "zh", unit: str = "m") -> Optional[Dict[str, Any]]:
         """每日天气预报"""
@@ -119,8 +305,7 @@ class QWeatherAPI:
         
         params = {"location": location, "lang": lang, "unit": unit}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, f"/v7/weather/{days}", params)
+        return await self._make_request(self._get_session(), f"/v7/weather/{days}", params)
     
     async def weather_hourly(self, hours: str, location: str, lang: str = "zh", unit: str = "m") -> Optional[Dict[str, Any]]:
         """逐小时天气预报"""
@@ -130,15 +315,13 @@ class QWeatherAPI:
         
         params = {"location": location, "lang": lang, "unit": unit}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, f"/v7/weather/{hours}", params)
+        return await self._make_request(self._get_session(), f"/v7/weather/{hours}", params)
     
     async def grid_weather_now(self, location: str, lang: str = "zh", unit: str = "m") -> Optional[Dict[str, Any]]:
         """格点实时天气"""
         params = {"location": location, "lang": lang, "unit": unit}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, "/v7/grid-weather/now", params)
+        return await self._make_request(self._get_session(), "/v7/grid-weather/now", params)
     
     async def grid_weather_forecast(self, days: str, location: str, lang: str = "zh", unit: str = "m") -> Optional[Dict[str, Any]]:
         """格点每日天气预报"""
@@ -148,8 +331,7 @@ class QWeatherAPI:
         
         params = {"location": location, "lang": lang, "unit": unit}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, f"/v7/grid-weather/{days}", params)
+        return await self._make_request(self._get_session(), f"/v7/grid-weather/{days}", params)
     
     async def grid_weather_hourly(self, hours: str, location: str, lang: str = "zh", unit: str = "m") -> Optional[Dict[str, Any]]:
         """格点逐小时天气预报"""
@@ -159,22 +341,19 @@ class QWeatherAPI:
         
         params = {"location": location, "lang": lang, "unit": unit}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, f"/v7/grid-weather/{hours}", params)
+        return await self._make_request(self._get_session(), f"/v7/grid-weather/{hours}", params)
     
     async def minutely_precipitation(self, location: str, lang: str = "zh") -> Optional[Dict[str, Any]]:
         """分钟级降水"""
         params = {"location": location, "lang": lang}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, "/v7/minutely/5m", params)
+        return await self._make_request(self._get_session(), "/v7/minutely/5m", params)
     
     async def weather_alert(self, latitude: float, longitude: float, localTime: bool = False, lang: str = "zh") -> Optional[Dict[str, Any]]:
         """实时天气预警"""
         params = {"localTime": str(localTime).lower(), "lang": lang}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, f"/weatheralert/v1/current/{latitude}/{longitude}", params)
+        return await self._make_request(self._get_session(), f"/weatheralert/v1/current/{latitude}/{longitude}", params)
     
     async def weather_indices(self, index_type: str, location: str, days: str = "1d", lang: str = "zh") -> Optional[Dict[str, Any]]:
         """天气指数预报"""
@@ -184,29 +363,25 @@ class QWeatherAPI:
         
         params = {"location": location, "type": index_type, "lang": lang}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, f"/v7/indices/{days}", params)
+        return await self._make_request(self._get_session(), f"/v7/indices/{days}", params)
     
     async def air_quality_current(self, latitude: float, longitude: float, lang: str = "zh") -> Optional[Dict[str, Any]]:
         """实时空气质量"""
         params = {"lang": lang}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, f"/airquality/v1/current/{latitude}/{longitude}", params)
+        return await self._make_request(self._get_session(), f"/airquality/v1/current/{latitude}/{longitude}", params)
     
     async def air_quality_daily(self, latitude: float, longitude: float, localTime: bool = False, lang: str = "zh") -> Optional[Dict[str, Any]]:
         """空气质量每日预报"""
         params = {"localTime": str(localTime).lower(), "lang": lang}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, f"/airquality/v1/daily/{latitude}/{longitude}", params)
+        return await self._make_request(self._get_session(), f"/airquality/v1/daily/{latitude}/{longitude}", params)
     
     async def air_quality_hourly(self, latitude: float, longitude: float, localTime: bool = False, lang: str = "zh") -> Optional[Dict[str, Any]]:
         """空气质量小时预报"""
         params = {"localTime": str(localTime).lower(), "lang": lang}
         
-        async with aiohttp.ClientSession() as session:
-            return await self._make_request(session, f"/airquality/v1/hourly/{latitude}/{longitude}", params)
+        return await self._make_request(self._get_session(), f"/airquality/v1/hourly/{latitude}/{longitude}", params)
 
 def format_weather_response(template_name: str, data: Dict[str, Any], config: Dict[str, Any]) -> str:
     """
@@ -1,14 +1,25 @@
 import asyncio
+import hashlib
 import json
 import logging
 import re
+import time
 import websockets
+from collections import deque
 import aiosqlite
 import os
 from datetime import datetime, timedelta
-from typing import Dict, Set, Optional, Tuple, Any
-from message_sender import send_group_msg, send_group_img
+from typing import Dict, List, Optional, Tuple, Any
+import db_pool
+from dedup_store import DedupStore, make_event_id, make_event_key
+import fan_dispatcher
+from event_index import EventIndex, IndexedEvent, parse_shock_time, CLUSTER_DEGREES, CLUSTER_SECONDS, CLUSTER_MAGNITUDE
+from message_sender import send_group_msg, send_group_img, send_priority, PRIORITY_ALERT, PRIORITY_PUSH
 from draw_eq import draw_earthquake_async
+from response_cache import ResponseCache
+
+# 去重记录保留时长（两周）
+DEDUP_TTL_SECONDS = 14 * 24 * 3600
 
 # 用于心跳计数的变量
 HEARTBEAT_COUNT = 0
@@ -19,38 +30,105 @@ received_earthquake_data: Dict[str, Any] = {}
 # 存储FAN提供的initial数据，用于测试命令
 initial_earthquake_data: list = []
 
-# 用于存储已处理的地震消息ID集合
-processed_ids: Set[str] = set()
-
-# 用于缓存已绘制的图片路径（消息ID -> 图片路径）
-cached_image_paths: Dict[str, str] = {}
-
-
-async def init_db():
-    """异步初始化数据库"""
+# 已处理的地震消息组合键（按时间淘汰，其他模块可以安全地持有此引用）
+processed_ids = DedupStore(ttl_seconds=DEDUP_TTL_SECONDS)
+
+# 被判定为同一地震重复报告而未推送的组合键，其后续修订同样不推送
+suppressed_ids = DedupStore(ttl_seconds=DEDUP_TTL_SECONDS)
+
+# 近期地震事件的时空索引，用于不同报告间的重复检测
+event_index = EventIndex()
+
+# 非地震数据源（不参与时间窗口检查和时空去重）
+NON_EARTHQUAKE_SOURCES = {'weatheralarm', 'tsunami'}
+
+# 预警类数据源，推送时优先于其他消息发送
+ALERT_SOURCES = {'cea', 'cwa-eew', 'kma-eew', 'tsunami', 'weatheralarm'}
+
+# 群推送并发数默认值（可通过 earthquake.push.concurrency 配置）
+DEFAULT_PUSH_CONCURRENCY = 8
+_push_semaphore: Optional[asyncio.Semaphore] = None
+_push_concurrency = 0
+
+# 各群最近的推送送达延迟（群号 -> 毫秒）
+PUSH_LATENCY_HISTORY = 100
+push_latency_stats: Dict[str, deque] = {}
+
+# 用于缓存已绘制的图片路径（绘图键 -> 图片路径），每次修订都会产生新的绘图键，按条目数和有效期淘汰
+IMAGE_CACHE_MAX_ENTRIES = 256
+IMAGE_CACHE_TTL_SECONDS = 24 * 3600
+cached_image_paths = ResponseCache(IMAGE_CACHE_MAX_ENTRIES, default_ttl=IMAGE_CACHE_TTL_SECONDS)
+
+# 进行中的地图绘制任务（绘图键 -> 任务），同一事件同一版本只绘制一次
+_render_tasks: Dict[str, asyncio.Task] = {}
+
+# 同一事件连续修订的合并推送默认值（可通过 earthquake.coalesce.* 配置）
+DEFAULT_COALESCE_WINDOW = 3.0
+DEFAULT_MAGNITUDE_JUMP = 0.5
+DEFAULT_INTENSITY_JUMP = 1.0
+# 正在推送的事件（组合键 -> 合并状态）
+_event_pushes: Dict[str, "_EventPushState"] = {}
+coalesce_stats = {'pushed': 0, 'merged': 0, 'urgent': 0}
+
+# FAN 消息分发器（可通过 earthquake.fan.workers / alert_workers / max_pending 配置）
+_fan_dispatcher: Optional[fan_dispatcher.FanDispatcher] = None
+
+
+# 地震数据表结构：同一ID可能被不同数据源使用，主键为 (source, id)
+EARTHQUAKES_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id TEXT NOT NULL,
+        source TEXT NOT NULL,
+        shock_time TEXT,
+        latitude REAL,
+        longitude REAL,
+        magnitude REAL,
+        depth REAL,
+        place_name TEXT,
+        info_type_name TEXT,
+        data_json TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        revision INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP,
+        PRIMARY KEY (source, id)
+    )
+'''
+EARTHQUAKES_COLUMNS = ('id, source, shock_time, latitude, longitude, magnitude, depth, place_name, '
+                       'info_type_name, data_json, created_at, revision, updated_at')
+
+
+async def init_db(db_path: Optional[str] = None):
+    """异步初始化数据库（同时打开全局连接池）"""
     # 确保data目录存在
     data_dir = os.path.join(os.path.dirname(__file__), 'data')
     os.makedirs(data_dir, exist_ok=True)
 
-    db_path = os.path.join(data_dir, 'eqdata.db')
+    db_path = db_path or os.path.join(data_dir, 'eqdata.db')
+    await db_pool.init_db_pool(db_path)
 
-    async with aiosqlite.connect(db_path) as db:
+    async with db_pool.transaction() as db:
         # 创建地震数据表
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS earthquakes (
-                id TEXT PRIMARY KEY,
-                source TEXT NOT NULL,
-                shock_time TEXT,
-                latitude REAL,
-                longitude REAL,
-                magnitude REAL,
-                depth REAL,
-                place_name TEXT,
-                info_type_name TEXT,
-                data_json TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        await db.execute(EARTHQUAKES_TABLE_SQL.format(table='earthquakes'))
+
+        # 旧版本的地震表缺少修订号列，补齐
+        columns_info = await db.execute('PRAGMA table_info(earthquakes)')
+        columns = await columns_info.fetchall()
+        eq_column_names = [col[1] for col in columns]
+        if 'revision' not in eq_column_names:
+            await db.execute('ALTER TABLE earthquakes ADD COLUMN revision INTEGER NOT NULL DEFAULT 0')
+            logging.info("已更新earthquakes表结构，添加revision列")
+        if 'updated_at' not in eq_column_names:
+            await db.execute('ALTER TABLE earthquakes ADD COLUMN updated_at TIMESTAMP')
+
+        # 旧版本的地震表主键只有 id，重建为 (source, id) 主键（索引随旧表删除，下面重新创建）
+        if not any(col[1] == 'source' and col[5] > 0 for col in columns):
+            await db.execute('DROP TABLE IF EXISTS earthquakes_new')
+            await db.execute(EARTHQUAKES_TABLE_SQL.format(table='earthquakes_new'))
+            await db.execute(f'INSERT INTO earthquakes_new ({EARTHQUAKES_COLUMNS}) '
+                             f'SELECT {EARTHQUAKES_COLUMNS} FROM earthquakes')
+            await db.execute('DROP TABLE earthquakes')
+            await db.execute('ALTER TABLE earthquakes_new RENAME TO earthquakes')
+            logging.info("已更新earthquakes表结构，主键改为 (source, id)")
 
         # 检查并更新API使用统计表结构
         # 首先检查表是否存在
@@ -99,6 +177,16 @@ async def init_db():
             )
         ''')
         
+        # 创建天气接口响应缓存表（重启后仍可命中未过期的缓存）
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS weather_cache (
+                cache_key TEXT PRIMARY KEY,
+                data_json TEXT NOT NULL,
+                expires_at REAL NOT NULL,   -- unix时间戳
+                updated_at REAL NOT NULL
+            )
+        ''')
+
         # 创建索引以提高查询性能（仅在不存在时创建）
         indexes_to_create = [
             ('idx_shock_time', 'CREATE INDEX IF NOT EXISTS idx_shock_time ON earthquakes(shock_time)'),
@@ -108,7 +196,8 @@ async def init_db():
             ('idx_weather_group', 'CREATE INDEX IF NOT EXISTS idx_weather_group ON weather_api_usage(group_id)'),
             ('idx_weather_user', 'CREATE INDEX IF NOT EXISTS idx_weather_user ON weather_api_usage(user_id)'),
             ('idx_morning_evening_user', 'CREATE INDEX IF NOT EXISTS idx_morning_evening_user ON morning_evening_status(user_id)'),
-            ('idx_morning_evening_group', 'CREATE INDEX IF NOT EXISTS idx_morning_evening_group ON morning_evening_status(group_id)')
+            ('idx_morning_evening_group', 'CREATE INDEX IF NOT EXISTS idx_morning_evening_group ON morning_evening_status(group_id)'),
+            ('idx_weather_cache_expires', 'CREATE INDEX IF NOT EXISTS idx_weather_cache_expires ON weather_cache(expires_at)')
         ]
         
         for index_name, create_sql in indexes_to_create:
@@ -118,42 +207,29 @@ async def init_db():
                 # 如果索引已存在则忽略错误
                 pass
 
-        await db.commit()
-
     logging.info(f"数据库初始化完成: {db_path}")
     return db_path
 
 
-async def load_recent_ids_from_db():
-    """异步从数据库加载最近2周的地震消息ID到内存"""
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
-
-    # 计算2周前的时间
-    two_weeks_ago = datetime.now() - timedelta(weeks=2)
-
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute("""
-            SELECT DISTINCT id FROM earthquakes
-            WHERE created_at >= ?
-        """, (two_weeks_ago.strftime('%Y-%m-%d %H:%M:%S'),)) as cursor:
-            rows = await cursor.fetchall()
-            ids = {row[0] for row in rows}
+async def load_recent_ids_from_db() -> List[Tuple[str, float]]:
+    """异步从数据库加载最近2周的地震消息组合键及其最后写入时间（unix时间戳）"""
+    # created_at / updated_at 由 CURRENT_TIMESTAMP 写入，均为UTC时间
+    rows = await db_pool.fetchall("""
+        SELECT source, id, CAST(strftime('%s', COALESCE(updated_at, created_at)) AS REAL) AS ts
+        FROM earthquakes
+        WHERE COALESCE(updated_at, created_at) >= datetime('now', ?)
+    """, (f'-{DEDUP_TTL_SECONDS} seconds',))
+    items = [(f"{source}_{eq_id}", ts) for source, eq_id, ts in rows]
 
-    logging.info(f"从数据库加载了 {len(ids)} 个最近2周的地震消息ID")
-    return ids
+    logging.info(f"从数据库加载了 {len(items)} 个最近2周的地震消息ID")
+    return items
 
 
 async def is_duplicate_message(event_data: Dict[str, Any], source: str) -> bool:
     """异步检查消息是否重复"""
-    # 尝试获取地震消息的唯一ID
-    eq_id = event_data.get('id')
-
-    if not eq_id:
-        # 如果没有ID，尝试使用其他字段组合生成唯一标识
-        eq_id = f"{event_data.get('shockTime', '')}_{event_data.get('latitude', '')}_{event_data.get('longitude', '')}_{event_data.get('magnitude', '')}"
-
-    # 创建源+ID的组合键
-    composite_id = f"{source}_{eq_id}"
+    # 获取地震消息的唯一ID及源+ID的组合键
+    eq_id = make_event_id(event_data)
+    composite_id = make_event_key(source, event_data)
 
     logging.debug(f"检查消息是否重复，复合ID: {composite_id}")
 
@@ -163,11 +239,8 @@ async def is_duplicate_message(event_data: Dict[str, Any], source: str) -> bool:
         return True
 
     # 检查数据库中是否已有此ID
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute("SELECT COUNT(*) FROM earthquakes WHERE source = ? AND id = ?", (source, eq_id)) as cursor:
-            result = await cursor.fetchone()
-            count = result[0] if result else 0
+    result = await db_pool.fetchone("SELECT COUNT(*) FROM earthquakes WHERE source = ? AND id = ?", (source, eq_id))
+    count = result[0] if result else 0
 
     if count > 0:
         logging.info(f"发现重复消息（数据库中），复合ID: {composite_id}")
@@ -181,27 +254,55 @@ async def is_duplicate_message(event_data: Dict[str, Any], source: str) -> bool:
     return False
 
 
-async def is_recent_duplicate_by_time(event_data: Dict[str, Any], source: str, time_window_minutes: int = 5) -> bool:
-    """基于时间窗口检查是否为近期重复消息（防止相同事件的不同报告）"""
+def index_earthquake(event_data: Dict[str, Any], source: str, received_ts: Optional[float] = None) -> Optional[IndexedEvent]:
+    """把地震事件加入内存时空索引（非地震源或缺少时间/位置的消息不加入）"""
+    if source in NON_EARTHQUAKE_SOURCES:
+        return None
+    shock_ts = parse_shock_time(event_data.get('shockTime'))
+    latitude = event_data.get('latitude')
+    longitude = event_data.get('longitude')
+    if shock_ts is None or latitude is None or longitude is None:
+        return None
+    try:
+        return event_index.add(make_event_key(source, event_data), source, make_event_id(event_data),
+                               shock_ts, float(latitude), float(longitude),
+                               event_data.get('magnitude'), received_ts)
+    except (TypeError, ValueError):
+        return None
+
+
+async def warm_event_index(hours: int = 24) -> int:
+    """启动时从数据库加载最近的地震事件到时空索引"""
+    rows = await db_pool.fetchall("""
+        SELECT source, id, shock_time, latitude, longitude, magnitude,
+               CAST(strftime('%s', COALESCE(updated_at, created_at)) AS REAL) AS ts
+        FROM earthquakes
+        WHERE COALESCE(updated_at, created_at) >= datetime('now', ?)
+        ORDER BY ts
+    """, (f'-{hours} hours',))
+    for source, eq_id, shock_time, latitude, longitude, magnitude, ts in rows:
+        index_earthquake({'id': eq_id, 'shockTime': shock_time, 'latitude': latitude,
+                          'longitude': longitude, 'magnitude': magnitude}, source, ts)
+    logging.info(f"时空索引已加载 {len(event_index)} 个最近{hours}小时的地震事件")
+    return len(event_index)
+
+
+async def is_recent_duplicate_by_time(event_data: Dict[str, Any], source: str, time_window_minutes: int = 5,
+                                      cross_source: bool = False) -> bool:
+    """
+    基于时间窗口检查是否为近期重复消息（防止相同事件的不同报告）
+    :param cross_source: 是否把其他数据源对同一地震的报告也视为重复
+    """
     # 排除非地震源
-    non_earthquake_sources = {'weatheralarm', 'tsunami'}
-    if source in non_earthquake_sources:
+    if source in NON_EARTHQUAKE_SOURCES:
         return False
 
     shock_time_str = event_data.get('shockTime')
-    if not shock_time_str:
-        return False
-
-    try:
-        # 解析震发时间
-        shock_time = datetime.strptime(shock_time_str, '%Y-%m-%d %H:%M:%S')
-    except ValueError:
-        try:
-            # 尝试其他时间格式
-            shock_time = datetime.fromisoformat(shock_time_str.replace('Z', '+00:00'))
-        except ValueError:
+    shock_ts = parse_shock_time(shock_time_str)
+    if shock_ts is None:
+        if shock_time_str:
             logging.warning(f"无法解析震发时间: {shock_time_str}")
-            return False
+        return False
 
     # 获取经纬度和震级
     latitude = event_data.get('latitude')
@@ -211,92 +312,114 @@ async def is_recent_duplicate_by_time(event_data: Dict[str, Any], source: str, t
     if latitude is None or longitude is None or magnitude is None:
         return False
 
-    # 计算时间窗口
-    current_time = datetime.now()
-    time_threshold = current_time - timedelta(minutes=time_window_minutes)
-
+    now = time.time()
     # 如果震发时间太旧（超过24小时），不进行时间窗口去重
-    if shock_time < current_time - timedelta(hours=24):
+    if shock_ts < now - 24 * 3600:
         return False
 
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
-    async with aiosqlite.connect(db_path) as db:
-        # 查询在时间窗口内、位置相近、震级相近的地震事件
-        query = """
-            SELECT id, shock_time, latitude, longitude, magnitude
-            FROM earthquakes
-            WHERE source = ?
-            AND created_at >= ?
-            AND ABS(latitude - ?) <= 0.5
-            AND ABS(longitude - ?) <= 0.5
-            AND ABS(magnitude - ?) <= 0.3
-        """
-
-        async with db.execute(query, (
-            source,
-            time_threshold.strftime('%Y-%m-%d %H:%M:%S'),
-            float(latitude),
-            float(longitude),
-            float(magnitude)
-        )) as cursor:
-            rows = await cursor.fetchall()
-
-        if rows:
-            # 找到相似的近期事件
-            for row in rows:
-                existing_shock_time_str = row[1]
-                try:
-                    existing_shock_time = datetime.strptime(existing_shock_time_str, '%Y-%m-%d %H:%M:%S')
-                except ValueError:
-                    continue
-
-                # 如果震发时间相差很小（比如小于1分钟），认为是同一个事件
-                time_diff = abs((shock_time - existing_shock_time).total_seconds())
-                if time_diff < 60:  # 60秒内
-                    logging.info(f"发现时间窗口内的重复地震事件: 原ID={row[0]}, 新事件时间={shock_time_str}, 位置=({latitude}, {longitude}), 震级={magnitude}")
-                    return True
+    # 在时空索引中查找时间窗口内接收的、位置相近、震级相近、发震时间相差60秒内的事件
+    if cross_source:
+        matches = event_index.query(float(latitude), float(longitude), shock_ts,
+                                    degrees=CLUSTER_DEGREES, seconds=CLUSTER_SECONDS,
+                                    magnitude=float(magnitude), magnitude_tolerance=CLUSTER_MAGNITUDE,
+                                    received_after=now - time_window_minutes * 60,
+                                    exclude_key=make_event_key(source, event_data))
+    else:
+        matches = event_index.query(float(latitude), float(longitude), shock_ts,
+                                    degrees=0.5, seconds=60,
+                                    magnitude=float(magnitude), magnitude_tolerance=0.3,
+                                    source=source, received_after=now - time_window_minutes * 60,
+                                    exclude_key=make_event_key(source, event_data))
+
+    if matches:
+        existing = matches[0]
+        logging.info(f"发现时间窗口内的重复地震事件: 原ID={existing.key}, 新事件时间={shock_time_str}, 位置=({latitude}, {longitude}), 震级={magnitude}")
+        return True
 
     return False
 
 
 async def save_earthquake_to_db(event_data: Dict[str, Any], source: str) -> None:
     """异步将地震数据保存到数据库"""
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
+    eq_id = make_event_id(event_data)
+
+    # INSERT OR IGNORE 一条语句完成“检查是否存在 + 插入”
+    inserted = await db_pool.execute("""
+        INSERT OR IGNORE INTO earthquakes
+        (id, source, shock_time, latitude, longitude, magnitude, depth, place_name, info_type_name, data_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        eq_id,
+        source,
+        event_data.get('shockTime'),
+        event_data.get('latitude'),
+        event_data.get('longitude'),
+        event_data.get('magnitude'),
+        event_data.get('depth'),
+        event_data.get('placeName'),
+        event_data.get('infoTypeName'),
+        json.dumps(event_data)
+    ))
+
+    if not inserted:
+        logging.debug(f"数据库中已存在地震数据，ID: {eq_id}，跳过插入")
+        return
 
-    eq_id = event_data.get('id')
-    if not eq_id:
-        # 如果没有ID，生成一个唯一标识
-        eq_id = f"{event_data.get('shockTime', '')}_{event_data.get('latitude', '')}_{event_data.get('longitude', '')}_{event_data.get('magnitude', '')}"
+    logging.info(f"地震数据已保存到数据库，ID: {eq_id}, 数据源: {source}, 时间: {event_data.get('shockTime', '未知')}, 震级: {event_data.get('magnitude', '未知')}")
 
-    async with aiosqlite.connect(db_path) as db:
-        # 检查是否已存在
-        async with db.execute("SELECT COUNT(*) FROM earthquakes WHERE id = ?", (eq_id,)) as cursor:
-            result = await cursor.fetchone()
-            count = result[0] if result else 0
 
-        if count > 0:
-            logging.debug(f"数据库中已存在地震数据，ID: {eq_id}，跳过插入")
-            return
+# upsert_earthquake 的返回值
+UPSERT_NEW = 'new'
+UPSERT_CHANGED = 'changed'
+UPSERT_UNCHANGED = 'unchanged'
 
-        await db.execute("""
-            INSERT INTO earthquakes
-            (id, source, shock_time, latitude, longitude, magnitude, depth, place_name, info_type_name, data_json)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            eq_id,
-            source,
-            event_data.get('shockTime'),
-            event_data.get('latitude'),
-            event_data.get('longitude'),
-            event_data.get('magnitude'),
-            event_data.get('depth'),
-            event_data.get('placeName'),
-            event_data.get('infoTypeName'),
-            json.dumps(event_data)
-        ))
-        await db.commit()
 
-    logging.info(f"地震数据已保存到数据库，ID: {eq_id}, 数据源: {source}, 时间: {event_data.get('shockTime', '未知')}, 震级: {event_data.get('magnitude', '未知')}")
+async def upsert_earthquake(event_data: Dict[str, Any], source: str) -> str:
+    """
+    去重、更新检测与入库合并为一条 UPSERT 语句（一次数据库往返）
+    :return: UPSERT_NEW 新事件 / UPSERT_CHANGED 已有事件且数据有变化 / UPSERT_UNCHANGED 重复且无变化
+    """
+    eq_id = make_event_id(event_data)
+
+    # 插入时 revision 为0；同源同ID冲突且数据有变化时覆盖并递增 revision；
+    # 数据完全相同时 WHERE 不成立，RETURNING 不返回任何行
+    row = await db_pool.execute_returning("""
+        INSERT INTO earthquakes
+        (id, source, shock_time, latitude, longitude, magnitude, depth, place_name, info_type_name, data_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source, id) DO UPDATE SET
+            shock_time = excluded.shock_time,
+            latitude = excluded.latitude,
+            longitude = excluded.longitude,
+            magnitude = excluded.magnitude,
+            depth = excluded.depth,
+            place_name = excluded.place_name,
+            info_type_name = excluded.info_type_name,
+            data_json = excluded.data_json,
+            revision = earthquakes.revision + 1,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE earthquakes.data_json <> excluded.data_json
+        RETURNING revision
+    """, (
+        eq_id,
+        source,
+        event_data.get('shockTime'),
+        event_data.get('latitude'),
+        event_data.get('longitude'),
+        event_data.get('magnitude'),
+        event_data.get('depth'),
+        event_data.get('placeName'),
+        event_data.get('infoTypeName'),
+        json.dumps(event_data)
+    ))
+
+    if row is None:
+        return UPSERT_UNCHANGED
+    if row[0] == 0:
+        logging.info(f"地震数据已保存到数据库，ID: {eq_id}, 数据源: {source}, 时间: {event_data.get('shockTime', '未知')}, 震级: {event_data.get('magnitude', '未知')}")
+        return UPSERT_NEW
+    logging.info(f"地震数据已更新，ID: {eq_id}, 数据源: {source}, 第 {row[0]} 次修订")
+    return UPSERT_CHANGED
 
 
 def get_nested_value(data, path):
@@ -596,13 +719,11 @@ async def handle_initial_data(data, config):
         source = item.get('source')
         event_data = item.get('Data', {})
 
-        # 将初始数据的ID加入去重集合
-        eq_id = event_data.get('id')
-        if not eq_id:
-            eq_id = f"{event_data.get('shockTime', '')}_{event_data.get('latitude', '')}_{event_data.get('longitude', '')}_{event_data.get('magnitude', '')}"
-        if eq_id:
-            processed_ids.add(eq_id)
-            logging.debug(f"将初始数据ID加入去重集合: {eq_id}")
+        # 将初始数据的组合键加入去重集合（与实时消息使用相同的键格式）
+        if source:
+            composite_id = make_event_key(source, event_data)
+            processed_ids.add(composite_id)
+            logging.debug(f"将初始数据ID加入去重集合: {composite_id}")
 
         # 存储所有数据源用于测试命令
         initial_earthquake_data.append(item)
@@ -631,12 +752,9 @@ async def check_source_enabled(source, event_data, config):
 
 async def get_stored_earthquake_data(eq_id, source):
     """从数据库获取已存储的地震数据"""
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute("SELECT data_json FROM earthquakes WHERE source = ? AND id = ?", (source, eq_id)) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                return json.loads(row[0])
+    row = await db_pool.fetchone("SELECT data_json FROM earthquakes WHERE source = ? AND id = ?", (source, eq_id))
+    if row:
+        return json.loads(row[0])
     return None
 
 
@@ -665,8 +783,7 @@ def has_significant_update(old_data, new_data):
 async def is_within_time_window(event_data, source, max_hours=1):
     """检查地震事件是否在指定时间窗口内（默认1小时）"""
     # 排除非地震源，这些源不需要时间窗口检查
-    non_earthquake_sources = {'weatheralarm', 'tsunami'}
-    if source in non_earthquake_sources:
+    if source in NON_EARTHQUAKE_SOURCES:
         return True
 
     shock_time_str = event_data.get('shockTime')
@@ -711,6 +828,11 @@ async def process_message(message, config, target_group=None, apply_rules=True):
         logging.error("FAN WS 消息解析失败")
         return None
 
+    return await process_fan_data(data, config, target_group, apply_rules)
+
+
+async def process_fan_data(data, config, target_group=None, apply_rules=True):
+    """处理已解析的 FAN 消息（参数同 process_message）"""
     msg_type = data.get('type')
 
     if msg_type == 'heartbeat':
@@ -728,82 +850,207 @@ async def process_message(message, config, target_group=None, apply_rules=True):
     logging.info(f"收到新消息: 数据源={source}, 时间={event_data.get('shockTime', '未知')}, "
                  f"震级={event_data.get('magnitude', '未知')}, 位置={event_data.get('placeName', '未知')}")
 
-    # 获取地震消息的唯一ID
-    eq_id = event_data.get('id')
-    if not eq_id:
-        eq_id = f"{event_data.get('shockTime', '')}_{event_data.get('latitude', '')}_{event_data.get('longitude', '')}_{event_data.get('magnitude', '')}"
-
     # 创建源+ID的组合键用于去重
-    composite_id = f"{source}_{eq_id}"
+    composite_id = make_event_key(source, event_data)
 
-    # 检查是否为重复消息但有数据更新
-    is_duplicate = False
-    has_update = False
+    # 去重、更新检测与入库一次完成（被过滤的消息同样会入库，但不推送）
+    status = await upsert_earthquake(event_data, source)
+    processed_ids.add(composite_id)
 
-    # 检查内存中的重复
-    if composite_id in processed_ids:
-        is_duplicate = True
-        # 获取已存储的数据进行比较
-        stored_data = await get_stored_earthquake_data(eq_id, source)
-        has_update = has_significant_update(stored_data, event_data)
-        if has_update:
-            logging.info(f"发现重复消息但有显著更新，复合ID: {composite_id}")
-        else:
-            logging.info(f"发现重复消息且无更新，跳过处理: {composite_id}")
+    if status == UPSERT_UNCHANGED:
+        logging.info(f"发现重复消息且无更新，跳过处理: {composite_id}")
+        return None
+    if status == UPSERT_CHANGED:
+        logging.info(f"发现重复消息但有显著更新，复合ID: {composite_id}")
+
+    # 新事件：检查是否为同一地震的另一份报告（ID不同但时间、位置、震级相近）；
+    # 首报被判定为重复的事件，其修订同样不推送
+    duplicate = False
+    if status == UPSERT_CHANGED:
+        duplicate = composite_id in suppressed_ids
+    elif config.get('earthquake.dedup.spatial', False):
+        duplicate = await is_recent_duplicate_by_time(
+            event_data, source,
+            cross_source=config.get('earthquake.dedup.cross_source', False)
+        )
+    index_earthquake(event_data, source)
+    if duplicate:
+        suppressed_ids.add(composite_id)
+        logging.info(f"同一地震的重复报告，跳过推送: {composite_id}")
+        return None
+
+    # 检查数据源是否启用
+    if apply_rules:
+        if not await check_source_enabled(source, event_data, config):
             return None
+
+    # 一收到消息就进行时间校验（仅处理1小时内发生的地震）
+    if apply_rules:
+        if not await is_within_time_window(event_data, source, max_hours=1):
+            logging.info(f"地震事件超出1小时时间窗口，跳过处理: {event_data.get('id', 'unknown')}")
+            return None
+
+    # 存储接收到的数据，用于测试命令
+    received_earthquake_data[source] = event_data
+    logging.info(f"存储数据源 {source} 用于测试命令")
+
+    # 发送文本消息和图片（统一处理，绘图逻辑在process_text_message_only中）
+    # 同一事件的连续修订合并推送；指定目标群（测试命令）时直接推送
+    if target_group or not config.get('earthquake.coalesce.enabled', True):
+        await process_text_message_only(event_data, source, config, target_group)
     else:
-        # 检查数据库中的重复
-        db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
-        async with aiosqlite.connect(db_path) as db:
-            async with db.execute("SELECT COUNT(*) FROM earthquakes WHERE source = ? AND id = ?", (source, eq_id)) as cursor:
-                count = await cursor.fetchone()
-                count = count[0] if count else 0
-
-        if count > 0:
-            is_duplicate = True
-            stored_data = await get_stored_earthquake_data(eq_id, source)
-            has_update = has_significant_update(stored_data, event_data)
-            if has_update:
-                logging.info(f"发现重复消息但有显著更新（数据库中），复合ID: {composite_id}")
-            else:
-                logging.info(f"发现重复消息且无更新（数据库中），跳过处理: {composite_id}")
-                # 将ID加入内存集合避免后续重复检查
-                processed_ids.add(composite_id)
-                return None
-
-    # 如果不是重复消息或有更新，则继续处理
-    if not is_duplicate or has_update:
-        # 将ID加入内存集合
-        processed_ids.add(composite_id)
+        schedule_coalesced_push(composite_id, event_data, source, config)
 
-        # 检查数据源是否启用
-        if apply_rules:
-            if not await check_source_enabled(source, event_data, config):
-                # 即使消息被过滤，也要保存到数据库，但不推送
-                await save_earthquake_to_db(event_data, source)
-                return None
+    return None
 
-        # 一收到消息就进行时间校验（仅处理1小时内发生的地震）
-        if apply_rules:
-            if not await is_within_time_window(event_data, source, max_hours=1):
-                logging.info(f"地震事件超出1小时时间窗口，跳过处理: {event_data.get('id', 'unknown')}")
-                return None
 
-        # 存储接收到的数据，用于测试命令
-        received_earthquake_data[source] = event_data
-        logging.info(f"存储数据源 {source} 用于测试命令")
+class _EventPushState:
+    """单个事件的合并推送状态"""
 
-        # 发送文本消息和图片（统一处理，绘图逻辑在process_text_message_only中）
-        await process_text_message_only(event_data, source, config, target_group)
+    __slots__ = ('pending', 'last_sent', 'urgent', 'task')
 
-        # 将地震数据保存到数据库
-        await save_earthquake_to_db(event_data, source)
+    def __init__(self):
+        self.pending: Optional[Tuple[dict, str, Any]] = None
+        self.last_sent: Optional[dict] = None
+        self.urgent = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
 
-    return None
+
+def _parse_intensity(value) -> Optional[float]:
+    """解析烈度/震度（如 5、"5.5"、"5弱"、"6+"），无法解析时返回None"""
+    if value is None:
+        return None
+    match = re.search(r'\d+(\.\d+)?', str(value))
+    return float(match.group()) if match else None
+
+
+def is_urgent_revision(old_data: Optional[dict], new_data: dict, config) -> bool:
+    """判断修订是否必须立即推送：震级或烈度跳变较大，或取消/终报状态变化"""
+    if not old_data:
+        return True
+    try:
+        magnitude_jump = abs(float(new_data.get('magnitude')) - float(old_data.get('magnitude')))
+        if magnitude_jump >= config.get('earthquake.coalesce.magnitude_jump', DEFAULT_MAGNITUDE_JUMP):
+            return True
+    except (TypeError, ValueError):
+        pass
+    intensity_jump = config.get('earthquake.coalesce.intensity_jump', DEFAULT_INTENSITY_JUMP)
+    for field in ('epiIntensity', 'maxIntensity'):
+        old_value = _parse_intensity(old_data.get(field))
+        new_value = _parse_intensity(new_data.get(field))
+        if old_value is not None and new_value is not None and abs(new_value - old_value) >= intensity_jump:
+            return True
+    for field in ('cancel', 'final'):
+        if str(old_data.get(field)) != str(new_data.get(field)):
+            return True
+    return False
+
+
+def schedule_coalesced_push(key: str, event_data: dict, source: str, config) -> None:
+    """
+    合并推送同一事件的修订：
+    事件的首报立即推送；推送进行中及推送后的合并窗口内到达的修订只保留最新一版，窗口结束后推送。
+    震级/烈度跳变或取消等修订会提前结束窗口，推送完当前这一版后立即推送。
+    """
+    state = _event_pushes.get(key)
+    if state is None:
+        state = _event_pushes[key] = _EventPushState()
+        state.pending = (event_data, source, config)
+        state.task = asyncio.create_task(_run_coalesced_pushes(key, state))
+        return
+
+    if state.pending is not None:
+        coalesce_stats['merged'] += 1
+        logging.info(f"合并事件 {key} 的修订，仅推送最新一版")
+    state.pending = (event_data, source, config)
+    if is_urgent_revision(state.last_sent, event_data, config):
+        coalesce_stats['urgent'] += 1
+        state.urgent.set()
+
+
+async def _run_coalesced_pushes(key: str, state: _EventPushState) -> None:
+    """逐版推送某事件的最新修订，直到合并窗口内没有新的修订"""
+    try:
+        while state.pending is not None:
+            event_data, source, config = state.pending
+            state.pending = None
+            state.urgent.clear()
+            state.last_sent = event_data
+            coalesce_stats['pushed'] += 1
+            try:
+                await process_text_message_only(event_data, source, config)
+            except Exception as e:
+                logging.error(f"推送事件 {key} 失败: {e}")
+
+            window = config.get('earthquake.coalesce.window', DEFAULT_COALESCE_WINDOW)
+            if state.urgent.is_set() or window <= 0:
+                continue
+            try:
+                await asyncio.wait_for(state.urgent.wait(), timeout=window)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _event_pushes.pop(key, None)
+
+
+def _get_push_semaphore(config) -> asyncio.Semaphore:
+    """获取推送并发限制信号量（配置的并发数变化时重建）"""
+    global _push_semaphore, _push_concurrency
+    concurrency = max(1, int(config.get('earthquake.push.concurrency', DEFAULT_PUSH_CONCURRENCY)))
+    if _push_semaphore is None or concurrency != _push_concurrency:
+        _push_semaphore = asyncio.Semaphore(concurrency)
+        _push_concurrency = concurrency
+    return _push_semaphore
+
+
+def record_push_latency(group_id: str, latency_ms: float) -> None:
+    """记录一次群推送的送达延迟"""
+    history = push_latency_stats.get(group_id)
+    if history is None:
+        history = push_latency_stats[group_id] = deque(maxlen=PUSH_LATENCY_HISTORY)
+    history.append(latency_ms)
+
+
+def get_push_latency_stats() -> Dict[str, Dict[str, float]]:
+    """获取各群最近若干次推送的延迟统计（毫秒）"""
+    stats = {}
+    for group_id, history in push_latency_stats.items():
+        if history:
+            stats[group_id] = {
+                'count': len(history),
+                'avg': sum(history) / len(history),
+                'max': max(history),
+                'last': history[-1],
+            }
+    return stats
+
+
+async def push_to_group(group_id, event_data, source, config, started_at: float,
+                        render_task: Optional[asyncio.Task] = None) -> float:
+    """
+    向单个群推送：先文本后图片，保证同一群内的顺序
+    等待绘图期间不占用并发名额，避免阻塞其他群的文本推送
+    :return: 文本送达延迟（毫秒，从扇出开始计算）
+    """
+    semaphore = _get_push_semaphore(config)
+    async with semaphore:
+        await send_earthquake_message(group_id, event_data, source, config)
+    latency_ms = (time.perf_counter() - started_at) * 1000
+    record_push_latency(str(group_id), latency_ms)
+
+    if render_task is not None:
+        img_path = await asyncio.shield(render_task)
+        if img_path:
+            async with semaphore:
+                await send_group_img(group_id, img_path)
+            logging.info(f"成功向群 {group_id} 发送地震地图: {img_path}")
+    return latency_ms
 
 
 async def process_text_message_only(event_data, source, config, target_group=None):
-    """仅处理文本消息（不包含绘图）"""
+    """向所有符合规则的群并发推送文本消息及地图（并发数由 earthquake.push.concurrency 控制）"""
+    started_at = time.perf_counter()
+
     # 推送目标
     if target_group:
         groups_to_push = [target_group]
@@ -812,31 +1059,102 @@ async def process_text_message_only(event_data, source, config, target_group=Non
         groups_to_push = config.get('groups', {}).keys()
         logging.info(f"向所有配置群推送: {list(groups_to_push)}")
 
+    eligible_groups = []
     for group_id in groups_to_push:
         group_config = config.get('groups', {}).get(group_id, {})
 
         # 检查推送规则
-        if not should_push_to_group(group_id, source, group_config):
-            continue
+        if should_push_to_group(group_id, source, group_config):
+            eligible_groups.append(group_id)
 
-        # 发送文本消息
-        await send_earthquake_message(group_id, event_data, source, config)
-        
-        # 处理绘图逻辑（只在数据源支持绘图时）
-        if source in config.get('draw_sources', []):
-            await send_earthquake_image(group_id, event_data, source, config)
+    if not eligible_groups:
+        return
+
+    # 通过过滤后立即开始绘图，与文本推送并行，所有群共用同一张图
+    render_task = start_earthquake_render(event_data, source, config)
+
+    # 预警类数据源以最高优先级进入发送队列
+    with send_priority(PRIORITY_ALERT if source in ALERT_SOURCES else PRIORITY_PUSH):
+        results = await asyncio.gather(
+            *(push_to_group(group_id, event_data, source, config, started_at, render_task)
+              for group_id in eligible_groups),
+            return_exceptions=True
+        )
+
+    latencies = []
+    for group_id, result in zip(eligible_groups, results):
+        if isinstance(result, Exception):
+            logging.error(f"向群 {group_id} 推送地震消息失败: {result}")
+        else:
+            latencies.append(result)
+    if latencies:
+        logging.info(f"地震消息推送完成: {len(latencies)}/{len(eligible_groups)} 个群, "
+                     f"最快 {min(latencies):.0f} ms, 最慢 {max(latencies):.0f} ms")
+
+
+def get_fan_dispatcher(config) -> fan_dispatcher.FanDispatcher:
+    """获取（首次调用时创建并启动）FAN 消息分发器"""
+    global _fan_dispatcher
+    if _fan_dispatcher is None:
+        _fan_dispatcher = fan_dispatcher.FanDispatcher(
+            lambda data: process_fan_data(data, config),
+            workers=config.get('earthquake.fan.workers', fan_dispatcher.DEFAULT_WORKERS),
+            alert_workers=config.get('earthquake.fan.alert_workers', fan_dispatcher.DEFAULT_ALERT_WORKERS),
+            max_pending=config.get('earthquake.fan.max_pending', fan_dispatcher.DEFAULT_MAX_PENDING)
+        )
+    _fan_dispatcher.start()
+    return _fan_dispatcher
+
+
+async def close_fan_dispatcher() -> None:
+    """停止 FAN 消息分发器"""
+    global _fan_dispatcher
+    if _fan_dispatcher is not None:
+        stats = _fan_dispatcher.get_stats()
+        await _fan_dispatcher.stop()
+        _fan_dispatcher = None
+        logging.info(f"FAN 消息分发已停止：处理 {stats['processed']} 条，溢出 {stats['overflow']} 条")
+
+
+def get_fan_stats() -> Dict[str, Any]:
+    """获取 FAN 消息分发统计（排队数、溢出次数、处理延迟）"""
+    return _fan_dispatcher.get_stats() if _fan_dispatcher is not None else {}
+
+
+async def dispatch_fan_message(message, dispatcher: fan_dispatcher.FanDispatcher) -> Optional[str]:
+    """
+    接收循环中的轻量处理：解析消息、直接应答心跳，其余消息按 (数据源, 事件ID) 交给分发器
+    :return: 需要回复给 FAN 的消息
+    """
+    try:
+        data = json.loads(message)
+    except json.JSONDecodeError:
+        logging.error("FAN WS 消息解析失败")
+        return None
+
+    msg_type = data.get('type')
+    if msg_type == 'heartbeat':
+        return await handle_heartbeat()
+    if msg_type == 'update':
+        source = data.get('source')
+        key = make_event_key(source, data.get('Data', {}))
+        dispatcher.submit(data, key, alert=source in ALERT_SOURCES)
+    elif msg_type == 'initial_all':
+        dispatcher.submit(data, 'initial_all')
+    return None
 
 
 async def connect_to_fan_ws(config):
-    """连接到FAN的WebSocket服务"""
+    """连接到FAN的WebSocket服务（接收与处理分离，慢速处理不会阻塞接收和心跳）"""
     uri = "wss://ws.fanstudio.tech/all"
+    dispatcher = get_fan_dispatcher(config)
     while True:
         try:
             async with websockets.connect(uri, ping_interval=None) as ws:
                 logging.info("FAN WS 连接成功")
                 while True:
                     msg = await ws.recv()
-                    reply = await process_message(msg, config)
+                    reply = await dispatch_fan_message(msg, dispatcher)
                     if reply:
                         await ws.send(reply)
         except websockets.exceptions.ConnectionClosedOK:
@@ -850,174 +1168,180 @@ async def connect_to_fan_ws(config):
 # API使用统计相关函数
 async def record_weather_api_usage(group_id: str, user_id: str, command: str, api_endpoint: str):
     """记录天气API调用"""
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
-
     current_date = datetime.now().strftime('%Y-%m-%d')
     current_month = datetime.now().strftime('%Y-%m')
 
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute(
-            '''INSERT INTO weather_api_usage (date, month, group_id, user_id, command, api_endpoint)
-               VALUES (?, ?, ?, ?, ?, ?)''',
-            (current_date, current_month, group_id, user_id, command, api_endpoint)
-        )
-        await db.commit()
+    await db_pool.execute(
+        '''INSERT INTO weather_api_usage (date, month, group_id, user_id, command, api_endpoint)
+           VALUES (?, ?, ?, ?, ?, ?)''',
+        (current_date, current_month, group_id, user_id, command, api_endpoint)
+    )
 
 
 async def get_daily_usage_count():
     """获取今日API调用次数"""
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
     current_date = datetime.now().strftime('%Y-%m-%d')
 
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute(
-            'SELECT COUNT(*) FROM weather_api_usage WHERE date = ?',
-            (current_date,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            return row[0] if row else 0
+    row = await db_pool.fetchone(
+        'SELECT COUNT(*) FROM weather_api_usage WHERE date = ?',
+        (current_date,)
+    )
+    return row[0] if row else 0
 
 
 async def get_monthly_usage_count():
     """获取本月API调用次数"""
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
     current_month = datetime.now().strftime('%Y-%m')
 
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute(
-            'SELECT COUNT(*) FROM weather_api_usage WHERE month = ?',
-            (current_month,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            return row[0] if row else 0
+    row = await db_pool.fetchone(
+        'SELECT COUNT(*) FROM weather_api_usage WHERE month = ?',
+        (current_month,)
+    )
+    return row[0] if row else 0
 
 
 async def get_top_users_daily():
     """获取今日调用最多的用户"""
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
     current_date = datetime.now().strftime('%Y-%m-%d')
 
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute(
-            '''SELECT group_id, user_id, COUNT(*) as count
-               FROM weather_api_usage
-               WHERE date = ?
-               GROUP BY group_id, user_id
-               ORDER BY count DESC
-               LIMIT 1''',
-            (current_date,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            return row if row else None
+    row = await db_pool.fetchone(
+        '''SELECT group_id, user_id, COUNT(*) as count
+           FROM weather_api_usage
+           WHERE date = ?
+           GROUP BY group_id, user_id
+           ORDER BY count DESC
+           LIMIT 1''',
+        (current_date,)
+    )
+    return row if row else None
 
 
 async def get_top_users_monthly():
     """获取本月调用最多的用户"""
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
     current_month = datetime.now().strftime('%Y-%m')
 
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute(
-            '''SELECT group_id, user_id, COUNT(*) as count
-               FROM weather_api_usage
-               WHERE month = ?
-               GROUP BY group_id, user_id
-               ORDER BY count DESC
-               LIMIT 1''',
-            (current_month,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            return row if row else None
+    row = await db_pool.fetchone(
+        '''SELECT group_id, user_id, COUNT(*) as count
+           FROM weather_api_usage
+           WHERE month = ?
+           GROUP BY group_id, user_id
+           ORDER BY count DESC
+           LIMIT 1''',
+        (current_month,)
+    )
+    return row if row else None
 
 
 async def get_top_groups_daily():
     """获取今日调用最多的群组"""
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
     current_date = datetime.now().strftime('%Y-%m-%d')
 
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute(
-            '''SELECT group_id, COUNT(*) as count
-               FROM weather_api_usage
-               WHERE date = ?
-               GROUP BY group_id
-               ORDER BY count DESC
-               LIMIT 1''',
-            (current_date,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            return row if row else None
+    row = await db_pool.fetchone(
+        '''SELECT group_id, COUNT(*) as count
+           FROM weather_api_usage
+           WHERE date = ?
+           GROUP BY group_id
+           ORDER BY count DESC
+           LIMIT 1''',
+        (current_date,)
+    )
+    return row if row else None
 
 
 async def get_top_groups_monthly():
     """获取本月调用最多的群组"""
-    db_path = os.path.join(os.path.dirname(__file__), 'data', 'eqdata.db')
     current_month = datetime.now().strftime('%Y-%m')
 
-    async with aiosqlite.connect(db_path) as db:
-        async with db.execute(
-            '''SELECT group_id, COUNT(*) as count
-               FROM weather_api_usage
-               WHERE month = ?
-               GROUP BY group_id
-               ORDER BY count DESC
-               LIMIT 1''',
-            (current_month,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            return row if row else None
+    row = await db_pool.fetchone(
+        '''SELECT group_id, COUNT(*) as count
+           FROM weather_api_usage
+           WHERE month = ?
+           GROUP BY group_id
+           ORDER BY count DESC
+           LIMIT 1''',
+        (current_month,)
+    )
+    return row if row else None
 
 
 async def cleanup_processed_ids():
-    """定期清理已处理ID集合，防止内存无限增长"""
-    global processed_ids
-    
-    # 计算两周前的时间
-    two_weeks_ago = datetime.now() - timedelta(weeks=2)
-    
-    # 从数据库加载最近两周的ID
-    recent_ids = await load_recent_ids_from_db()
-    
-    # 更新内存中的ID集合
-    processed_ids = recent_ids.copy()
-    
-    logging.info(f"已清理已处理ID集合，保留最近两周的 {len(processed_ids)} 个ID")
-
-
-async def send_earthquake_image(group_id, event_data, source, config):
-    """发送地震图像到群组"""
-    if source not in config.get('draw_sources', []):
-        return
-
-    # 获取消息ID用于缓存
-    msg_id = event_data.get('id', f"{event_data.get('shockTime', '')}_{event_data.get('latitude', '')}_{event_data.get('longitude', '')}_{event_data.get('magnitude', '')}")
-
-    # 检查是否已有缓存的图片
-    if msg_id in cached_image_paths:
-        img_path = cached_image_paths[msg_id]
+    """定期淘汰去重存储中的过期记录，防止内存无限增长"""
+    evicted = processed_ids.evict_expired()
+    suppressed_ids.evict_expired()
+    cached_image_paths.evict_expired()
+    event_index.evict_expired()
+    stats = processed_ids.stats()
+    logging.info(f"已清理已处理ID集合，淘汰 {evicted} 个过期ID，保留 {stats['entries']} 个，"
+                 f"约占用 {stats['memory_bytes'] / 1024:.1f} KB")
+
+
+def get_render_key(event_data, source) -> str:
+    """绘图键：源+ID+数据摘要。同一版本的报文共用一张图，修订后的报文重新绘制"""
+    digest = hashlib.md5(json.dumps(event_data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+    return f"{make_event_key(source, event_data)}_{digest}"
+
+
+async def _render_earthquake_image(render_key, event_data, source, config) -> Optional[str]:
+    """绘制地震地图（已有可用缓存时直接返回），失败或超时返回None"""
+    img_path = cached_image_paths.get(render_key)
+    if img_path:
         if os.path.exists(img_path):
             logging.info(f"复用已缓存的图片: {img_path}")
-            await send_group_img(group_id, img_path)
-            return
-        else:
-            # 缓存的文件不存在，移除缓存
-            del cached_image_paths[msg_id]
-            logging.info(f"缓存的图片不存在，重新绘制: {msg_id}")
+            return img_path
+        # 缓存的文件不存在，移除缓存
+        cached_image_paths.discard(render_key)
+        logging.info(f"缓存的图片不存在，重新绘制: {render_key}")
 
-    logging.info(f"为群 {group_id} 生成地震地图")
-    
+    logging.info(f"生成地震地图: {render_key}")
     try:
-        img_path = await asyncio.wait_for(
-            draw_earthquake_async(event_data, source),
-            timeout=config.get('draw_timeout', 20)
-        )
-        
-        if img_path:
-            # 缓存图片路径
-            cached_image_paths[msg_id] = img_path
-            await send_group_img(group_id, img_path)
-            logging.info(f"成功向群 {group_id} 发送地震地图: {img_path}")
+        # 超时由绘图进程池控制（draw_timeout），超时的绘图进程会被终止
+        img_path = await draw_earthquake_async(event_data, source)
     except asyncio.TimeoutError:
-        logging.error(f"绘图超时: {msg_id}")
+        logging.error(f"绘图超时: {render_key}")
+        return None
     except Exception as e:
-        logging.error(f"绘制地震地图失败: {e}")
\ No newline at end of file
+        logging.error(f"绘制地震地图失败: {e}")
+        return None
+
+    if img_path:
+        # 缓存图片路径
+        cached_image_paths.set(render_key, img_path)
+    return img_path
+
+
+def start_earthquake_render(event_data, source, config) -> Optional[asyncio.Task]:
+    """
+    启动（或复用进行中的）地图绘制任务，同一绘图键的并发请求共享同一个任务
+    :return: 绘图任务，数据源不需要绘图时返回None
+    """
+    if source not in config.get('draw_sources', []):
+        return None
+
+    render_key = get_render_key(event_data, source)
+    task = _render_tasks.get(render_key)
+    if task is not None:
+        return task
+
+    task = asyncio.create_task(_render_earthquake_image(render_key, event_data, source, config))
+    _render_tasks[render_key] = task
+
+    def _on_done(finished: asyncio.Task) -> None:
+        if _render_tasks.get(render_key) is finished:
+            del _render_tasks[render_key]
+
+    task.add_done_callback(_on_done)
+    return task
+
+
+async def send_earthquake_image(group_id, event_data, source, config, render_task: Optional[asyncio.Task] = None):
+    """发送地震图像到群组（传入 render_task 时等待该共享绘图任务的结果）"""
+    if render_task is None:
+        render_task = start_earthquake_render(event_data, source, config)
+        if render_task is None:
+            return
+
+    # shield：单个群的等待被取消时不影响其他群共用的绘图任务
+    img_path = await asyncio.shield(render_task)
+    if img_path:
+        await send_group_img(group_id, img_path)
+        logging.info(f"成功向群 {group_id} 发送地震地图: {img_path}")